@@ -0,0 +1,153 @@
+from dataclasses import asdict, dataclass, field
+from datetime import date
+import resource
+import time
+from typing import Any, Iterator, Optional
+
+from psycopg2.extensions import cursor
+import pyarrow as pa
+
+from src.enums import DateStage, Tables
+from src.measurement_source import MeasurementSource
+from src.tracing import get_statement_label
+
+# process_data commits every stage together with its date_stages entry, which marks the end of the stage.
+STAGE_BOUNDARY_LABEL = f"INSERT INTO {Tables.DATE_STAGES.value}"
+
+
+@dataclass
+class StatementTiming:
+    label: str
+    seconds: float
+    rowcount: int
+    count: int = 1
+
+
+@dataclass
+class StageResult:
+    rows: int
+    stage: str
+    seconds: float
+    peak_rss_bytes: int
+    statements: list[StatementTiming] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "rows_per_second": self.rows_per_second}
+
+
+class TimingCursor(cursor):
+    """
+    Cursor that records the duration and row count of every statement it runs. Set it as the cursor_factory of
+    the benchmark connection and collect the timings with take_timings() after each stage.
+    """
+
+    timings: list[StatementTiming] = []
+
+    def execute(self, query: Any, vars: Any = None) -> None:
+        start_time = time.perf_counter()
+        try:
+            super().execute(query, vars)
+        finally:
+            self._record(query, start_time)
+
+    def copy_expert(self, sql: Any, file: Any, size: int = 8192) -> None:
+        start_time = time.perf_counter()
+        try:
+            super().copy_expert(sql, file, size)
+        finally:
+            self._record(sql, start_time)
+
+    def _record(self, query: Any, start_time: float) -> None:
+        TimingCursor.timings.append(
+            StatementTiming(get_statement_label(query), time.perf_counter() - start_time, self.rowcount)
+        )
+
+    @staticmethod
+    def take_timings() -> list[StatementTiming]:
+        timings, TimingCursor.timings = TimingCursor.timings, []
+        return timings
+
+
+def aggregate_timings(timings: list[StatementTiming]) -> list[StatementTiming]:
+    """
+    Sum the timings of statements with the same label, e.g. the COPY and savepoint statements of every chunk.
+    """
+    aggregated: dict[str, StatementTiming] = {}
+    for timing in timings:
+        if (total := aggregated.get(timing.label)) is None:
+            aggregated[timing.label] = StatementTiming(timing.label, timing.seconds, max(timing.rowcount, 0))
+        else:
+            total.seconds += timing.seconds
+            total.rowcount += max(timing.rowcount, 0)
+            total.count += 1
+    return list(aggregated.values())
+
+
+def split_processing_stages(timings: list[StatementTiming]) -> list[tuple[DateStage, list[StatementTiming]]]:
+    """
+    Split the statements of one process_data call into the stages it ran, at the date_stages entries that end
+    every stage. Statements before the first stage (the lock and ledger reads) count towards it.
+    """
+    stages = [stage for stage in DateStage if stage != DateStage.EXTRACTED]
+    split: list[tuple[DateStage, list[StatementTiming]]] = []
+    current: list[StatementTiming] = []
+    for timing in timings:
+        current.append(timing)
+        if timing.label == STAGE_BOUNDARY_LABEL and len(split) < len(stages):
+            split.append((stages[len(split)], current))
+            current = []
+    if current and split:
+        split[-1][1].extend(current)
+    return split
+
+
+def find_regressions(results: list[dict[str, Any]], baseline: list[dict[str, Any]], tolerance: float) -> list[str]:
+    """
+    @return: a message for every stage and scale whose throughput dropped by more than tolerance (a fraction)
+    compared to the baseline results.
+    """
+    baseline_throughput = {(result["rows"], result["stage"]): result["rows_per_second"] for result in baseline}
+    regressions = []
+    for result in results:
+        expected: Optional[float] = baseline_throughput.get((result["rows"], result["stage"]))
+        if expected and result["rows_per_second"] < expected * (1 - tolerance):
+            regressions.append(
+                f"{result['stage']} at {result['rows']} rows: {result['rows_per_second']:.0f} rows/s, "
+                f"baseline {expected:.0f} rows/s"
+            )
+    return regressions
+
+
+def get_peak_rss_bytes() -> int:
+    # ru_maxrss is reported in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class TimedSource(MeasurementSource):
+    """
+    Wraps a measurement source and measures the time spent reading from it, so the load throughput can be reported
+    without the cost of the synthetic generator.
+    """
+
+    def __init__(self, source: MeasurementSource) -> None:
+        self._source = source
+        self.seconds = 0.0
+
+    def read_day(self, table: Tables, day: date, asns: str) -> Iterator[pa.RecordBatch]:
+        batches = self._source.read_day(table, day, asns)
+        while True:
+            start_time = time.perf_counter()
+            try:
+                batch = next(batches)
+            except StopIteration:
+                return
+            finally:
+                self.seconds += time.perf_counter() - start_time
+            yield batch
+
+    def estimate_day_bytes(self, table: Tables, day: date, asns: str) -> int:
+        return self._source.estimate_day_bytes(table, day, asns)
@@ -0,0 +1,203 @@
+"""
+End-to-end benchmark of the load and processing pipeline on synthetic data.
+
+    python -m benchmark.run --rows 100000 1000000 --output bench_output.json --baseline previous.json
+
+Every scale loads the given number of synthetic NDT7 and Cloudflare rows into the staging tables, runs every
+processing stage and rebuilds the cities CSV from a synthetic GeoNames dump, recording rows per second, peak RSS
+and the time of every statement. The benchmark runs against the database named by BENCHMARK_DB_NAME, on the
+host and with the credentials of the DB_* settings, and drops and recreates every table in it.
+"""
+
+import argparse
+from datetime import date
+import json
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Any
+
+from dotenv import load_dotenv
+from psycopg2.extensions import connection
+
+from src.bulk_loader import BulkLoader
+from src.config import data_dir
+from src.data_loader import DataLoader
+from src.data_processer import DataProcesser
+from src.database import connect
+from src.enums import DateStage, Tables
+from src.measurement_source import SyntheticSource
+from src.sql.delete_queries import airport_codes_standardize_cities_query, get_truncate_table_query
+from src.sql.drop_queries import drop_tables_query
+from src.sql.insert_queries import city_aliases_refresh_query, reference_data_version_seed_query
+from src.sql.maintenance_queries import get_analyze_table_query
+from src.synthetic import SyntheticWorkload
+from src.table_data import table_data
+from src.utils import generate_cities_csv
+
+from .metrics import (
+    StageResult,
+    TimedSource,
+    TimingCursor,
+    aggregate_timings,
+    find_regressions,
+    get_peak_rss_bytes,
+    split_processing_stages,
+)
+
+BENCHMARK_DAY = date(2024, 1, 15)
+# The cities CSV is rebuilt from a dump with a tenth of the scale's rows, GeoNames' full dump being ~12M cities.
+CITIES_ROWS_RATIO = 10
+
+reset_tables = [
+    Tables.NDT7_TEMP,
+    Tables.CF_TEMP,
+    Tables.UNIFIED_TELEMETRY,
+    Tables.TELEMETRY_ROLLUPS,
+    Tables.TELEMETRY_ROLLUP_HISTOGRAMS,
+    Tables.PROCESSED_DATES,
+    Tables.DATE_STAGES,
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Global Telemetry System benchmark")
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[100_000, 1_000_000],
+        help="Scale factors: synthetic rows per data source (default: 100000 1000000).",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic workload (default: 0).")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", type=Path, help="Results of an earlier run to compare the throughput with.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Throughput drop compared to --baseline, as a fraction, above which the run fails (default: 0.2).",
+    )
+    return parser.parse_args()
+
+
+def set_up_database(conn: connection, workload: SyntheticWorkload, bulk_loader: BulkLoader) -> None:
+    """
+    Recreate every table and fill the reference tables with the workload's cities, airports, ASNs and the best
+    servers of the benchmark month.
+    """
+    with conn.cursor() as cur:
+        cur.execute(drop_tables_query)
+        for data in table_data.values():
+            cur.execute(data["create_query"])
+        cur.execute(reference_data_version_seed_query)
+        bulk_loader.load(cur, Tables.CITIES, workload.cities, "synthetic cities")
+        cur.execute(city_aliases_refresh_query)
+        bulk_loader.load(cur, Tables.AIRPORT_CODES, workload.airports, "synthetic airports")
+        cur.execute(airport_codes_standardize_cities_query)
+        bulk_loader.load(cur, Tables.AS_STATISTICS, workload.as_statistics, "synthetic ASNs")
+        bulk_loader.load(
+            cur, Tables.COUNTRIES_WITH_STARLINK_MEASUREMENTS, workload.countries_with_starlink(), "synthetic countries"
+        )
+        for table in (
+            Tables.NDT_BEST_TERRESTRIAL_SERVERS,
+            Tables.NDT_BEST_STARLINK_SERVERS,
+            Tables.CF_BEST_TERRESTRIAL_SERVERS,
+            Tables.CF_BEST_STARLINK_SERVERS,
+        ):
+            best_servers = workload.best_servers(table, BENCHMARK_DAY.year, BENCHMARK_DAY.month)
+            bulk_loader.load(cur, table, best_servers, f"synthetic {table.value}")
+        for table in table_data:
+            cur.execute(get_analyze_table_query(table.value))
+    conn.commit()
+    TimingCursor.take_timings()
+
+
+def run_scale(conn: connection, workload: SyntheticWorkload, bulk_loader: BulkLoader, rows: int) -> list[StageResult]:
+    results = []
+    with conn.cursor() as cur:
+        for table in reset_tables:
+            cur.execute(get_truncate_table_query(table.value))
+    conn.commit()
+    TimingCursor.take_timings()
+
+    source = TimedSource(SyntheticSource(workload, rows))
+    start_time = time.perf_counter()
+    DataLoader(conn, bulk_loader, source=source).load_data(BENCHMARK_DAY)
+    load_seconds = time.perf_counter() - start_time - source.seconds
+    results.append(StageResult(2 * rows, "generate", source.seconds, get_peak_rss_bytes()))
+    results.append(
+        StageResult(
+            2 * rows,
+            DateStage.EXTRACTED.value,
+            load_seconds,
+            get_peak_rss_bytes(),
+            aggregate_timings(TimingCursor.take_timings()),
+        )
+    )
+
+    DataProcesser(conn).process_data(BENCHMARK_DAY)
+    for stage, timings in split_processing_stages(TimingCursor.take_timings()):
+        seconds = sum(timing.seconds for timing in timings)
+        results.append(StageResult(2 * rows, stage.value, seconds, get_peak_rss_bytes(), timings))
+
+    cities_rows = max(1, rows // CITIES_ROWS_RATIO)
+    workload.write_geonames_files(data_dir, "benchmark-cities.txt", "benchmark-regions.txt", cities_rows)
+    start_time = time.perf_counter()
+    try:
+        generate_cities_csv("benchmark-cities.txt", "benchmark-regions.txt", "benchmark-cities.csv")
+    finally:
+        for file_name in ("benchmark-cities.txt", "benchmark-regions.txt", "benchmark-cities.csv"):
+            (data_dir / file_name).unlink(missing_ok=True)
+    results.append(StageResult(cities_rows, "cities_csv", time.perf_counter() - start_time, get_peak_rss_bytes()))
+    return results
+
+
+def print_results(results: list[StageResult]) -> None:
+    print(f"{'rows':>12} {'stage':<14} {'seconds':>10} {'rows/s':>14} {'peak RSS MiB':>13}")
+    for result in results:
+        print(
+            f"{result.rows:>12} {result.stage:<14} {result.seconds:>10.2f} {result.rows_per_second:>14.0f} "
+            f"{result.peak_rss_bytes / 2**20:>13.0f}"
+        )
+        for timing in result.statements:
+            print(
+                f"{'':>12}   {timing.label:<40} {timing.seconds:>10.3f}s {timing.rowcount:>12} rows "
+                f"({timing.count} statements)"
+            )
+
+
+def main() -> None:
+    args = parse_args()
+    load_dotenv()
+    dbname = os.getenv("BENCHMARK_DB_NAME")
+    if not dbname or dbname == os.getenv("DB_NAME"):
+        sys.exit("Set BENCHMARK_DB_NAME to a database other than DB_NAME; the benchmark drops all its tables.")
+
+    workload = SyntheticWorkload(seed=args.seed)
+    bulk_loader = BulkLoader()
+    conn = connect(dbname=dbname)
+    conn.cursor_factory = TimingCursor
+    results: list[StageResult] = []
+    try:
+        set_up_database(conn, workload, bulk_loader)
+        for rows in args.rows:
+            results.extend(run_scale(conn, workload, bulk_loader, rows))
+    finally:
+        conn.close()
+
+    print_results(results)
+    result_dicts: list[dict[str, Any]] = [result.to_dict() for result in results]
+    if args.output:
+        args.output.write_text(json.dumps(result_dicts, indent=2))
+    if args.baseline:
+        regressions = find_regressions(result_dicts, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Cold-start import budget of the CLI commands.
+
+    python -m benchmark.startup --repeat 5 --budget date=1500
+
+Every command profile imports the modules the command loads in a fresh interpreter started with
+`python -X importtime`, and the median total import time of --repeat runs is compared with the profile's budget.
+The slowest imports of every profile are printed, and the run fails when a profile exceeds its budget.
+"""
+
+import argparse
+from dataclasses import dataclass
+import statistics
+import subprocess
+import sys
+
+IMPORTTIME_PREFIX = "import time:"
+
+# Modules each command imports, on top of src.main which every command imports.
+command_modules = {
+    "help": [],
+    "drop": ["src.table_init"],
+    "update": ["src.table_init", "src.caida_api_queries", "pandas", "requests"],
+    "date": ["src.data_loader", "src.data_processer", "google.cloud.bigquery"],
+    "date-files": ["src.data_loader", "src.data_processer", "pyarrow.parquet", "pyarrow.csv"],
+    "export": ["src.exporter"],
+}
+
+# Budgets in milliseconds of total import time. The commands that touch BigQuery pay for its client library.
+default_budgets_ms = {
+    "help": 300,
+    "drop": 300,
+    "update": 1000,
+    "date": 2500,
+    "date-files": 1500,
+    "export": 1500,
+}
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> list[ImportTiming]:
+    """
+    Parse the `-X importtime` report, whose lines look like `import time:   self [us] | cumulative | package`,
+    the package being indented by two spaces per level of nesting.
+    """
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith(IMPORTTIME_PREFIX):
+            continue
+        self_us, cumulative_us, module = line[len(IMPORTTIME_PREFIX) :].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue
+        name = module.rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        timings.append(ImportTiming(name.strip(), int(self_us), int(cumulative_us), depth))
+    return timings
+
+
+def get_total_us(timings: list[ImportTiming]) -> int:
+    return sum(timing.cumulative_us for timing in timings if timing.depth == 0)
+
+
+def measure_command(command: str) -> list[ImportTiming]:
+    statements = "; ".join(f"import {module}" for module in ["src.main", *command_modules[command]])
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statements], capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def parse_budget(budget: str) -> tuple[str, int]:
+    command, _, milliseconds = budget.partition("=")
+    if command not in command_modules or not milliseconds.isdigit():
+        raise argparse.ArgumentTypeError(
+            f"Expected <command>=<milliseconds> with a command out of {', '.join(command_modules)}, got '{budget}'."
+        )
+    return command, int(milliseconds)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Global Telemetry System startup benchmark")
+    parser.add_argument(
+        "--commands",
+        nargs="+",
+        choices=list(command_modules),
+        default=list(command_modules),
+        help="Command profiles to measure (default: all).",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command, of which the median counts.")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest imports printed per command.")
+    parser.add_argument(
+        "--budget",
+        type=parse_budget,
+        action="append",
+        default=[],
+        help="Override the import time budget of a command, e.g. 'drop=250' (milliseconds). Can be repeated.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    budgets = {**default_budgets_ms, **dict(args.budget)}
+    over_budget = []
+    # A first run compiles any stale bytecode, which would otherwise count towards the first command.
+    measure_command("help")
+    for command in args.commands:
+        runs = [measure_command(command) for _ in range(args.repeat)]
+        total_ms = statistics.median(get_total_us(timings) for timings in runs) / 1000
+        print(f"{command:<12} {total_ms:>8.0f} ms (budget {budgets[command]} ms)")
+        slowest = sorted(runs[-1], key=lambda timing: timing.self_us, reverse=True)[: args.top]
+        for timing in slowest:
+            print(f"{'':<12} {timing.self_us / 1000:>8.1f} ms  {timing.module}")
+        if total_ms > budgets[command]:
+            over_budget.append(command)
+    if over_budget:
+        sys.exit(f"Import time over budget for: {', '.join(over_budget)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Coroutine, Iterable, TypeVar
+
+from .config import logger
+from .enums import Resource
+
+T = TypeVar("T")
+
+
+class AsyncEngine:
+    """
+    Runs the tasks of one command as coroutines in a single event loop.
+
+    The BigQuery client, HTTP downloads and psycopg2 are blocking, so their calls run in worker threads. Every
+    resource has its own concurrency limit: a task waits for a free slot of the resource it is about to use,
+    which lets e.g. BigQuery extracts of some dates overlap with the Postgres processing of others.
+    """
+
+    def __init__(self, limits: dict[Resource, int]) -> None:
+        if any(limit < 1 for limit in limits.values()):
+            raise ValueError(f"Every resource needs a concurrency limit of at least 1, got {limits}.")
+        self._limits = limits
+        self._semaphores: dict[Resource, asyncio.Semaphore] = {}
+
+    def get_limit(self, resource: Resource) -> int:
+        return self._limits[resource]
+
+    def run(self, main: Callable[[], Awaitable[T]]) -> T:
+        return asyncio.run(self._run(main))
+
+    async def run_blocking(self, resource: Resource, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        async with self._semaphores[resource]:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    @staticmethod
+    async def gather(tasks: Iterable[Coroutine[Any, Any, Any]]) -> None:
+        """
+        Wait for all tasks. When one fails, the others are cancelled and its error is raised once the calls
+        already running in threads have returned.
+        """
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                for task in tasks:
+                    task_group.create_task(task)
+        except ExceptionGroup as e:
+            raise e.exceptions[0]
+
+    async def _run(self, main: Callable[[], Awaitable[T]]) -> T:
+        self._semaphores = {resource: asyncio.Semaphore(limit) for resource, limit in self._limits.items()}
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=sum(self._limits.values()), thread_name_prefix="async-engine")
+        )
+        logger.info(
+            "Running with concurrency limits "
+            + ", ".join(f"{resource.value}={limit}" for resource, limit in self._limits.items())
+            + "."
+        )
+        return await main()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import io
+import time
+from typing import TYPE_CHECKING, Iterable
+
+import psycopg2
+from psycopg2.extensions import cursor
+
+from .config import logger
+from .enums import InsertMethod, Tables
+from .sql.copy_queries import (
+    bulk_load_release_savepoint_query,
+    bulk_load_rollback_to_savepoint_query,
+    bulk_load_savepoint_query,
+    get_copy_from_stdin_query,
+)
+from .table_data import table_data
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+class BulkLoader:
+    """
+    Streams DataFrames into Postgres in fixed-size chunks.
+
+    With InsertMethod.COPY every chunk is serialized to an in-memory CSV buffer and sent with
+    COPY ... FROM STDIN. A chunk that violates a unique constraint is retried with the table's
+    execute_values insert query, which keeps the ON CONFLICT DO NOTHING semantics of the staging tables.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, method: InsertMethod = InsertMethod.COPY) -> None:
+        if chunk_size <= 0:
+            raise ValueError(f"Chunk size must be positive, got {chunk_size}.")
+        self._chunk_size = chunk_size
+        self._method = method
+
+    def load(self, cur: cursor, table: Tables, df: DataFrame, dataset_name: str) -> int:
+        return self.load_frames(cur, table, [df], dataset_name)
+
+    def load_frames(self, cur: cursor, table: Tables, frames: Iterable[DataFrame], dataset_name: str) -> int:
+        """
+        Load every frame of the iterable before pulling the next one, so a lazy iterable keeps at most
+        one frame (plus one serialized chunk) in memory.
+        """
+        start_time = time.perf_counter()
+        inserted_rows = 0
+        for df in frames:
+            for offset in range(0, len(df), self._chunk_size):
+                chunk = df.iloc[offset : offset + self._chunk_size]
+                if self._method == InsertMethod.COPY:
+                    self._copy_chunk(cur, table, chunk)
+                else:
+                    self._insert_chunk(cur, table, chunk)
+                inserted_rows += len(chunk)
+        duration = time.perf_counter() - start_time
+        rows_per_second = inserted_rows / duration if duration > 0 else 0.0
+        logger.info(
+            f"Loaded {inserted_rows} rows into {table.value} from {dataset_name} "
+            f"using {self._method.value} in {duration:.2f}s ({rows_per_second:.0f} rows/s)."
+        )
+        return inserted_rows
+
+    def _copy_chunk(self, cur: cursor, table: Tables, chunk: DataFrame) -> None:
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        cur.execute(bulk_load_savepoint_query)
+        try:
+            cur.copy_expert(get_copy_from_stdin_query(table.value, table_data[table]["columns"]), buffer)
+        except psycopg2.errors.UniqueViolation:
+            cur.execute(bulk_load_rollback_to_savepoint_query)
+            logger.warning(f"COPY into {table.value} hit duplicate keys. Retrying chunk with execute_values.")
+            self._insert_chunk(cur, table, chunk)
+        cur.execute(bulk_load_release_savepoint_query)
+
+    def _insert_chunk(self, cur: cursor, table: Tables, chunk: DataFrame) -> None:
+        from psycopg2.extras import execute_values
+
+        chunk = chunk.astype(object).where(chunk.notnull(), None)
+        data_tuples = [tuple(x) for x in chunk.to_records(index=False)]
+        execute_values(cur, table_data[table]["insert_query"], data_tuples)
@@ -4,3 +4,6 @@ from .logger import LogUtils
 
 logger = LogUtils.init_logger()
 data_dir = (Path(__file__).parent / '..' / "data").resolve()
+
+# BigQuery jobs the best-server update runs at the same time, and dates extracted at the same time by --async.
+DEFAULT_MAX_CONCURRENT_JOBS = 4
@@ -19,3 +19,13 @@ class InvalidDateRangeError(ValueError):
         else:
             message = f"Invalid date range: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}. Start date must be before end date."
         super().__init__(message)
+
+
+class ConnectionPoolExhaustedError(RuntimeError):
+    """Raised when no pooled database connection becomes available in time."""
+
+    def __init__(self, max_connections: int, timeout: float) -> None:
+        super().__init__(
+            f"All {max_connections} pooled database connections stayed in use for {timeout:.0f}s. "
+            "Increase --pool-size or lower --workers/--prefetch."
+        )
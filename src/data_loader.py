@@ -1,112 +1,412 @@
-from datetime import date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+import math
+from typing import Iterable, Optional
 
-from google.cloud import bigquery
 from pandas import DataFrame
-from psycopg2 import sql
 from psycopg2.extensions import connection, cursor
-from psycopg2.extras import execute_values
+import pyarrow as pa
 
-from .config import logger
+from .bulk_loader import BulkLoader
+from .config import DEFAULT_MAX_CONCURRENT_JOBS, logger
 from .custom_exceptions import InvalidDateError
-from .enums import CsvFiles, ExecutionDecision, Tables
+from .enums import CsvFiles, DateStage, ExecutionDecision, NetworkType, SpanKind, Tables
 from .logger import LogUtils
+from .measurement_source import BigQuerySource, MeasurementSource
+from .raw_archive import RawArchive, archive_sources
+from .reference_data import ReferenceCache, bump_reference_data_version
 from .sql.bigquery_queries import (
+    get_cf_best_servers_fused_query,
     get_cf_best_servers_query,
-    get_cf_formatted_query,
     get_countries_with_starlink_query,
+    get_ndt_best_servers_fused_query,
     get_ndt_best_servers_query,
-    get_ndt_formatted_query,
 )
-from .sql.delete_queries import delete_all_from_table_query
+from .sql.create_queries import (
+    deferred_indexes_create_query,
+    get_create_index_if_not_exists_query,
+    get_unified_telemetry_partition_create_query,
+    get_unified_telemetry_partition_index_definitions,
+    get_unified_telemetry_partition_name,
+    replay_keys_create_query,
+)
+from .sql.delete_queries import (
+    delete_all_from_table_query,
+    get_best_servers_delete_months_query,
+    get_latency_sketches_delete_day_query,
+    replay_keys_delete_query,
+)
+from .sql.insert_queries import (
+    cf_latency_sketches_fill_query,
+    deferred_indexes_insert_query,
+    get_best_servers_from_sketches_insert_query,
+    ndt7_latency_sketches_fill_query,
+    replay_keys_from_staging_insert_query,
+)
+from .sql.maintenance_queries import get_analyze_table_query
 from .sql.select_queries import (
-    get_top_asns_query,
+    get_best_servers_export_query,
     processed_date_select_query,
+    telemetry_indexes_deferred_select_query,
+    telemetry_partition_lock_query,
+    unified_telemetry_partitioned_select_query,
 )
+from .stage_ledger import get_completed_stage, lock_date, record_stage, reset_staging, staging_has_rows
+from .staging_schema import conform_batch, to_dataframe
 from .table_data import table_data
+from .tracing import Tracer
 from .utils import save_dataframe_to_csv
 
 STARLINK_ASN = "14593"
 
+# Network type selected from a job's result (None for the whole result), destination table and CSV export.
+type BestServersTarget = tuple[Optional[NetworkType], Tables, CsvFiles]
+# BigQuery query, dataset name, targets and first and last day of the months covered by one best server job.
+type BestServersJob = tuple[str, str, list[BestServersTarget], tuple[date, date]]
+
+# Latency sketches map every latency to a logarithmic bucket of width LATENCY_SKETCH_GAMMA, so the value a bucket
+# stands for is within LATENCY_SKETCH_RELATIVE_ACCURACY of every latency counted in it.
+LATENCY_SKETCH_RELATIVE_ACCURACY = 0.01
+LATENCY_SKETCH_GAMMA = (1 + LATENCY_SKETCH_RELATIVE_ACCURACY) / (1 - LATENCY_SKETCH_RELATIVE_ACCURACY)
+
+latency_sketch_fill_queries = {
+    Tables.NDT7_LATENCY_SKETCHES: ndt7_latency_sketches_fill_query,
+    Tables.CF_LATENCY_SKETCHES: cf_latency_sketches_fill_query,
+}
+
+# Best server table, its CSV export, the sketch table it is derived from, network type and server key columns.
+best_servers_sketch_sources = [
+    (
+        Tables.NDT_BEST_TERRESTRIAL_SERVERS,
+        CsvFiles.NDT_BEST_TERRESTRIAL_SERVERS,
+        Tables.NDT7_LATENCY_SKETCHES,
+        NetworkType.TERRESTRIAL,
+        ("server_city", "server_country_code"),
+    ),
+    (
+        Tables.NDT_BEST_STARLINK_SERVERS,
+        CsvFiles.NDT_BEST_STARLINK_SERVERS,
+        Tables.NDT7_LATENCY_SKETCHES,
+        NetworkType.STARLINK,
+        ("server_city", "server_country_code"),
+    ),
+    (
+        Tables.CF_BEST_TERRESTRIAL_SERVERS,
+        CsvFiles.CF_BEST_TERRESTRIAL_SERVERS,
+        Tables.CF_LATENCY_SKETCHES,
+        NetworkType.TERRESTRIAL,
+        ("server_airport_code",),
+    ),
+    (
+        Tables.CF_BEST_STARLINK_SERVERS,
+        CsvFiles.CF_BEST_STARLINK_SERVERS,
+        Tables.CF_LATENCY_SKETCHES,
+        NetworkType.STARLINK,
+        ("server_airport_code",),
+    ),
+]
+
 
 class DataLoader:
-    def __init__(self, conn: connection) -> None:
+    def __init__(
+        self,
+        conn: connection,
+        bulk_loader: BulkLoader,
+        max_memory_mb: Optional[int] = None,
+        archive: Optional[RawArchive] = None,
+        reference_cache: Optional[ReferenceCache] = None,
+        sketch_latencies: bool = False,
+        source: Optional[MeasurementSource] = None,
+    ) -> None:
+        """
+        @param source: source of the daily measurements. Defaults to BigQuery, which also serves the best servers
+        and the countries with Starlink whatever the source; its client is only created once it is needed.
+        """
         self._conn = conn
-        self._client = bigquery.Client(project="measurement-lab")
+        self._bulk_loader = bulk_loader
+        self._max_memory_mb = max_memory_mb
+        self._archive = archive
+        self._reference_cache = reference_cache or ReferenceCache()
+        self._sketch_latencies = sketch_latencies
+        self._telemetry_partitioned: Optional[bool] = None
+        self._telemetry_months: set[date] = set()
+        self._bigquery = source if isinstance(source, BigQuerySource) else None
+        self._source = source
 
     @LogUtils.log_function
     def load_data(
         self, date: date, skip_inserted_dates: bool = False, starlink_only: bool = False
     ) -> ExecutionDecision:
+        """
+        Extract the date from the measurement source into the staging tables. A date still staged on this connection by an
+        interrupted run is not downloaded again; process_data continues it after its last completed stage.
+        """
+        self._ensure_telemetry_partition(date)
         with self._conn.cursor() as cur:
+            if not lock_date(cur, date):
+                self._conn.rollback()
+                logger.info(f"Skipping data loading for {date.strftime('%Y-%m-%d')} as another worker is loading it.")
+                return ExecutionDecision.SKIP
             if (
                 result := self._check_date(cur, date, skip_inserted_dates=skip_inserted_dates)
             ) == ExecutionDecision.SKIP:
+                self._conn.rollback()
                 logger.info(f"Skipping data loading for {date.strftime('%Y-%m-%d')} as it has already been processed.")
                 return result
-            asns = "14593" if starlink_only else self._get_top_asns(cur, includes_starlink=True)
-            ndt7_query = get_ndt_formatted_query(date.strftime("%Y-%m-%d"), asns)
-            cf_query = get_cf_formatted_query(date.strftime("%Y-%m-%d"), asns)
-            self._download_data(cur, ndt7_query, table_data[Tables.NDT7_TEMP]["insert_query"], 'NDT7')
-            self._download_data(cur, cf_query, table_data[Tables.CF_TEMP]["insert_query"], 'Cloudflare')
-            self._insert_processed_date(cur, date)
-            self._conn.commit()
+            if (stage := get_completed_stage(cur, date)) is not None and staging_has_rows(cur):
+                self._conn.rollback()
+                logger.info(f"Resuming {date.strftime('%Y-%m-%d')} after its {stage.value} stage.")
+                return ExecutionDecision.OK
+            with Tracer.span(DateStage.EXTRACTED.value, kind=SpanKind.STAGE, date=date.isoformat()):
+                reset_staging(cur)
+                asns = STARLINK_ASN if starlink_only else self._get_top_asns(cur, includes_starlink=True)
+                self._load_measurements(cur, Tables.NDT7_TEMP, date, asns, 'NDT7')
+                self._load_measurements(cur, Tables.CF_TEMP, date, asns, 'Cloudflare')
+                cur.execute(get_analyze_table_query(Tables.NDT7_TEMP.value))
+                cur.execute(get_analyze_table_query(Tables.CF_TEMP.value))
+                if self._sketch_latencies:
+                    network_types = [NetworkType.STARLINK] if starlink_only else list(NetworkType)
+                    self._store_latency_sketches(cur, date, network_types)
+                record_stage(cur, date, DateStage.EXTRACTED)
+                self._conn.commit()
         return ExecutionDecision.OK
 
     @LogUtils.log_function
-    def update_best_servers(self, date_from: date, date_to: date) -> None:
+    def replay_data(self, date: date, archive: RawArchive) -> ExecutionDecision:
         """
-        Update best servers for the given date range.
+        Load the archived extracts of the date into the staging tables instead of reading the measurement source.
 
-        @param date_from: is the first day of a month
-        @param date_to: is the last day of the month.
+        The keys of the replayed measurements are recorded in replay_keys. Processing the date with replace=True
+        deletes the rows with those keys from unified_telemetry in the transaction that merges the replayed rows,
+        validated and standardized against the current reference tables, so a failed replay leaves the rows and the
+        processed date in place.
         """
+        if not all(archive.contains(table, date) for table in archive_sources):
+            logger.warning(f"No archived extract for {date.strftime('%Y-%m-%d')}. Skipping replay.")
+            return ExecutionDecision.SKIP
+        self._ensure_telemetry_partition(date)
         with self._conn.cursor() as cur:
-            top_asns = self._get_top_asns(cur, includes_starlink=False)
+            if not lock_date(cur, date):
+                self._conn.rollback()
+                logger.info(f"Skipping replay for {date.strftime('%Y-%m-%d')} as another worker is loading it.")
+                return ExecutionDecision.SKIP
+            with Tracer.span(DateStage.EXTRACTED.value, kind=SpanKind.STAGE, date=date.isoformat()):
+                reset_staging(cur)
+                self._bulk_loader.load_frames(
+                    cur, Tables.NDT7_TEMP, archive.read(Tables.NDT7_TEMP, date), 'NDT7 archive'
+                )
+                self._bulk_loader.load_frames(
+                    cur, Tables.CF_TEMP, archive.read(Tables.CF_TEMP, date), 'Cloudflare archive'
+                )
+                cur.execute(replay_keys_create_query)
+                cur.execute(replay_keys_delete_query, (date.strftime("%Y-%m-%d"),))
+                cur.execute(replay_keys_from_staging_insert_query, (date.strftime("%Y-%m-%d"),))
+                logger.info(f"Recorded {cur.rowcount} replayed records to replace when the date is merged.")
+                cur.execute(get_analyze_table_query(Tables.NDT7_TEMP.value))
+                cur.execute(get_analyze_table_query(Tables.CF_TEMP.value))
+                if self._sketch_latencies:
+                    self._store_latency_sketches(cur, date, list(NetworkType))
+                record_stage(cur, date, DateStage.EXTRACTED)
+                self._conn.commit()
+        return ExecutionDecision.OK
 
-            ndt_terrestrial_query = get_ndt_best_servers_query(
-                date_from.strftime("%Y-%m-%d"), date_to.strftime("%Y-%m-%d"), top_asns
-            )
-            ndt_terrestrial_df = self._download_data(
-                cur,
-                ndt_terrestrial_query,
-                table_data[Tables.NDT_BEST_TERRESTRIAL_SERVERS]["insert_query"],
-                'NDT7 Best Terrestrial Servers',
-            )
-            save_dataframe_to_csv(ndt_terrestrial_df, CsvFiles.NDT_BEST_TERRESTRIAL_SERVERS.value, append=True)
+    @LogUtils.log_function
+    def update_best_servers(
+        self,
+        months: list[tuple[date, date]],
+        max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS,
+        fused: bool = False,
+    ) -> None:
+        """
+        Update best servers for the given months.
 
-            ndt_starlink_query = get_ndt_best_servers_query(
-                date_from.strftime("%Y-%m-%d"), date_to.strftime("%Y-%m-%d"), STARLINK_ASN
-            )
-            ndt_starlink_df = self._download_data(
-                cur,
-                ndt_starlink_query,
-                table_data[Tables.NDT_BEST_STARLINK_SERVERS]["insert_query"],
-                'NDT7 Best Starlink Servers',
-            )
-            save_dataframe_to_csv(ndt_starlink_df, CsvFiles.NDT_BEST_STARLINK_SERVERS.value, append=True)
+        The BigQuery jobs are submitted up front and run with at most max_concurrent_jobs in flight. Each result
+        is written to Postgres and its CSV files as soon as its job completes.
 
-            cf_terrestrial_query = get_cf_best_servers_query(
-                date_from.strftime("%Y-%m-%d"), date_to.strftime("%Y-%m-%d"), top_asns
-            )
-            cf_terrestrial_df = self._download_data(
-                cur,
-                cf_terrestrial_query,
-                table_data[Tables.CF_BEST_TERRESTRIAL_SERVERS]["insert_query"],
-                'Cloudflare Best Terrestrial Servers',
-            )
-            save_dataframe_to_csv(cf_terrestrial_df, CsvFiles.CF_BEST_TERRESTRIAL_SERVERS.value, append=True)
+        Rows the best server tables already hold for a job's months are replaced.
 
-            cf_starlink_query = get_cf_best_servers_query(
-                date_from.strftime("%Y-%m-%d"), date_to.strftime("%Y-%m-%d"), STARLINK_ASN
-            )
-            cf_starlink_df = self._download_data(
-                cur,
-                cf_starlink_query,
-                table_data[Tables.CF_BEST_STARLINK_SERVERS]["insert_query"],
-                'Cloudflare Best Starlink Servers',
-            )
-            save_dataframe_to_csv(cf_starlink_df, CsvFiles.CF_BEST_STARLINK_SERVERS.value, append=True)
+        @param months: pairs of the first and last day of a month, in ascending order.
+        @param max_concurrent_jobs: maximum number of BigQuery jobs running at the same time.
+        @param fused: scan each data source once per run of consecutive months, for both network types, instead
+        of running four jobs per month. The result is split locally into the terrestrial and Starlink tables.
+        """
+        if max_concurrent_jobs <= 0:
+            raise ValueError(f"The number of concurrent jobs must be positive, got {max_concurrent_jobs}.")
+        if not months:
+            return
+        with self._conn.cursor() as cur:
+            jobs = self._get_best_servers_jobs(cur, months, fused)
+            self._run_best_servers_jobs(cur, jobs, max_concurrent_jobs)
+
+    def estimate_best_servers_bytes(
+        self, months: list[tuple[date, date]], fused: bool = False
+    ) -> list[tuple[str, int]]:
+        """
+        Dry-run the BigQuery jobs update_best_servers would run.
+
+        @return: the dataset name and the number of bytes BigQuery would process for every job.
+        """
+        with self._conn.cursor() as cur:
+            jobs = self._get_best_servers_jobs(cur, months, fused) if months else []
+        bigquery_source = self._get_bigquery()
+        return [(dataset_name, bigquery_source.estimate_query_bytes(query)) for query, dataset_name, _, _ in jobs]
+
+    def estimate_load_bytes(self, date: date, starlink_only: bool = False) -> int:
+        """
+        Estimate the NDT7 and Cloudflare measurements load_data would read for the date, with a dry run on BigQuery.
+
+        @return: the number of bytes the measurement source would process.
+        """
+        with self._conn.cursor() as cur:
+            asns = STARLINK_ASN if starlink_only else self._get_top_asns(cur, includes_starlink=True)
+        source = self._get_source()
+        return sum(source.estimate_day_bytes(table, date, asns) for table in (Tables.NDT7_TEMP, Tables.CF_TEMP))
+
+    def _get_best_servers_jobs(self, cur: cursor, months: list[tuple[date, date]], fused: bool) -> list[BestServersJob]:
+        top_asns = self._get_top_asns(cur, includes_starlink=False)
+        if fused:
+            return [
+                job
+                for date_from, date_to in self._consecutive_month_runs(months)
+                for job in self._fused_best_servers_jobs(date_from, date_to, top_asns)
+            ]
+        return [job for date_from, date_to in months for job in self._best_servers_jobs(date_from, date_to, top_asns)]
+
+    @staticmethod
+    def _consecutive_month_runs(months: list[tuple[date, date]]) -> list[tuple[date, date]]:
+        runs: list[tuple[date, date]] = []
+        for date_from, date_to in months:
+            if runs and runs[-1][1] + timedelta(days=1) == date_from:
+                runs[-1] = (runs[-1][0], date_to)
+            else:
+                runs.append((date_from, date_to))
+        return runs
+
+    def _run_best_servers_jobs(self, cur: cursor, jobs: list[BestServersJob], max_concurrent_jobs: int) -> None:
+        logger.info(f"Submitting {len(jobs)} best server jobs with up to {max_concurrent_jobs} in flight.")
+        executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="best-servers-job")
+        try:
+            futures = {
+                executor.submit(self._get_bigquery().query_dataframe, query, dataset_name): (
+                    dataset_name,
+                    targets,
+                    months,
+                )
+                for query, dataset_name, targets, months in jobs
+            }
+            for future in as_completed(futures):
+                dataset_name, targets, (date_from, date_to) = futures[future]
+                df = future.result()
+                months_params = {
+                    "year_month_from": date_from.year * 100 + date_from.month,
+                    "year_month_to": date_to.year * 100 + date_to.month,
+                }
+                for network_type, table, csv_file in targets:
+                    target_df = df if network_type is None else self._select_network_type(df, network_type)
+                    cur.execute(get_best_servers_delete_months_query(table.value), months_params)
+                    self._bulk_loader.load(cur, table, target_df, dataset_name)
+                    save_dataframe_to_csv(target_df, csv_file.value, append=True)
+                self._conn.commit()
+        finally:
+            executor.shutdown(cancel_futures=True)
 
+    @staticmethod
+    def _select_network_type(df: DataFrame, network_type: NetworkType) -> DataFrame:
+        return df[df["network_type"] == network_type.value].drop(columns="network_type")
+
+    @staticmethod
+    def _best_servers_jobs(date_from: date, date_to: date, top_asns: str) -> list[BestServersJob]:
+        month = date_from.strftime("%Y-%m")
+        date_from_str = date_from.strftime("%Y-%m-%d")
+        date_to_str = date_to.strftime("%Y-%m-%d")
+        return [
+            (
+                get_ndt_best_servers_query(date_from_str, date_to_str, top_asns),
+                f'NDT7 Best Terrestrial Servers {month}',
+                [(None, Tables.NDT_BEST_TERRESTRIAL_SERVERS, CsvFiles.NDT_BEST_TERRESTRIAL_SERVERS)],
+                (date_from, date_to),
+            ),
+            (
+                get_ndt_best_servers_query(date_from_str, date_to_str, STARLINK_ASN),
+                f'NDT7 Best Starlink Servers {month}',
+                [(None, Tables.NDT_BEST_STARLINK_SERVERS, CsvFiles.NDT_BEST_STARLINK_SERVERS)],
+                (date_from, date_to),
+            ),
+            (
+                get_cf_best_servers_query(date_from_str, date_to_str, top_asns),
+                f'Cloudflare Best Terrestrial Servers {month}',
+                [(None, Tables.CF_BEST_TERRESTRIAL_SERVERS, CsvFiles.CF_BEST_TERRESTRIAL_SERVERS)],
+                (date_from, date_to),
+            ),
+            (
+                get_cf_best_servers_query(date_from_str, date_to_str, STARLINK_ASN),
+                f'Cloudflare Best Starlink Servers {month}',
+                [(None, Tables.CF_BEST_STARLINK_SERVERS, CsvFiles.CF_BEST_STARLINK_SERVERS)],
+                (date_from, date_to),
+            ),
+        ]
+
+    @staticmethod
+    def _fused_best_servers_jobs(date_from: date, date_to: date, top_asns: str) -> list[BestServersJob]:
+        months = f"{date_from.strftime('%Y-%m')} to {date_to.strftime('%Y-%m')}"
+        date_from_str = date_from.strftime("%Y-%m-%d")
+        date_to_str = date_to.strftime("%Y-%m-%d")
+        return [
+            (
+                get_ndt_best_servers_fused_query(date_from_str, date_to_str, top_asns),
+                f'NDT7 Best Servers {months}',
+                [
+                    (
+                        NetworkType.TERRESTRIAL,
+                        Tables.NDT_BEST_TERRESTRIAL_SERVERS,
+                        CsvFiles.NDT_BEST_TERRESTRIAL_SERVERS,
+                    ),
+                    (NetworkType.STARLINK, Tables.NDT_BEST_STARLINK_SERVERS, CsvFiles.NDT_BEST_STARLINK_SERVERS),
+                ],
+                (date_from, date_to),
+            ),
+            (
+                get_cf_best_servers_fused_query(date_from_str, date_to_str, top_asns),
+                f'Cloudflare Best Servers {months}',
+                [
+                    (NetworkType.TERRESTRIAL, Tables.CF_BEST_TERRESTRIAL_SERVERS, CsvFiles.CF_BEST_TERRESTRIAL_SERVERS),
+                    (NetworkType.STARLINK, Tables.CF_BEST_STARLINK_SERVERS, CsvFiles.CF_BEST_STARLINK_SERVERS),
+                ],
+                (date_from, date_to),
+            ),
+        ]
+
+    @LogUtils.log_function
+    def update_best_servers_from_sketches(self, date_from: date, date_to: date, quantile: float = 0.01) -> None:
+        """
+        Derive the best servers of the given months from the stored latency sketches, without querying BigQuery.
+
+        Like the BigQuery queries, a server is a best server of a client city when one of its latencies is at
+        most the given quantile of all latencies of that city, computed separately for download and upload.
+        Rows of the months are replaced, and every best server table is exported again to its CSV file.
+
+        @param date_from: is the first day of the first month.
+        @param date_to: is any day of the last month.
+        @param quantile: latency quantile a server has to reach, between 0 and 1.
+        """
+        if not 0 < quantile < 1:
+            raise ValueError(f"The quantile must be between 0 and 1, got {quantile}.")
+        params = {
+            "year_month_from": date_from.year * 100 + date_from.month,
+            "year_month_to": date_to.year * 100 + date_to.month,
+            "quantile": quantile,
+        }
+        with self._conn.cursor() as cur:
+            for table, csv_file, sketch_table, network_type, server_columns in best_servers_sketch_sources:
+                cur.execute(get_best_servers_delete_months_query(table.value), params)
+                cur.execute(
+                    get_best_servers_from_sketches_insert_query(table.value, sketch_table.value, server_columns),
+                    {**params, "network_type": network_type.value},
+                )
+                logger.info(f"Derived {cur.rowcount} best servers into {table.value} from {sketch_table.value}.")
+                columns = table_data[table]["columns"]
+                cur.execute(get_best_servers_export_query(table.value, columns))
+                save_dataframe_to_csv(DataFrame(cur.fetchall(), columns=list(columns)), csv_file.value)
             self._conn.commit()
 
     @LogUtils.log_function
@@ -121,12 +421,67 @@ class DataLoader:
             df = self._download_data(
                 cur,
                 download_query,
-                table_data[Tables.COUNTRIES_WITH_STARLINK_MEASUREMENTS]["insert_query"],
+                Tables.COUNTRIES_WITH_STARLINK_MEASUREMENTS,
                 'Countries with Starlink Measurements',
             )
             save_dataframe_to_csv(df, CsvFiles.COUNTRIES_WITH_STARLINK_MEASUREMENTS.value)
+            bump_reference_data_version(cur)
             self._conn.commit()
 
+    def _ensure_telemetry_partition(self, date_to_process: date) -> None:
+        """
+        Create the month partition of unified_telemetry for the date if the table is partitioned. The partition
+        is committed right away so concurrent workers do not wait on each other's day-long load transactions.
+
+        While a bulk load has deferred the indexes of unified_telemetry, the partition's indexes are recorded in
+        deferred_indexes instead of being built, so the bulk load builds them once at its end.
+        """
+        month_start = date_to_process.replace(day=1)
+        if month_start in self._telemetry_months:
+            return
+        with self._conn.cursor() as cur:
+            if self._telemetry_partitioned is None:
+                cur.execute(unified_telemetry_partitioned_select_query)
+                row = cur.fetchone()
+                self._telemetry_partitioned = row is not None and bool(row[0])
+            if self._telemetry_partitioned:
+                cur.execute(telemetry_partition_lock_query)
+                cur.execute(get_unified_telemetry_partition_create_query(month_start))
+                self._ensure_telemetry_partition_indexes(cur, month_start)
+                logger.info(f"Ensured unified_telemetry partition for {month_start.strftime('%Y-%m')}.")
+        self._conn.commit()
+        self._telemetry_months.add(month_start)
+
+    @staticmethod
+    def _ensure_telemetry_partition_indexes(cur: cursor, month_start: date) -> None:
+        cur.execute(deferred_indexes_create_query)
+        cur.execute(telemetry_indexes_deferred_select_query)
+        row = cur.fetchone()
+        deferred = row is not None and bool(row[0])
+        partition = get_unified_telemetry_partition_name(month_start)
+        for index_name, definition in get_unified_telemetry_partition_index_definitions(month_start).items():
+            if deferred:
+                cur.execute(deferred_indexes_insert_query, ((index_name, partition, definition, False),))
+            else:
+                cur.execute(get_create_index_if_not_exists_query(definition))
+        if deferred:
+            logger.info(f"Deferred the indexes of {partition} until the bulk load ends.")
+
+    def _store_latency_sketches(self, cur: cursor, date_to_process: date, network_types: list[NetworkType]) -> None:
+        """
+        Replace the latency sketches of the date with the latencies in the staging tables. The staging tables still
+        hold the raw city names here, the same names the best server tables are keyed by.
+        """
+        params = {
+            "sketch_date": date_to_process.strftime("%Y-%m-%d"),
+            "network_types": [network_type.value for network_type in network_types],
+            "log_gamma": math.log(LATENCY_SKETCH_GAMMA),
+        }
+        for table, fill_query in latency_sketch_fill_queries.items():
+            cur.execute(get_latency_sketches_delete_day_query(table.value), params)
+            cur.execute(fill_query, params)
+            logger.info(f"Stored {cur.rowcount} latency sketch buckets in {table.value}.")
+
     def _check_date(self, cur: cursor, date_to_process: date, skip_inserted_dates: bool = False) -> ExecutionDecision:
         cur.execute(processed_date_select_query, (date_to_process.strftime("%Y-%m-%d"),))
         if cur.fetchone():
@@ -139,33 +494,40 @@ class DataLoader:
         logger.info(f"Date {date_to_process.strftime('%Y-%m-%d')} is valid for processing.")
         return ExecutionDecision.OK
 
-    def _insert_processed_date(self, cur: cursor, date_to_process: date) -> None:
-        data_tuples = [(date_to_process.strftime("%Y-%m-%d"),)]
-        execute_values(cur, table_data[Tables.PROCESSED_DATES]["insert_query"], data_tuples)
-        logger.info(f"Inserted processed date: {date_to_process.strftime('%Y-%m-%d')} into the database.")
+    def _get_bigquery(self) -> BigQuerySource:
+        if self._bigquery is None:
+            self._bigquery = BigQuerySource(self._max_memory_mb)
+        return self._bigquery
 
-    def _download_data(
-        self,
-        cur: cursor,
-        download_query: str,
-        insert_query: sql.SQL,
-        dataset_name: str,
-    ) -> DataFrame:
-        df: DataFrame = self._client.query(download_query).to_dataframe()
-        logger.info(f"Downloaded {len(df)} rows from BigQuery from {dataset_name}.")
-        df.replace('', None, inplace=True)
-        df = df.astype(object).where(df.notnull(), None)
-        data_tuples = [tuple(x) for x in df.to_records(index=False)]
-        execute_values(cur, insert_query, data_tuples)
-        logger.info(f"Inserted {len(data_tuples)} rows into the database from {dataset_name}.")
+    def _get_source(self) -> MeasurementSource:
+        return self._source or self._get_bigquery()
+
+    def _download_data(self, cur: cursor, download_query: str, table: Tables, dataset_name: str) -> DataFrame:
+        df = self._get_bigquery().query_dataframe(download_query, dataset_name)
+        self._bulk_loader.load(cur, table, df, dataset_name)
         return df
 
+    def _load_measurements(self, cur: cursor, table: Tables, day: date, asns: str, dataset_name: str) -> int:
+        """
+        Load the day's measurements batch by batch, so at most one batch is held in memory at a time.
+        """
+        batches = self._get_source().read_day(table, day, asns)
+        frames = (self._to_dataframe(batch, table) for batch in batches)
+        return self._bulk_loader.load_frames(cur, table, self._archived(frames, table, day), dataset_name)
+
+    @staticmethod
+    def _to_dataframe(batch: pa.RecordBatch, table: Tables) -> DataFrame:
+        Tracer.add(num_bytes=batch.nbytes)
+        return to_dataframe(conform_batch(batch, table))
+
+    def _archived(self, frames: Iterable[DataFrame], table: Tables, archive_date: date) -> Iterable[DataFrame]:
+        if self._archive is None:
+            return frames
+        return self._archive.write(table, archive_date, frames)
+
     def _get_top_asns(self, cur: cursor, includes_starlink: bool) -> str:
-        query = get_top_asns_query(includes_starlink=includes_starlink)
-        cur.execute(query)
-        row = cur.fetchone()
-        if not row:
+        isps_str = self._reference_cache.get_snapshot(cur).get_top_asns(includes_starlink)
+        if not isps_str:
             logger.warning("No ISPs found in the database. Using default ISPs.")
-            return "14593"
-        isps_str: str = row[0]
+            return STARLINK_ASN
         return isps_str
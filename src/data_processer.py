@@ -1,12 +1,20 @@
-from psycopg2.extensions import connection
+from datetime import date
+from functools import partial
+from typing import Callable
+
+from psycopg2.extensions import connection, cursor
+from psycopg2.extras import execute_values
 
 from .config import logger
-from .enums import Tables
+from .enums import DateStage, SpanKind, Tables
 from .logger import LogUtils
 from .sql.delete_queries import (
-    delete_all_from_table_query,
     get_cf_temp_delete_invalid_servers_query,
     get_ndt7_temp_delete_invalid_servers_query,
+    get_truncate_table_query,
+    processed_date_delete_query,
+    replay_keys_delete_query,
+    unified_telemetry_delete_replayed_query,
 )
 from .sql.insert_queries import (
     global_telemetry_from_cf_insert_query,
@@ -17,6 +25,9 @@ from .sql.update_queries import (
     ndt_temp_standardize_client_cities_query,
     ndt_temp_standardize_server_cities_query,
 )
+from .stage_ledger import get_completed_stage, is_stage_completed, lock_date, record_stage
+from .table_data import table_data
+from .tracing import Tracer
 
 
 class DataProcesser:
@@ -24,54 +35,107 @@ class DataProcesser:
         self._conn = conn
 
     @LogUtils.log_function
-    def process_data(self) -> None:
-        with self._conn.cursor() as cur:
+    def process_data(self, date: date, replace: bool = False) -> None:
+        """
+        Run the stages of the staged date that are not completed yet. Every stage is committed together with its
+        date_stages entry, so a failed run resumes after the last committed stage.
 
-            ndt7_invalid_terrestrial_servers_query = get_ndt7_temp_delete_invalid_servers_query(
-                Tables.NDT_BEST_TERRESTRIAL_SERVERS.value
-            )
-            cur.execute(ndt7_invalid_terrestrial_servers_query)
-            logger.info(f"Deleted {cur.rowcount} invalid NDT7 terrestrial servers.")
+        @param replace: whether the merge first deletes the rows recorded in replay_keys by a replay of the date.
+        """
+        stages: list[tuple[DateStage, Callable[..., None]]] = [
+            (DateStage.VALIDATED, self._validate),
+            (DateStage.STANDARDIZED, self._standardize),
+            (DateStage.MERGED, partial(self._merge, replace=replace)),
+        ]
+        for stage, run_stage in stages:
+            with self._conn.cursor() as cur:
+                if not lock_date(cur, date):
+                    self._conn.rollback()
+                    logger.info(f"Skipping processing of {date.strftime('%Y-%m-%d')} as another worker holds it.")
+                    return
+                completed_stage = get_completed_stage(cur, date)
+                if completed_stage is None:
+                    self._conn.rollback()
+                    logger.warning(f"No staged data for {date.strftime('%Y-%m-%d')} on this connection.")
+                    return
+                if is_stage_completed(stage, completed_stage):
+                    self._conn.rollback()
+                    continue
+                with Tracer.span(stage.value, kind=SpanKind.STAGE, date=date.isoformat()):
+                    run_stage(cur, date)
+                    record_stage(cur, date, stage)
+                    self._conn.commit()
+        logger.info("Data processing completed successfully.")
 
-            ndt7_invalid_starlink_servers_query = get_ndt7_temp_delete_invalid_servers_query(
-                Tables.NDT_BEST_STARLINK_SERVERS.value
-            )
-            cur.execute(ndt7_invalid_starlink_servers_query)
-            logger.info(f"Deleted {cur.rowcount} invalid NDT7 starlink servers.")
+    def _validate(self, cur: cursor, date_to_process: date) -> None:
+        ndt7_invalid_terrestrial_servers_query = get_ndt7_temp_delete_invalid_servers_query(
+            Tables.NDT_BEST_TERRESTRIAL_SERVERS.value
+        )
+        cur.execute(ndt7_invalid_terrestrial_servers_query)
+        logger.info(f"Deleted {cur.rowcount} invalid NDT7 terrestrial servers.")
 
-            cur.execute(ndt_temp_standardize_client_cities_query)
-            logger.info(f"Standardized {cur.rowcount} NDT7 client cities.")
-            cur.execute(ndt_temp_standardize_server_cities_query)
-            logger.info(f"Standardized {cur.rowcount} NDT7 server cities.")
+        ndt7_invalid_starlink_servers_query = get_ndt7_temp_delete_invalid_servers_query(
+            Tables.NDT_BEST_STARLINK_SERVERS.value
+        )
+        cur.execute(ndt7_invalid_starlink_servers_query)
+        logger.info(f"Deleted {cur.rowcount} invalid NDT7 starlink servers.")
 
-            cur.execute(global_telemetry_from_ndt_insert_query)
-            logger.info(f"Inserted {cur.rowcount} global telemetry records from NDT7 into the database.")
+        cf_invalid_terrestrial_servers_query = get_cf_temp_delete_invalid_servers_query(
+            Tables.CF_BEST_TERRESTRIAL_SERVERS.value
+        )
+        cur.execute(cf_invalid_terrestrial_servers_query)
+        logger.info(f"Deleted {cur.rowcount} invalid Cloudflare terrestrial servers.")
 
-            ndt7_delete_query = delete_all_from_table_query(Tables.NDT7_TEMP.value)
-            cur.execute(ndt7_delete_query)
-            logger.info(f"Deleted {cur.rowcount} NDT7 temporary records after processing.")
+        cf_invalid_starlink_servers_query = get_cf_temp_delete_invalid_servers_query(
+            Tables.CF_BEST_STARLINK_SERVERS.value
+        )
+        cur.execute(cf_invalid_starlink_servers_query)
+        logger.info(f"Deleted {cur.rowcount} invalid Cloudflare starlink servers.")
 
-            cf_invalid_terrestrial_servers_query = get_cf_temp_delete_invalid_servers_query(
-                Tables.CF_BEST_TERRESTRIAL_SERVERS.value
-            )
-            cur.execute(cf_invalid_terrestrial_servers_query)
-            logger.info(f"Deleted {cur.rowcount} invalid Cloudflare terrestrial servers.")
+    def _standardize(self, cur: cursor, date_to_process: date) -> None:
+        cur.execute(ndt_temp_standardize_client_cities_query)
+        logger.info(f"Standardized {cur.rowcount} NDT7 client cities.")
+        cur.execute(ndt_temp_standardize_server_cities_query)
+        logger.info(f"Standardized {cur.rowcount} NDT7 server cities.")
 
-            cf_invalid_starlink_servers_query = get_cf_temp_delete_invalid_servers_query(
-                Tables.CF_BEST_STARLINK_SERVERS.value
+        cur.execute(cf_temp_standardize_cities_query)
+        logger.info(f"Standardized {cur.rowcount} Cloudflare client cities.")
+
+    def _merge(self, cur: cursor, date_to_process: date, replace: bool = False) -> None:
+        """
+        Insert the staged measurements into unified_telemetry and add the inserted rows to the day and month
+        rollups in the same statements, so measurements that were already merged are not counted twice. With
+        replace, the rows a replay replaces are deleted and subtracted from the rollups first, in the same
+        transaction.
+        """
+        if replace:
+            cur.execute(unified_telemetry_delete_replayed_query, (date_to_process.strftime("%Y-%m-%d"),))
+            logger.info(
+                f"Deleted {self._fetch_count(cur)} unified telemetry records that are replaced by the replay, "
+                "and subtracted them from the rollups."
             )
-            cur.execute(cf_invalid_starlink_servers_query)
-            logger.info(f"Deleted {cur.rowcount} invalid Cloudflare starlink servers.")
+            cur.execute(replay_keys_delete_query, (date_to_process.strftime("%Y-%m-%d"),))
+            cur.execute(processed_date_delete_query, (date_to_process.strftime("%Y-%m-%d"),))
+
+        cur.execute(global_telemetry_from_ndt_insert_query)
+        logger.info(f"Inserted {self._fetch_count(cur)} global telemetry records from NDT7 into the database.")
+
+        ndt7_truncate_query = get_truncate_table_query(Tables.NDT7_TEMP.value)
+        cur.execute(ndt7_truncate_query)
+        logger.info("Truncated NDT7 temporary records after processing.")
 
-            cur.execute(cf_temp_standardize_cities_query)
-            logger.info(f"Standardized {cur.rowcount} Cloudflare client cities.")
+        cur.execute(global_telemetry_from_cf_insert_query)
+        logger.info(f"Inserted {self._fetch_count(cur)} global telemetry records from Cloudflare into the database.")
 
-            cur.execute(global_telemetry_from_cf_insert_query)
-            logger.info(f"Inserted {cur.rowcount} global telemetry records from Cloudflare into the database.")
+        cf_truncate_query = get_truncate_table_query(Tables.CF_TEMP.value)
+        cur.execute(cf_truncate_query)
+        logger.info("Truncated Cloudflare temporary records after processing.")
 
-            cf_delete_query = delete_all_from_table_query(Tables.CF_TEMP.value)
-            cur.execute(cf_delete_query)
-            logger.info(f"Deleted {cur.rowcount} Cloudflare temporary records after processing.")
+        data_tuples = [(date_to_process.strftime("%Y-%m-%d"),)]
+        execute_values(cur, table_data[Tables.PROCESSED_DATES]["insert_query"], data_tuples)
+        logger.info(f"Inserted processed date: {date_to_process.strftime('%Y-%m-%d')} into the database.")
 
-            self._conn.commit()
-            logger.info("Data processing completed successfully.")
+    @staticmethod
+    def _fetch_count(cur: cursor) -> int:
+        row = cur.fetchone()
+        return int(row[0]) if row is not None else 0
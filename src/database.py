@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+import os
+import threading
+from typing import Any, Iterator, Optional
+
+import psycopg2
+from psycopg2.extensions import connection, cursor
+from psycopg2.pool import ThreadedConnectionPool
+
+from .config import logger
+from .custom_exceptions import ConnectionPoolExhaustedError
+from .sql.session_queries import health_check_query, reset_session_query
+
+# How long a unit of work waits for a pooled connection before giving up.
+POOL_CHECKOUT_TIMEOUT_SECONDS = 300
+
+
+def _connection_params() -> dict[str, Any]:
+    return {
+        "host": os.getenv("DB_HOST"),
+        "dbname": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "port": os.getenv("DB_PORT"),
+    }
+
+
+def connect(dbname: Optional[str] = None) -> connection:
+    params = _connection_params()
+    if dbname is not None:
+        params["dbname"] = dbname
+    return psycopg2.connect(**params)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of database connections. A connection is checked out per unit of work: it is health-checked
+    before it is handed out, committed when the unit of work succeeds, and its session is reset to the pool's
+    session settings when it is returned.
+
+    Checkouts block while every connection is in use, for at most checkout_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        session_settings: Optional[dict[str, str]] = None,
+        checkout_timeout: float = POOL_CHECKOUT_TIMEOUT_SECONDS,
+        cursor_factory: Optional[type[cursor]] = None,
+    ) -> None:
+        if max_connections < 1:
+            raise ValueError(f"The connection pool needs at least one connection, got {max_connections}.")
+        self._max_connections = max_connections
+        self._checkout_timeout = checkout_timeout
+        self._available = threading.BoundedSemaphore(max_connections)
+        params = _connection_params()
+        if session_settings:
+            options = []
+            for name, value in session_settings.items():
+                escaped_value = value.replace(" ", "\\ ")
+                options.append(f"-c {name}={escaped_value}")
+            params["options"] = " ".join(options)
+        if cursor_factory is not None:
+            params["cursor_factory"] = cursor_factory
+        self._pool = ThreadedConnectionPool(1, max_connections, **params)
+        logger.info(f"Opened a connection pool of up to {max_connections} connections.")
+
+    @contextmanager
+    def checkout(self) -> Iterator[connection]:
+        if not self._available.acquire(timeout=self._checkout_timeout):
+            raise ConnectionPoolExhaustedError(self._max_connections, self._checkout_timeout)
+        try:
+            conn = self._get_live_connection()
+            broken = False
+            try:
+                yield conn
+                conn.commit()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                broken = True
+                raise
+            finally:
+                broken = broken or not self._reset(conn)
+                self._pool.putconn(conn, close=broken)
+        finally:
+            self._available.release()
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+    def _get_live_connection(self) -> connection:
+        """
+        Hand out a live connection, replacing connections the server has dropped since they were returned.
+        """
+        while True:
+            conn = self._pool.getconn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(health_check_query)
+                conn.rollback()
+                return conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                logger.warning(f"Discarding a broken pooled connection: {e.__class__.__name__} - {e}")
+                self._pool.putconn(conn, close=True)
+
+    @staticmethod
+    def _reset(conn: connection) -> bool:
+        if conn.closed:
+            return False
+        try:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute(reset_session_query)
+            conn.commit()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Closing a pooled connection that could not be reset: {e.__class__.__name__} - {e}")
+            return False
@@ -14,7 +14,12 @@ class CsvFiles(Enum):
 
 class Tables(Enum):
     PROCESSED_DATES = 'processed_dates'
+    DATE_STAGES = 'date_stages'
+    DEFERRED_INDEXES = 'deferred_indexes'
+    STAGING_SCHEMAS = 'staging_schemas'
+    REPLAY_KEYS = 'replay_keys'
     CITIES = 'cities'
+    CITY_ALIASES = 'city_aliases'
     AIRPORT_CODES = 'airport_country'
     NDT_BEST_TERRESTRIAL_SERVERS = 'ndt7_terrestrial_servers'
     NDT_BEST_STARLINK_SERVERS = 'ndt7_starlink_servers'
@@ -25,6 +30,10 @@ class Tables(Enum):
     NDT7_TEMP = 'ndt7_temp'
     CF_TEMP = 'cf_temp'
     UNIFIED_TELEMETRY = 'unified_telemetry'
+    NDT7_LATENCY_SKETCHES = 'ndt7_latency_sketches'
+    CF_LATENCY_SKETCHES = 'cf_latency_sketches'
+    TELEMETRY_ROLLUPS = 'telemetry_rollups'
+    TELEMETRY_ROLLUP_HISTOGRAMS = 'telemetry_rollup_histograms'
 
 
 class UpdateChoices(Enum):
@@ -41,3 +50,49 @@ class ExecutionDecision(Enum):
 class DataSource(Enum):
     NDT7 = "NDT7"
     CF = "Cloudflare AIM"
+
+
+class DateStage(Enum):
+    EXTRACTED = "extracted"
+    VALIDATED = "validated"
+    STANDARDIZED = "standardized"
+    MERGED = "merged"
+
+
+class Resource(Enum):
+    BIGQUERY = "bigquery"
+    DATABASE = "database"
+    HTTP = "http"
+
+
+class MeasurementSourceType(Enum):
+    BIGQUERY = "bigquery"
+    FILES = "files"
+    SYNTHETIC = "synthetic"
+
+
+class SpanKind(Enum):
+    RUN = "run"
+    FUNCTION = "function"
+    STAGE = "stage"
+    STATEMENT = "statement"
+
+
+class InsertMethod(Enum):
+    COPY = "copy"
+    VALUES = "values"
+
+
+class NetworkType(Enum):
+    TERRESTRIAL = "terrestrial"
+    STARLINK = "starlink"
+
+
+class ExportFormat(Enum):
+    PARQUET = "parquet"
+    CSV = "csv"
+
+
+class RollupGranularity(Enum):
+    DAY = "day"
+    MONTH = "month"
@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import gzip
+import os
+from pathlib import Path
+from typing import IO, Optional
+
+from psycopg2.extensions import connection, cursor
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from .config import logger
+from .enums import ExportFormat, Tables
+from .logger import LogUtils
+from .sql.copy_queries import get_telemetry_copy_to_stdout_query
+from .staging_schema import CATEGORY, staging_column_types
+from .table_data import table_data
+
+# Bytes of COPY output parsed into one Parquet row group.
+PARQUET_BLOCK_SIZE = 64 * 1024 * 1024
+# The lowest gzip level compresses the CSV output at close to disk speed.
+CSV_COMPRESSION_LEVEL = 1
+
+# The columns unified_telemetry shares with the staging tables keep their staging types.
+export_column_types = {**staging_column_types, "data_source": CATEGORY}
+export_columns = table_data[Tables.UNIFIED_TELEMETRY]["columns"]
+export_schema = pa.schema([(column, export_column_types[column]) for column in export_columns])
+
+
+class TelemetryExporter:
+    """
+    Exports a slice of unified_telemetry with COPY ... TO STDOUT, streamed into a gzip-compressed CSV file or
+    parsed block by block into the row groups of a Parquet file, so memory use does not grow with the slice. The
+    file is written under a temporary name and only renamed when the export completes.
+    """
+
+    def __init__(self, conn: connection) -> None:
+        self._conn = conn
+
+    @LogUtils.log_function
+    def export(
+        self,
+        path: Path,
+        start_date: date,
+        end_date: date,
+        export_format: ExportFormat = ExportFormat.PARQUET,
+        countries: Optional[list[str]] = None,
+        asns: Optional[list[int]] = None,
+        data_sources: Optional[list[str]] = None,
+    ) -> int:
+        """
+        Export the measurements taken from start_date through end_date (UTC), optionally only those of the given
+        client countries, ASNs and data sources.
+
+        @return: the number of exported rows.
+        """
+        filters = {"client_country_code": countries, "asn": asns, "data_source": data_sources}
+        params: dict[str, object] = {
+            "start_time": f"{start_date.isoformat()} 00:00:00+00",
+            "end_time": f"{(end_date + timedelta(days=1)).isoformat()} 00:00:00+00",
+            **{column: values for column, values in filters.items() if values},
+        }
+        template = get_telemetry_copy_to_stdout_query(export_columns, [column for column in filters if filters[column]])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        try:
+            with self._conn.cursor() as cur:
+                query = cur.mogrify(template, params).decode()
+                if export_format == ExportFormat.CSV:
+                    num_rows = self._export_csv(cur, query, tmp_path)
+                else:
+                    num_rows = self._export_parquet(cur, query, tmp_path)
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        tmp_path.replace(path)
+        logger.info(f"Exported {num_rows} unified telemetry records from {start_date} to {end_date} to {path}.")
+        return num_rows
+
+    @staticmethod
+    def _export_csv(cur: cursor, query: str, path: Path) -> int:
+        with gzip.open(path, "wb", compresslevel=CSV_COMPRESSION_LEVEL) as file:
+            cur.copy_expert(query, file)
+        num_rows: int = cur.rowcount
+        return max(num_rows, 0)
+
+    @staticmethod
+    def _export_parquet(cur: cursor, query: str, path: Path) -> int:
+        """
+        COPY writes into a pipe from a worker thread while this thread parses the CSV stream from the other end.
+        Closing the reading end on failure makes COPY fail too, so neither side is left blocked.
+        """
+        read_fd, write_fd = os.pipe()
+
+        def copy() -> None:
+            with open(write_fd, "wb") as pipe_writer:
+                cur.copy_expert(query, pipe_writer)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with open(read_fd, "rb") as pipe_reader:
+                future = executor.submit(copy)
+                try:
+                    num_rows = TelemetryExporter._write_parquet(pipe_reader, path)
+                except Exception:
+                    pipe_reader.close()
+                    # A failed COPY ends the stream early, which is the error worth reporting.
+                    future.result()
+                    raise
+            future.result()
+        return num_rows
+
+    @staticmethod
+    def _write_parquet(stream: IO[bytes], path: Path) -> int:
+        reader = pa_csv.open_csv(
+            stream,
+            read_options=pa_csv.ReadOptions(block_size=PARQUET_BLOCK_SIZE),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=dict(zip(export_schema.names, export_schema.types)),
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=False,
+            ),
+        )
+        num_rows = 0
+        with pq.ParquetWriter(path, export_schema, compression="zstd") as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+                num_rows += batch.num_rows
+        return num_rows
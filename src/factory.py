@@ -1,30 +1,82 @@
 from __future__ import annotations
 
-from typing import Optional
+from contextlib import ExitStack, contextmanager
+from typing import TYPE_CHECKING, Iterator, Optional
 
 from psycopg2.extensions import connection
 
-from .data_loader import DataLoader
-from .data_processer import DataProcesser
-from .table_init import TableInitializer
+from .bulk_loader import DEFAULT_CHUNK_SIZE, BulkLoader
+from .config import data_dir
+from .database import ConnectionPool
+from .enums import InsertMethod
+from .reference_data import ReferenceCache
+
+if TYPE_CHECKING:
+    from .data_loader import DataLoader
+    from .data_processer import DataProcesser
+    from .exporter import TelemetryExporter
+    from .measurement_source import MeasurementSource
+    from .planner import WorkPlanner
+    from .raw_archive import RawArchive
+    from .table_init import TableInitializer
 
 
 class Factory:
+    """
+    Builds the components of a command on first use. Their modules are imported by the getters, so a command
+    only loads the dependencies (BigQuery, pandas, pyarrow) of the components it uses.
+    """
+
     _factory: Optional[Factory] = None
 
-    def __init__(self, conn: connection) -> None:
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        insert_method: InsertMethod = InsertMethod.COPY,
+        max_memory_mb: Optional[int] = None,
+        archive_extracts: bool = False,
+        sketch_latencies: bool = False,
+        source: Optional[MeasurementSource] = None,
+    ) -> None:
         if Factory._factory is not None:
             raise Exception("Factory instance already exists. Use init_factory() instead.")
-        self._conn = conn
+        self._pool = pool
+        self._connections = ExitStack()
+        self._conn: Optional[connection] = None
+        self._bulk_loader = BulkLoader(chunk_size=chunk_size, method=insert_method)
+        self._max_memory_mb = max_memory_mb
+        self._archive_extracts = archive_extracts
+        self._sketch_latencies = sketch_latencies
+        self._source = source
+        self._archive: Optional[RawArchive] = None
+        self._reference_cache = ReferenceCache()
         self._table_initializer: Optional[TableInitializer] = None
         self._data_loader: Optional[DataLoader] = None
         self._data_processer: Optional[DataProcesser] = None
-        self._conn = conn
+        self._work_planner: Optional[WorkPlanner] = None
+        self._exporter: Optional[TelemetryExporter] = None
 
     @staticmethod
-    def init_factory(conn: connection) -> Factory:
+    def init_factory(
+        pool: ConnectionPool,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        insert_method: InsertMethod = InsertMethod.COPY,
+        max_memory_mb: Optional[int] = None,
+        archive_extracts: bool = False,
+        sketch_latencies: bool = False,
+        source: Optional[MeasurementSource] = None,
+    ) -> Factory:
         if Factory._factory is None:
-            Factory._factory = Factory(conn)
+            Factory._factory = Factory(
+                pool,
+                chunk_size=chunk_size,
+                insert_method=insert_method,
+                max_memory_mb=max_memory_mb,
+                archive_extracts=archive_extracts,
+                sketch_latencies=sketch_latencies,
+                source=source,
+            )
         return Factory._factory
 
     @staticmethod
@@ -33,17 +85,101 @@ class Factory:
             raise Exception("Factory instance not initialized. Use init_factory() first.")
         return Factory._factory
 
+    def close(self) -> None:
+        """
+        Return the connection of the shared components to the pool.
+        """
+        self._connections.close()
+        self._conn = None
+        self._table_initializer = None
+        self._data_loader = None
+        self._data_processer = None
+        self._work_planner = None
+        self._exporter = None
+
     def get_table_initializer(self) -> TableInitializer:
+        from .table_init import TableInitializer
+
         if self._table_initializer is None:
-            self._table_initializer = TableInitializer(self._conn)
+            self._table_initializer = TableInitializer(self._get_connection(), self._bulk_loader)
         return self._table_initializer
 
+    def get_archive(self) -> RawArchive:
+        from .raw_archive import RawArchive
+
+        if self._archive is None:
+            self._archive = RawArchive(data_dir / "archive")
+        return self._archive
+
     def get_data_loader(self) -> DataLoader:
         if self._data_loader is None:
-            self._data_loader = DataLoader(self._conn)
+            self._data_loader = self._create_data_loader(self._get_connection())
         return self._data_loader
 
+    def _create_data_loader(self, conn: connection) -> DataLoader:
+        from .data_loader import DataLoader
+
+        archive = self.get_archive() if self._archive_extracts else None
+        return DataLoader(
+            conn,
+            self._bulk_loader,
+            max_memory_mb=self._max_memory_mb,
+            archive=archive,
+            reference_cache=self._reference_cache,
+            sketch_latencies=self._sketch_latencies,
+            source=self._source,
+        )
+
+    def get_work_planner(self) -> WorkPlanner:
+        from .planner import WorkPlanner
+
+        if self._work_planner is None:
+            self._work_planner = WorkPlanner(self._get_connection())
+        return self._work_planner
+
     def get_data_processer(self) -> DataProcesser:
+        from .data_processer import DataProcesser
+
         if self._data_processer is None:
-            self._data_processer = DataProcesser(self._conn)
+            self._data_processer = DataProcesser(self._get_connection())
         return self._data_processer
+
+    def get_exporter(self) -> TelemetryExporter:
+        from .exporter import TelemetryExporter
+
+        if self._exporter is None:
+            self._exporter = TelemetryExporter(self._get_connection())
+        return self._exporter
+
+    @contextmanager
+    def worker_components(self, schema_prefix: str) -> Iterator[tuple[DataLoader, DataProcesser]]:
+        """
+        Check out a dedicated pooled connection with its own staging tables in the first free schema named
+        <schema_prefix><N> and yield a data loader and data processer bound to it. The connection goes back to the
+        pool with its session reset, which releases the schema.
+        """
+        from .data_processer import DataProcesser
+        from .table_init import TableInitializer
+
+        with self._pool.checkout() as conn:
+            TableInitializer(conn, self._bulk_loader).initialize_staging_schema(schema_prefix)
+            yield self._create_data_loader(conn), DataProcesser(conn)
+
+    @contextmanager
+    def pooled_table_initializer(self) -> Iterator[TableInitializer]:
+        """
+        Yield a table initializer on its own pooled connection, for reference updates that run side by side.
+        """
+        from .table_init import TableInitializer
+
+        with self._pool.checkout() as conn:
+            yield TableInitializer(conn, self._bulk_loader)
+
+    def _get_connection(self) -> connection:
+        """
+        The table initializer, data loader, data processer, work planner and exporter returned by the getters share one
+        pooled connection, checked out on first use and held until close().
+        """
+        if self._conn is None:
+            self._conn = self._connections.enter_context(self._pool.checkout())
+        return self._conn
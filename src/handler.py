@@ -1,9 +1,31 @@
-from datetime import timedelta
+from __future__ import annotations
 
-from .config import logger
-from .enums import ExecutionDecision, UpdateChoices
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import date as Date, timedelta
+from pathlib import Path
+import queue
+import threading
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from .config import DEFAULT_MAX_CONCURRENT_JOBS, logger
+from .enums import ExecutionDecision, ExportFormat, Resource, UpdateChoices
 from .factory import Factory
-from .utils import parse_date, parse_date_range, parse_date_range_from_months
+from .utils import format_bytes, parse_date, parse_date_range, parse_date_range_from_months
+
+if TYPE_CHECKING:
+    import asyncio
+
+    from .async_engine import AsyncEngine
+    from .data_loader import DataLoader
+    from .data_processer import DataProcesser
+    from .raw_archive import RawArchive
+    from .table_init import TableInitializer
+
+type StagingSlot = tuple[DataLoader, DataProcesser]
+
+# How long a blocked pipeline stage waits before re-checking whether the other stage has failed.
+PIPELINE_POLL_SECONDS = 1.0
 
 
 class Handler:
@@ -19,57 +41,368 @@ class Handler:
         else:
             logger.info("Drop flag detected, but operation cancelled by user.")
 
-    def init(self) -> None:
+    def init(self, partition_telemetry: bool = False, unlogged_staging: bool = False) -> None:
         logger.info("Initialization flag detected. Performing setup...")
         table_initializer = self._factory.get_table_initializer()
-        table_initializer.initialize_tables()
+        table_initializer.initialize_tables(partition_telemetry=partition_telemetry, unlogged_staging=unlogged_staging)
+
+    def update_best_servers(
+        self,
+        date_range_str: str,
+        max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS,
+        fused: bool = False,
+        plan: bool = False,
+    ) -> None:
+        start_date, end_date = parse_date_range_from_months(date_range_str)
+        planner = self._factory.get_work_planner()
+        months = []
+        for month_start in planner.get_missing_best_servers_months(start_date, end_date):
+            end_of_month = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            months.append((month_start, end_of_month))
+        data_loader = self._factory.get_data_loader()
+        if plan:
+            estimates = data_loader.estimate_best_servers_bytes(months, fused=fused)
+            for dataset_name, num_bytes in estimates:
+                logger.info(f"Plan: {dataset_name} would process {format_bytes(num_bytes)}.")
+            total_bytes = sum(num_bytes for _, num_bytes in estimates)
+            logger.info(f"Plan: {len(estimates)} BigQuery jobs would process {format_bytes(total_bytes)} in total.")
+            return
+        data_loader.update_best_servers(months, max_concurrent_jobs=max_concurrent_jobs, fused=fused)
 
-    def update_best_servers(self, date_range_str: str) -> None:
+    def update_best_servers_from_sketches(self, date_range_str: str, quantile: float = 0.01) -> None:
         start_date, end_date = parse_date_range_from_months(date_range_str)
         data_loader = self._factory.get_data_loader()
-        while start_date <= end_date:
-            end_of_month = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            data_loader.update_best_servers(start_date, end_of_month)
-            start_date = (start_date + timedelta(days=32)).replace(day=1)
+        data_loader.update_best_servers_from_sketches(start_date, end_date, quantile=quantile)
 
     def update_countries_with_starlink(self, date_range_str: str) -> None:
         start_date, end_date = parse_date_range(date_range_str)
         data_loader = self._factory.get_data_loader()
         data_loader.update_countries_with_starlink(start_date, end_date)
 
-    def update(self, choices_str: str) -> None:
+    def export(
+        self,
+        date_range_str: str,
+        path: Path,
+        export_format: ExportFormat = ExportFormat.PARQUET,
+        countries: Optional[list[str]] = None,
+        asns: Optional[list[int]] = None,
+        data_sources: Optional[list[str]] = None,
+    ) -> None:
+        start_date, end_date = parse_date_range(date_range_str)
+        logger.info(f"Exporting unified telemetry from {start_date} to {end_date} to {path}")
+        exporter = self._factory.get_exporter()
+        exporter.export(
+            path,
+            start_date,
+            end_date,
+            export_format=export_format,
+            countries=countries,
+            asns=asns,
+            data_sources=data_sources,
+        )
+
+    def update(self, choices_str: str, engine: Optional[AsyncEngine] = None) -> None:
         choices = [UpdateChoices(choice_str) for choice_str in set(choices_str.split(','))]
         logger.info(f"Update choices detected: {choices}")
+        if engine is not None:
+            engine.run(lambda: self._update_async(choices, engine))
+            return
         table_initializer = self._factory.get_table_initializer()
         for choice in choices:
-            if choice == UpdateChoices.ASN_DATE:
-                table_initializer.update_asns()
-            elif choice == UpdateChoices.AIRPORT_CODES:
-                table_initializer.update_airport_codes()
-            elif choice == UpdateChoices.CITIES:
-                table_initializer.update_cities()
-
-    def date(self, date_str: str, skip_inserted_dates: bool = False, starlink_only: bool = False) -> None:
+            self._update_reference_data(table_initializer, choice)
+
+    async def _update_async(self, choices: list[UpdateChoices], engine: AsyncEngine) -> None:
+        """
+        Download and load the chosen reference data side by side, each on its own pooled connection. A reference
+        update is mostly download time, so it counts against the HTTP limit.
+        """
+        await engine.gather(
+            engine.run_blocking(Resource.HTTP, self._update_pooled_reference_data, choice) for choice in choices
+        )
+
+    def _update_pooled_reference_data(self, choice: UpdateChoices) -> None:
+        with self._factory.pooled_table_initializer() as table_initializer:
+            self._update_reference_data(table_initializer, choice)
+
+    @staticmethod
+    def _update_reference_data(table_initializer: TableInitializer, choice: UpdateChoices) -> None:
+        if choice == UpdateChoices.ASN_DATE:
+            table_initializer.update_asns()
+        elif choice == UpdateChoices.AIRPORT_CODES:
+            table_initializer.update_airport_codes()
+        elif choice == UpdateChoices.CITIES:
+            table_initializer.update_cities()
+
+    def date(
+        self, date_str: str, skip_inserted_dates: bool = False, starlink_only: bool = False, plan: bool = False
+    ) -> None:
         date = parse_date(date_str)
         logger.info(f"Running with specified date: {date}")
+        if plan:
+            planner = self._factory.get_work_planner()
+            dates = planner.get_missing_dates(date, date)
+            if not dates and not skip_inserted_dates:
+                logger.warning(f"Plan: {date} has already been processed, so the run would stop with an error.")
+            self._log_dates_plan(dates, starlink_only)
+            return
         data_loader = self._factory.get_data_loader()
         if (
             data_loader.load_data(date, skip_inserted_dates=skip_inserted_dates, starlink_only=starlink_only)
             == ExecutionDecision.OK
         ):
             data_processer = self._factory.get_data_processer()
-            data_processer.process_data()
+            data_processer.process_data(date)
 
-    def date_range(self, date_range_str: str, starlink_only: bool = False) -> None:
+    def date_range(
+        self,
+        date_range_str: str,
+        starlink_only: bool = False,
+        workers: int = 1,
+        prefetch: int = 0,
+        plan: bool = False,
+        engine: Optional[AsyncEngine] = None,
+    ) -> None:
         start_date, end_date = parse_date_range(date_range_str)
         logger.info(f"Running with specified date range: {start_date} to {end_date}")
-        date = end_date
-        while date >= start_date:
+        planner = self._factory.get_work_planner()
+        dates = planner.get_missing_dates(start_date, end_date)
+        if plan:
+            self._log_dates_plan(dates, starlink_only)
+            return
+        if engine is not None:
+            if workers > 1 or prefetch > 0:
+                logger.warning("--workers and --prefetch are ignored by the async engine; it uses its own limits.")
+            self._date_range_async(dates, starlink_only, engine)
+            return
+        if workers > 1:
+            if prefetch > 0:
+                logger.warning("Prefetching is ignored when processing the date range with several workers.")
+            self._date_range_parallel(dates, starlink_only, workers)
+            return
+        if prefetch > 0:
+            self._date_range_pipelined(dates, starlink_only, prefetch)
+            return
+        for date in dates:
             data_loader = self._factory.get_data_loader()
             if (
                 data_loader.load_data(date, skip_inserted_dates=True, starlink_only=starlink_only)
                 == ExecutionDecision.OK
             ):
                 data_processer = self._factory.get_data_processer()
-                data_processer.process_data()
+                data_processer.process_data(date)
+
+    def _log_dates_plan(self, dates: list[Date], starlink_only: bool) -> None:
+        data_loader = self._factory.get_data_loader()
+        total_bytes = 0
+        for date in dates:
+            num_bytes = data_loader.estimate_load_bytes(date, starlink_only=starlink_only)
+            total_bytes += num_bytes
+            logger.info(f"Plan: load {date} ({format_bytes(num_bytes)} processed by BigQuery).")
+        logger.info(f"Plan: {len(dates)} dates would process {format_bytes(total_bytes)} in BigQuery in total.")
+
+    def replay(self, date_range_str: str, plan: bool = False) -> None:
+        start_date, end_date = parse_date_range(date_range_str)
+        archive = self._factory.get_archive()
+        if plan:
+            self._log_replay_plan(start_date, end_date, archive)
+            return
+        logger.info(f"Replaying archived extracts from {start_date} to {end_date}")
+        data_loader = self._factory.get_data_loader()
+        date = end_date
+        while date >= start_date:
+            if data_loader.replay_data(date, archive) == ExecutionDecision.OK:
+                data_processer = self._factory.get_data_processer()
+                data_processer.process_data(date, replace=True)
+            date -= timedelta(days=1)
+
+    @staticmethod
+    def _log_replay_plan(start_date: Date, end_date: Date, archive: RawArchive) -> None:
+        from .raw_archive import archive_sources
+
+        replayed = 0
+        date = end_date
+        while date >= start_date:
+            if all(archive.contains(table, date) for table in archive_sources):
+                logger.info(f"Plan: replay {date.strftime('%Y-%m-%d')} from the archive.")
+                replayed += 1
+            else:
+                logger.info(f"Plan: skip {date.strftime('%Y-%m-%d')}, it has no archived extract.")
             date -= timedelta(days=1)
+        logger.info(f"Plan: {replayed} date(s) would be replayed.")
+
+    @contextmanager
+    def bulk_load(self, index_build_workers: int = 1) -> Iterator[None]:
+        """
+        Defer the indexes of unified_telemetry that back no constraint while the commands in the context load
+        dates, and rebuild them afterwards, also when a command fails, with up to index_build_workers builds at a
+        time. If the process dies before the rebuild, the indexes stay recorded and the next bulk load rebuilds them.
+        Partitions created during the bulk load record their indexes as deferred too, so the rebuild reads the
+        recorded indexes again on a connection of its own, which a failed command has not left in an aborted
+        transaction.
+        """
+        table_initializer = self._factory.get_table_initializer()
+        table_initializer.report_telemetry_index_usage()
+        table_initializer.defer_telemetry_indexes()
+        try:
+            yield
+        finally:
+            with self._factory.pooled_table_initializer() as pooled_table_initializer:
+                index_names = pooled_table_initializer.get_deferred_indexes()
+            self._rebuild_indexes(index_names, index_build_workers)
+
+    def _rebuild_indexes(self, index_names: list[str], workers: int) -> None:
+        logger.info(f"Rebuilding {len(index_names)} indexes with up to {workers} builds at a time.")
+
+        def rebuild(index_name: str) -> None:
+            with self._factory.pooled_table_initializer() as table_initializer:
+                table_initializer.rebuild_deferred_index(index_name)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for future in [executor.submit(rebuild, index_name) for index_name in index_names]:
+                future.result()
+
+    def _date_range_parallel(self, days: list[Date], starlink_only: bool, workers: int) -> None:
+        logger.info(f"Processing the date range with {workers} workers.")
+        dates: queue.SimpleQueue[Date] = queue.SimpleQueue()
+        for day in days:
+            dates.put(day)
+        failed = threading.Event()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="date-range-worker") as executor:
+            futures = [
+                executor.submit(self._date_range_worker, worker_id, dates, failed, starlink_only)
+                for worker_id in range(1, workers + 1)
+            ]
+        for future in futures:
+            future.result()
+
+    def _date_range_worker(
+        self, worker_id: int, dates: queue.SimpleQueue[Date], failed: threading.Event, starlink_only: bool
+    ) -> None:
+        with self._factory.worker_components("staging_w") as (data_loader, data_processer):
+            while not failed.is_set():
+                try:
+                    day = dates.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    if (
+                        data_loader.load_data(day, skip_inserted_dates=True, starlink_only=starlink_only)
+                        == ExecutionDecision.OK
+                    ):
+                        data_processer.process_data(day)
+                except Exception:
+                    logger.error(f"Worker {worker_id} failed on {day}. Stopping the remaining workers.")
+                    failed.set()
+                    raise
+
+    def _date_range_async(self, dates: list[Date], starlink_only: bool, engine: AsyncEngine) -> None:
+        """
+        Run every date as a task of the async engine. A task holds a staging slot from its extraction until it is
+        merged, extracts under the BigQuery limit and is processed under the database limit, so there are never
+        more dates in flight than both limits together.
+        """
+        import asyncio
+
+        num_slots = engine.get_limit(Resource.BIGQUERY) + engine.get_limit(Resource.DATABASE)
+        logger.info(f"Processing the date range with the async engine and {num_slots} staging slots.")
+        with ExitStack() as stack:
+            slots = [stack.enter_context(self._factory.worker_components("staging_a")) for _ in range(num_slots)]
+
+            async def run_dates() -> None:
+                free_slots: asyncio.Queue[StagingSlot] = asyncio.Queue()
+                for slot in slots:
+                    free_slots.put_nowait(slot)
+                await engine.gather(self._date_task(engine, day, free_slots, starlink_only) for day in dates)
+
+            engine.run(run_dates)
+
+    @staticmethod
+    async def _date_task(
+        engine: AsyncEngine, day: Date, free_slots: asyncio.Queue[StagingSlot], starlink_only: bool
+    ) -> None:
+        data_loader, data_processer = slot = await free_slots.get()
+        try:
+            decision = await engine.run_blocking(
+                Resource.BIGQUERY, data_loader.load_data, day, skip_inserted_dates=True, starlink_only=starlink_only
+            )
+            if decision == ExecutionDecision.OK:
+                await engine.run_blocking(Resource.DATABASE, data_processer.process_data, day)
+        except Exception:
+            logger.error(f"Processing failed on {day}. Cancelling the remaining dates.")
+            raise
+        finally:
+            free_slots.put_nowait(slot)
+
+    def _date_range_pipelined(self, dates: list[Date], starlink_only: bool, prefetch: int) -> None:
+        """
+        Overlap the BigQuery extraction of upcoming dates with the processing of the current date.
+
+        A background producer loads dates into a pool of prefetch + 1 staging slots, each with its own connection
+        and staging schema, while this thread processes the loaded slots in date order. The producer blocks once
+        every slot is taken, so at most prefetch dates are downloaded ahead of the date being processed.
+        """
+        logger.info(f"Processing the date range with up to {prefetch} dates prefetched.")
+        with ExitStack() as stack:
+            free_slots: queue.Queue[StagingSlot] = queue.Queue()
+            for _ in range(prefetch + 1):
+                free_slots.put(stack.enter_context(self._factory.worker_components("staging_p")))
+            loaded: queue.SimpleQueue[Optional[tuple[Date, StagingSlot]]] = queue.SimpleQueue()
+            stopped = threading.Event()
+            producer_errors: list[Exception] = []
+            producer = threading.Thread(
+                target=self._prefetch_dates,
+                args=(dates, free_slots, loaded, stopped, producer_errors, starlink_only),
+                name="date-range-prefetch",
+            )
+            producer.start()
+            try:
+                while (item := loaded.get()) is not None:
+                    day, slot = item
+                    _, data_processer = slot
+                    data_processer.process_data(day)
+                    free_slots.put(slot)
+            except Exception:
+                logger.error(f"Processing failed on {day}. Stopping the prefetch of the remaining dates.")
+                stopped.set()
+                raise
+            finally:
+                producer.join()
+            if producer_errors:
+                raise producer_errors[0]
+
+    def _prefetch_dates(
+        self,
+        dates: list[Date],
+        free_slots: queue.Queue[StagingSlot],
+        loaded: queue.SimpleQueue[Optional[tuple[Date, StagingSlot]]],
+        stopped: threading.Event,
+        errors: list[Exception],
+        starlink_only: bool,
+    ) -> None:
+        try:
+            for day in dates:
+                slot = self._acquire_slot(free_slots, stopped)
+                if slot is None:
+                    return
+                data_loader, _ = slot
+                if (
+                    data_loader.load_data(day, skip_inserted_dates=True, starlink_only=starlink_only)
+                    == ExecutionDecision.OK
+                ):
+                    loaded.put((day, slot))
+                else:
+                    free_slots.put(slot)
+        except Exception as e:
+            logger.error(f"Prefetching failed on {day}: {e.__class__.__name__} - {e}")
+            errors.append(e)
+        finally:
+            loaded.put(None)
+
+    @staticmethod
+    def _acquire_slot(free_slots: queue.Queue[StagingSlot], stopped: threading.Event) -> Optional[StagingSlot]:
+        while not stopped.is_set():
+            try:
+                return free_slots.get(timeout=PIPELINE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return None
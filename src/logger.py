@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 import functools
 import logging
 from logging import Logger
@@ -7,6 +7,8 @@ from pathlib import Path
 import time
 from typing import Any, Callable, Optional
 
+from .tracing import Tracer
+
 
 class LogUtils:
     _logger: Optional[Logger] = None
@@ -45,7 +47,8 @@ class LogUtils:
             logger.info(f'Starting: {func.__name__}')
             start_time = time.time()
             try:
-                result = func(*args, **kwargs)
+                with Tracer.span(func.__qualname__, **LogUtils._get_span_attributes(func, args, kwargs)):
+                    result = func(*args, **kwargs)
                 duration = time.time() - start_time
                 logger.info(f'Finished: {func.__name__} (Duration: {duration:.2f}s)')
                 return result
@@ -54,3 +57,12 @@ class LogUtils:
                 raise e
 
         return wrapper
+
+    @staticmethod
+    def _get_span_attributes(func: Callable[..., Any], args: tuple[Any, ...], kwargs: dict[str, Any]) -> dict[str, Any]:
+        """
+        @return: the date arguments of the call by parameter name, so the spans of a function can be told apart per date.
+        """
+        names = func.__code__.co_varnames[: func.__code__.co_argcount]
+        arguments = {**dict(zip(names, args)), **kwargs}
+        return {name: value.isoformat() for name, value in arguments.items() if isinstance(value, date)}
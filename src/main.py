@@ -1,13 +1,31 @@
+from __future__ import annotations
+
 import argparse
-import os
+from contextlib import nullcontext
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
 from dotenv import load_dotenv
 import psycopg2
 
-from .config import logger
-from .enums import UpdateChoices
+from .bulk_loader import DEFAULT_CHUNK_SIZE
+from .config import DEFAULT_MAX_CONCURRENT_JOBS, logger
+from .database import ConnectionPool
+from .enums import DataSource, ExportFormat, InsertMethod, MeasurementSourceType, Resource, SpanKind, UpdateChoices
 from .factory import Factory
 from .handler import Handler
+from .tracing import Tracer, TracingCursor
+from .utils import parse_session_setting
+
+# Session settings of --bulk-load. Without synchronous commits a crash can lose the last commits, after which the
+# affected dates are simply loaded again.
+bulk_load_session_settings = {
+    "synchronous_commit": "off",
+    "maintenance_work_mem": "1GB",
+}
+
+if TYPE_CHECKING:
+    from .measurement_source import MeasurementSource
 
 
 def parse_args() -> argparse.Namespace:
@@ -20,6 +38,18 @@ def parse_args() -> argparse.Namespace:
         help="Initialize the database by creating and populating the required tables.",
     )
 
+    parser.add_argument(
+        "--partition-telemetry",
+        action="store_true",
+        help="When initializing the database, create unified_telemetry partitioned by month on test_time. Month partitions are created automatically when their first date is collected.",
+    )
+
+    parser.add_argument(
+        "--unlogged-staging",
+        action="store_true",
+        help="When initializing the database, create the staging tables (ndt7_temp, cf_temp) as UNLOGGED tables with only their primary key. Their content is lost after a database crash, which only affects dates that were being processed.",
+    )
+
     parser.add_argument(
         "--drop",
         action="store_true",
@@ -33,6 +63,32 @@ def parse_args() -> argparse.Namespace:
         help="Update best servers for a specific date range. Best servers will be calculated and updated for every month in the range. Use format yyyy-mm or yyyy-mm:yyyy-mm, where the first date is the start (left of :) and the second date is the end (right of :). The end date is optional.",
     )
 
+    parser.add_argument(
+        "--max-concurrent-jobs",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENT_JOBS,
+        help=f"Number of BigQuery jobs the update-best-servers command runs at the same time. All months of the range are submitted up front and every result is stored as soon as its job completes. With --async, also the number of dates the date-range command extracts at the same time (default: {DEFAULT_MAX_CONCURRENT_JOBS}).",
+    )
+
+    parser.add_argument(
+        "--fused-best-servers",
+        action="store_true",
+        help="When updating best servers, scan each data source once for all months of the range and both network types, instead of running one terrestrial and one Starlink job per month and data source.",
+    )
+
+    parser.add_argument(
+        "--best-servers-from-sketches",
+        type=str,
+        help="Derive best servers for every month in a range from the stored latency sketches instead of BigQuery (see --sketch-latencies). Use format yyyy-mm or yyyy-mm:yyyy-mm. Existing best servers of these months are replaced.",
+    )
+
+    parser.add_argument(
+        "--best-servers-quantile",
+        type=float,
+        default=0.01,
+        help="Latency quantile of a client city that a server has to reach to be a best server, used by --best-servers-from-sketches (default: 0.01).",
+    )
+
     parser.add_argument(
         "-ucws",
         "--update-countries-with-starlink",
@@ -68,7 +124,216 @@ def parse_args() -> argparse.Namespace:
         help="When collecting network measurements, only include measurements from Starlink (i.e., for date and date-range commands).",
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="When collecting network measurements, also write every day's raw NDT7 and Cloudflare extract to a Parquet archive under data/archive (i.e., for date and date-range commands).",
+    )
+
+    parser.add_argument(
+        "--sketch-latencies",
+        action="store_true",
+        help="When collecting or replaying network measurements, also store per-day latency sketches per client city and server, from which best servers can be derived offline.",
+    )
+
+    parser.add_argument(
+        "--source",
+        type=str,
+        choices=[source_type.value for source_type in MeasurementSourceType],
+        default=MeasurementSourceType.BIGQUERY.value,
+        help="Where the date and date-range commands read network measurements from. 'files' reads Parquet or CSV exports from --source-dir, laid out like data/archive; 'synthetic' generates --synthetic-rows measurements per data source and day, which only pass validation against the synthetic reference data of the benchmark (default: bigquery).",
+    )
+
+    parser.add_argument(
+        "--source-dir",
+        type=Path,
+        help="Directory of exported measurements read with --source files, laid out as source=<ndt7|cloudflare>/date=<yyyy-mm-dd>/<files>. The Parquet archive written with --archive can be used as is.",
+    )
+
+    parser.add_argument(
+        "--synthetic-rows",
+        type=int,
+        default=100_000,
+        help="Measurements per data source and day generated with --source synthetic (default: 100000).",
+    )
+
+    parser.add_argument(
+        "--replay",
+        type=str,
+        help="Process archived extracts for a date range without querying BigQuery (format: yyyy-mm-dd:yyyy-mm-dd). Records of the replayed dates already in unified_telemetry are replaced. Dates without an archived extract are skipped.",
+    )
+
+    parser.add_argument(
+        "--export",
+        type=str,
+        help="Export the unified telemetry measurements of a date range (format: yyyy-mm-dd:yyyy-mm-dd) to --export-file, streamed from the database with constant memory. Filter them with --country, --asn and --data-source.",
+    )
+
+    parser.add_argument(
+        "--export-file",
+        type=Path,
+        help="File the export command writes to.",
+    )
+
+    parser.add_argument(
+        "--export-format",
+        type=str,
+        choices=[export_format.value for export_format in ExportFormat],
+        default=ExportFormat.PARQUET.value,
+        help="Format of the export: 'parquet' (zstd-compressed, a row group per 64 MB of data) or 'csv' (gzip-compressed, with a header row) (default: parquet).",
+    )
+
+    parser.add_argument(
+        "--country",
+        type=str.upper,
+        action="append",
+        metavar="CC",
+        help="Only export measurements of clients in this country (two-letter code). Can be given several times.",
+    )
+
+    parser.add_argument(
+        "--asn",
+        type=int,
+        action="append",
+        help="Only export measurements of this ASN. Can be given several times.",
+    )
+
+    parser.add_argument(
+        "--data-source",
+        type=str,
+        action="append",
+        choices=[data_source.value for data_source in DataSource],
+        help="Only export measurements of this data source. Can be given several times.",
+    )
+
+    parser.add_argument(
+        "--bulk-load",
+        action="store_true",
+        help="Run the date-range and replay commands in bulk-load mode: the indexes of unified_telemetry that back no constraint are dropped before loading and rebuilt in parallel afterwards (at most --index-build-workers at a time), and the database connections commit asynchronously (synchronous_commit=off) with more memory for the index builds (maintenance_work_mem=1GB), unless --session-setting sets them. The index usage is logged first, to find redundant indexes.",
+    )
+
+    parser.add_argument(
+        "--index-build-workers",
+        type=int,
+        default=4,
+        help="Indexes rebuilt at the same time, each on its own database connection, at the end of --bulk-load (default: 4).",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of dates processed in parallel by the date-range command. Every worker uses its own database connection and staging tables (default: 1).",
+    )
+
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        help="Number of dates the date-range command downloads ahead while the current date is being processed. Every prefetched date uses its own database connection and staging tables (default: 0, no prefetching).",
+    )
+
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only list the work the date, date-range, replay and update-best-servers commands would do, with the bytes BigQuery would process, without loading anything. Cannot be combined with the other commands. Dates that are already processed and months that already have best servers are left out.",
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Number of rows sent to the database per bulk-load chunk (default: {DEFAULT_CHUNK_SIZE}).",
+    )
+
+    parser.add_argument(
+        "--insert-method",
+        type=str,
+        choices=[insert_method.value for insert_method in InsertMethod],
+        default=InsertMethod.COPY.value,
+        help="Method used to bulk-load rows into the database. 'copy' streams rows with COPY ... FROM STDIN, 'values' falls back to multi-row INSERT statements (default: copy).",
+    )
+
+    parser.add_argument(
+        "--max-memory-mb",
+        type=int,
+        help="Stream BigQuery results page by page when collecting network measurements, keeping each page below this memory ceiling in megabytes (i.e., for date and date-range commands). By default each day is downloaded at once.",
+    )
+
+    parser.add_argument(
+        "--async",
+        dest="async_engine",
+        action="store_true",
+        help="Run the date-range and update commands on the asyncio engine. Dates overlap their BigQuery extraction (at most --max-concurrent-jobs at a time) with the Postgres processing of other dates (at most --workers at a time), and reference updates download side by side (at most --max-concurrent-downloads at a time).",
+    )
+
+    parser.add_argument(
+        "--max-concurrent-downloads",
+        type=int,
+        default=3,
+        help="Reference data downloads run at the same time by the update command with --async (default: 3).",
+    )
+
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        help="Maximum number of database connections kept in the connection pool. Defaults to one more than the connections needed by --workers or --prefetch.",
+    )
+
+    parser.add_argument(
+        "--session-setting",
+        type=parse_session_setting,
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Postgres setting applied to every pooled database connection, e.g. work_mem=256MB. Can be given several times.",
+    )
+
+    parser.add_argument(
+        "--trace-file",
+        type=Path,
+        help="Append a JSON line per tracing span (run, function, stage and SQL statement) to this file, with its duration, database time, rows, bytes read and RSS delta.",
+    )
+
+    parser.add_argument(
+        "--prometheus-textfile",
+        type=Path,
+        help="Write the span totals per kind and name to this file in the Prometheus text format when the run ends, e.g. for the node exporter's textfile collector.",
+    )
+
+    args = parser.parse_args()
+    if args.source == MeasurementSourceType.FILES.value and args.source_dir is None:
+        parser.error("--source files requires --source-dir.")
+    if args.export and args.export_file is None:
+        parser.error("--export requires --export-file.")
+    if args.plan and (
+        args.drop
+        or args.init
+        or args.best_servers_from_sketches
+        or args.update_countries_with_starlink
+        or args.update
+        or args.export
+    ):
+        parser.error("--plan can only be combined with --date, --date-range, --replay and --update-best-servers.")
+    return args
+
+
+def get_measurement_source(args: argparse.Namespace) -> Optional[MeasurementSource]:
+    """
+    @return: the measurement source selected with --source, or None for the default BigQuery source.
+    """
+    source_type = MeasurementSourceType(args.source)
+    if source_type == MeasurementSourceType.FILES:
+        from .measurement_source import FileSource
+
+        return FileSource(args.source_dir, batch_rows=args.chunk_size)
+    if source_type == MeasurementSourceType.SYNTHETIC:
+        from .measurement_source import SyntheticSource
+        from .synthetic import SyntheticWorkload
+
+        return SyntheticSource(SyntheticWorkload(), args.synthetic_rows, chunk_rows=args.chunk_size)
+    return None
 
 
 def main() -> None:
@@ -76,31 +341,91 @@ def main() -> None:
     load_dotenv()
     logger.info("Starting the application...")
 
+    Tracer.configure(args.trace_file, args.prometheus_textfile)
+    engine = None
+    pool_size = args.pool_size or max(args.workers, args.prefetch + 1) + 1
+    if args.async_engine:
+        from .async_engine import AsyncEngine
+
+        engine = AsyncEngine(
+            {
+                Resource.BIGQUERY: args.max_concurrent_jobs,
+                Resource.DATABASE: args.workers,
+                Resource.HTTP: args.max_concurrent_downloads,
+            }
+        )
+        pool_size = args.pool_size or max(args.max_concurrent_jobs + args.workers, args.max_concurrent_downloads) + 1
+    session_settings = dict(args.session_setting)
+    if args.bulk_load:
+        session_settings = {**bulk_load_session_settings, **session_settings}
+        pool_size = args.pool_size or max(pool_size, args.index_build_workers + 1)
     try:
-        with psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            port=os.getenv("DB_PORT"),
-        ) as conn:
-            logger.info("Connected to the database successfully.")
-            handler = Handler(Factory(conn))
-            starlink_only: bool = args.starlink_only
-            if args.drop:
-                handler.drop()
-            if args.init:
-                handler.init()
-            if args.update_best_servers:
-                handler.update_best_servers(args.update_best_servers)
-            if args.update_countries_with_starlink:
-                handler.update_countries_with_starlink(args.update_countries_with_starlink)
-            if args.update:
-                handler.update(args.update)
-            if args.date:
-                handler.date(args.date, starlink_only=starlink_only)
-            if args.date_range:
-                handler.date_range(args.date_range, starlink_only=starlink_only)
+        pool = ConnectionPool(
+            pool_size,
+            session_settings=session_settings,
+            cursor_factory=TracingCursor if Tracer.is_enabled() else None,
+        )
+        logger.info("Connected to the database successfully.")
+        factory = Factory(
+            pool,
+            chunk_size=args.chunk_size,
+            insert_method=InsertMethod(args.insert_method),
+            max_memory_mb=args.max_memory_mb,
+            archive_extracts=args.archive,
+            sketch_latencies=args.sketch_latencies,
+            source=get_measurement_source(args),
+        )
+        try:
+            with Tracer.span("run", kind=SpanKind.RUN):
+                handler = Handler(factory)
+                starlink_only: bool = args.starlink_only
+                if args.drop:
+                    handler.drop()
+                if args.init:
+                    handler.init(partition_telemetry=args.partition_telemetry, unlogged_staging=args.unlogged_staging)
+                if args.update_best_servers:
+                    handler.update_best_servers(
+                        args.update_best_servers,
+                        max_concurrent_jobs=args.max_concurrent_jobs,
+                        fused=args.fused_best_servers,
+                        plan=args.plan,
+                    )
+                if args.best_servers_from_sketches:
+                    handler.update_best_servers_from_sketches(
+                        args.best_servers_from_sketches, quantile=args.best_servers_quantile
+                    )
+                if args.update_countries_with_starlink:
+                    handler.update_countries_with_starlink(args.update_countries_with_starlink)
+                if args.update:
+                    handler.update(args.update, engine=engine)
+                if args.date:
+                    handler.date(args.date, starlink_only=starlink_only, plan=args.plan)
+                bulk_load = args.bulk_load and not args.plan and bool(args.date_range or args.replay)
+                with handler.bulk_load(args.index_build_workers) if bulk_load else nullcontext():
+                    if args.date_range:
+                        handler.date_range(
+                            args.date_range,
+                            starlink_only=starlink_only,
+                            workers=args.workers,
+                            prefetch=args.prefetch,
+                            plan=args.plan,
+                            engine=engine,
+                        )
+                    if args.replay:
+                        handler.replay(args.replay, plan=args.plan)
+                if args.export:
+                    handler.export(
+                        args.export,
+                        args.export_file,
+                        export_format=ExportFormat(args.export_format),
+                        countries=args.country,
+                        asns=args.asn,
+                        data_sources=args.data_source,
+                    )
+        finally:
+            factory.close()
+            pool.close()
+            Tracer.close()
     except psycopg2.OperationalError as e:
         logger.error(f"OperationalError: Failed to connect to the database - {e}")
     except psycopg2.InterfaceError as e:
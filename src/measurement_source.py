@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .bulk_loader import DEFAULT_CHUNK_SIZE
+from .config import logger
+from .enums import Tables
+from .raw_archive import get_day_dir
+from .sql.bigquery_queries import get_cf_formatted_query, get_ndt_formatted_query
+from .table_data import table_data
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+    from .synthetic import SyntheticWorkload
+
+MEASUREMENT_LAB_PROJECT = "measurement-lab"
+# Rough ratio between the in-memory size of a downloaded page (DataFrame plus its CSV chunk) and its BigQuery storage size.
+STREAMING_MEMORY_OVERHEAD = 4
+# Bytes of a CSV file parsed into one batch.
+CSV_BLOCK_SIZE = 32 * 1024 * 1024
+
+measurement_queries = {
+    Tables.NDT7_TEMP: get_ndt_formatted_query,
+    Tables.CF_TEMP: get_cf_formatted_query,
+}
+
+
+class MeasurementSource(ABC):
+    """
+    Source of the daily NDT7 and Cloudflare measurements DataLoader stages. Every implementation yields Arrow
+    record batches with the columns of the staging table, in the table's column order, of types that cast to the
+    table's staging schema.
+    """
+
+    @abstractmethod
+    def read_day(self, table: Tables, day: date, asns: str) -> Iterator[pa.RecordBatch]:
+        """
+        @param table: the staging table the measurements are loaded into, NDT7_TEMP or CF_TEMP.
+        @param asns: comma-separated ASNs whose measurements are read.
+        """
+
+    @abstractmethod
+    def estimate_day_bytes(self, table: Tables, day: date, asns: str) -> int:
+        """
+        @return: the number of bytes read_day would scan.
+        """
+
+
+class BigQuerySource(MeasurementSource):
+    """
+    Queries M-Lab's BigQuery tables. Without max_memory_mb a day is downloaded at once, otherwise the result is
+    paged so that a page and its serialized chunk stay below max_memory_mb no matter how many rows the day has.
+
+    The BigQuery client library takes about a second to import, so it is only imported when a source is created.
+    """
+
+    def __init__(self, max_memory_mb: Optional[int] = None) -> None:
+        from google.cloud import bigquery
+
+        self._max_memory_mb = max_memory_mb
+        self._client = bigquery.Client(project=MEASUREMENT_LAB_PROJECT)
+
+    def read_day(self, table: Tables, day: date, asns: str) -> Iterator[pa.RecordBatch]:
+        query = measurement_queries[table](day.strftime("%Y-%m-%d"), asns)
+        if self._max_memory_mb is None:
+            result = self._client.query(query).to_arrow()
+            logger.info(f"Downloaded {result.num_rows} rows from BigQuery for {table.value}.")
+            yield from result.to_batches()
+            return
+        job = self._client.query(query)
+        job.result()
+        destination = self._client.get_table(job.destination)
+        page_size = self._get_page_size(destination.num_bytes, destination.num_rows, self._max_memory_mb)
+        logger.info(
+            f"Streaming {destination.num_rows} rows from BigQuery for {table.value} in pages of {page_size} rows."
+        )
+        yield from self._client.list_rows(destination, page_size=page_size).to_arrow_iterable()
+
+    def estimate_day_bytes(self, table: Tables, day: date, asns: str) -> int:
+        return self.estimate_query_bytes(measurement_queries[table](day.strftime("%Y-%m-%d"), asns))
+
+    def query_dataframe(self, query: str, dataset_name: str) -> DataFrame:
+        df: DataFrame = self._client.query(query).to_dataframe()
+        logger.info(f"Downloaded {len(df)} rows from BigQuery from {dataset_name}.")
+        df.replace('', None, inplace=True)
+        return df
+
+    def estimate_query_bytes(self, query: str) -> int:
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+        job = self._client.query(query, job_config=job_config)
+        return int(job.total_bytes_processed or 0)
+
+    @staticmethod
+    def _get_page_size(num_bytes: Optional[int], num_rows: Optional[int], max_memory_mb: int) -> int:
+        if not num_bytes or not num_rows:
+            return DEFAULT_CHUNK_SIZE
+        row_bytes = num_bytes / num_rows * STREAMING_MEMORY_OVERHEAD
+        return max(1, int(max_memory_mb * 1024 * 1024 // row_bytes))
+
+
+class FileSource(MeasurementSource):
+    """
+    Reads exported measurements from a local directory laid out like the raw archive,
+    <root>/source=<ndt7|cloudflare>/date=<yyyy-mm-dd>/, holding Parquet files or CSV files with a header row. Like
+    the BigQuery queries, only the measurements of the requested ASNs are read, so a broader export can be reused.
+    """
+
+    def __init__(self, root: Path, batch_rows: int = DEFAULT_CHUNK_SIZE) -> None:
+        self._root = root
+        self._batch_rows = batch_rows
+
+    def read_day(self, table: Tables, day: date, asns: str) -> Iterator[pa.RecordBatch]:
+        columns = list(table_data[table]["columns"])
+        day_files = self._get_day_files(table, day)
+        if not day_files:
+            logger.warning(f"No exported {table.value} measurements for {day.strftime('%Y-%m-%d')} in {self._root}.")
+        for path in day_files:
+            for batch in self._read_file(path, columns):
+                yield self._filter_asns(batch.select(columns), asns.split(","))
+
+    def estimate_day_bytes(self, table: Tables, day: date, asns: str) -> int:
+        return sum(path.stat().st_size for path in self._get_day_files(table, day))
+
+    def _get_day_files(self, table: Tables, day: date) -> list[Path]:
+        day_dir = get_day_dir(self._root, table, day)
+        return sorted(path for path in day_dir.glob("*") if path.suffix in (".parquet", ".csv"))
+
+    def _read_file(self, path: Path, columns: list[str]) -> Iterator[pa.RecordBatch]:
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+
+        if path.suffix == ".parquet":
+            yield from pq.ParquetFile(path).iter_batches(batch_size=self._batch_rows, columns=columns)
+            return
+        yield from pa_csv.open_csv(
+            path,
+            read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+            convert_options=pa_csv.ConvertOptions(include_columns=columns),
+        )
+
+    @staticmethod
+    def _filter_asns(batch: pa.RecordBatch, asns: list[str]) -> pa.RecordBatch:
+        asn_column = batch.column("asn")
+        return batch.filter(pc.is_in(asn_column, value_set=pa.array(asns).cast(asn_column.type)))
+
+
+class SyntheticSource(MeasurementSource):
+    """
+    Generates rows_per_day measurements per data source and day from a synthetic workload. The workload has ASNs
+    of its own, so the requested ASNs are not applied; load it with the workload's reference data (see
+    benchmark/run.py) for the measurements to pass validation.
+    """
+
+    def __init__(self, workload: SyntheticWorkload, rows_per_day: int, chunk_rows: int = DEFAULT_CHUNK_SIZE) -> None:
+        self._workload = workload
+        self._rows_per_day = rows_per_day
+        self._chunk_rows = chunk_rows
+
+    def read_day(self, table: Tables, day: date, asns: str) -> Iterator[pa.RecordBatch]:
+        if table == Tables.NDT7_TEMP:
+            frames = self._workload.ndt7_frames(day, self._rows_per_day, self._chunk_rows)
+        else:
+            frames = self._workload.cf_frames(day, self._rows_per_day, self._chunk_rows)
+        for frame in frames:
+            yield pa.RecordBatch.from_pandas(frame, preserve_index=False)
+
+    def estimate_day_bytes(self, table: Tables, day: date, asns: str) -> int:
+        return 0
@@ -0,0 +1,39 @@
+from datetime import date
+
+from psycopg2.extensions import connection
+
+from .config import logger
+from .logger import LogUtils
+from .sql.select_queries import missing_best_servers_months_select_query, missing_processed_dates_select_query
+
+
+class WorkPlanner:
+    """
+    Works out which dates and months of a requested range still have to be loaded, with one set-based query per
+    command instead of a lookup per date.
+    """
+
+    def __init__(self, conn: connection) -> None:
+        self._conn = conn
+
+    @LogUtils.log_function
+    def get_missing_dates(self, start_date: date, end_date: date) -> list[date]:
+        """
+        @return: the dates of the range that are not in processed_dates, latest first.
+        """
+        with self._conn.cursor() as cur:
+            cur.execute(missing_processed_dates_select_query, (start_date, end_date))
+            dates = [row[0] for row in cur.fetchall()]
+        logger.info(f"{len(dates)} of {(end_date - start_date).days + 1} dates in the range are not processed yet.")
+        return dates
+
+    @LogUtils.log_function
+    def get_missing_best_servers_months(self, start_month: date, end_month: date) -> list[date]:
+        """
+        @return: the first days of the months of the range that are missing from at least one best server table.
+        """
+        with self._conn.cursor() as cur:
+            cur.execute(missing_best_servers_months_select_query, (start_month, end_month))
+            months = [row[0] for row in cur.fetchall()]
+        logger.info(f"{len(months)} months in the range have no best servers yet.")
+        return months
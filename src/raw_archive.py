@@ -0,0 +1,61 @@
+from datetime import date
+from pathlib import Path
+import shutil
+from typing import Iterable, Iterator
+
+import pandas as pd
+from pandas import DataFrame
+
+from .enums import Tables
+
+archive_sources = {
+    Tables.NDT7_TEMP: "ndt7",
+    Tables.CF_TEMP: "cloudflare",
+}
+
+
+def get_day_dir(root: Path, table: Tables, day: date) -> Path:
+    return root / f"source={archive_sources[table]}" / f"date={day.strftime('%Y-%m-%d')}"
+
+
+class RawArchive:
+    """
+    Parquet archive of the daily BigQuery extracts, laid out as <root>/source=<source>/date=<yyyy-mm-dd>/part-N.parquet.
+
+    A day is written into a temporary directory that replaces the previous extract only once every frame of the
+    day has been written, so an interrupted download never leaves a partial day behind.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self._root = root
+
+    def write(self, table: Tables, day: date, frames: Iterable[DataFrame]) -> Iterator[DataFrame]:
+        """
+        Write every frame as one part file of the day while passing it on, so archiving does not keep more
+        frames in memory than the consumer does.
+        """
+        day_dir = self._day_dir(table, day)
+        tmp_dir = day_dir.with_name(f"{day_dir.name}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        completed = False
+        try:
+            for part, df in enumerate(frames):
+                df.to_parquet(tmp_dir / f"part-{part:05d}.parquet", index=False)
+                yield df
+            shutil.rmtree(day_dir, ignore_errors=True)
+            tmp_dir.rename(day_dir)
+            completed = True
+        finally:
+            if not completed:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def read(self, table: Tables, day: date) -> Iterator[DataFrame]:
+        for part_path in sorted(self._day_dir(table, day).glob("part-*.parquet")):
+            yield pd.read_parquet(part_path)
+
+    def contains(self, table: Tables, day: date) -> bool:
+        return self._day_dir(table, day).is_dir()
+
+    def _day_dir(self, table: Tables, day: date) -> Path:
+        return get_day_dir(self._root, table, day)
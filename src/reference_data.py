@@ -0,0 +1,82 @@
+import threading
+from typing import Optional
+
+from psycopg2.extensions import cursor
+
+from .config import logger
+from .sql.create_queries import reference_data_version_create_query
+from .sql.insert_queries import reference_data_version_seed_query
+from .sql.select_queries import (
+    get_top_asns_query,
+    reference_data_version_exists_query,
+    reference_data_version_select_query,
+    reference_data_version_table_lock_query,
+)
+from .sql.update_queries import reference_data_version_bump_query
+
+
+def bump_reference_data_version(cur: cursor) -> None:
+    """
+    Bump the version stamp, so every run reloads its reference snapshot. The table is created on first use, so
+    databases initialized before it existed need no --init.
+    """
+    cur.execute(reference_data_version_table_lock_query)
+    cur.execute(reference_data_version_create_query)
+    cur.execute(reference_data_version_seed_query)
+    cur.execute(reference_data_version_bump_query)
+
+
+def get_reference_data_version(cur: cursor) -> int:
+    """
+    @return: the version stamp, or 0 while it has never been bumped.
+    """
+    cur.execute(reference_data_version_exists_query)
+    row = cur.fetchone()
+    if row is None or not row[0]:
+        return 0
+    cur.execute(reference_data_version_select_query)
+    row = cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+class ReferenceSnapshot:
+    """
+    Reference data read once per reference_data_version. TableInitializer bumps the version whenever it reloads
+    ASNs, airport codes or cities, and DataLoader does so after refreshing the countries with Starlink.
+    """
+
+    def __init__(self, version: int, top_asns: Optional[str], top_asns_with_starlink: Optional[str]) -> None:
+        self.version = version
+        self._top_asns = top_asns
+        self._top_asns_with_starlink = top_asns_with_starlink
+
+    def get_top_asns(self, includes_starlink: bool) -> Optional[str]:
+        return self._top_asns_with_starlink if includes_starlink else self._top_asns
+
+
+class ReferenceCache:
+    """
+    Keeps the reference snapshot of a run. Every lookup only reads the version stamp; the snapshot is rebuilt
+    when another run has bumped it. One cache is shared by all workers of a run.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshot: Optional[ReferenceSnapshot] = None
+
+    def get_snapshot(self, cur: cursor) -> ReferenceSnapshot:
+        version = get_reference_data_version(cur)
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = self._load_snapshot(cur, version)
+                logger.info(f"Loaded reference data snapshot version {version}.")
+            return self._snapshot
+
+    @staticmethod
+    def _load_snapshot(cur: cursor, version: int) -> ReferenceSnapshot:
+        top_asns = []
+        for includes_starlink in (False, True):
+            cur.execute(get_top_asns_query(includes_starlink=includes_starlink))
+            row = cur.fetchone()
+            top_asns.append(row[0] if row else None)
+        return ReferenceSnapshot(version, top_asns[0], top_asns[1])
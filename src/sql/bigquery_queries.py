@@ -2,7 +2,7 @@ def get_cf_formatted_query(date: str, top_asns: str) -> str:
     return f"""
     SELECT
         measurementUUID AS uuid,
-        FORMAT_TIMESTAMP('%Y-%m-%d %H:%M:%E6S+00', TIMESTAMP(measurementTime), 'UTC') AS test_time,
+        TIMESTAMP(measurementTime) AS test_time,
         clientCity AS client_city,
         clientRegion AS client_region,
         clientCountry AS client_country_code,
@@ -32,7 +32,7 @@ def get_ndt_formatted_query(date: str, top_asns: str) -> str:
     return f"""
     SELECT
       a.UUID as uuid,
-      FORMAT_TIMESTAMP('%Y-%m-%d %H:%M:%E6S+00', TIMESTAMP(a.TestTime), 'UTC') AS test_time,
+      TIMESTAMP(a.TestTime) AS test_time,
       client.Geo.City AS client_city,
       client.Geo.Region AS client_region,
       client.Geo.CountryCode AS client_country_code,
@@ -174,6 +174,127 @@ def get_ndt_best_servers_query(date_from: str, date_to: str, asns: str) -> str:
     """
 
 
+def get_cf_best_servers_fused_query(date_from: str, date_to: str, top_asns: str) -> str:
+    return f"""
+    WITH city_servers AS (
+      SELECT
+        EXTRACT(YEAR FROM date) AS year,
+        EXTRACT(MONTH FROM date) AS month,
+        IF(clientASN = 14593, 'starlink', 'terrestrial') AS network_type,
+        clientCity,
+        clientCountry,
+        serverPoP,
+        (SELECT PERCENTILE_DISC(ltc, 0.5) OVER() FROM UNNEST(loadedLatencyMs.download) AS ltc LIMIT 1) AS download_latency_ms,
+        (SELECT PERCENTILE_DISC(ltc, 0.5) OVER() FROM UNNEST(loadedLatencyMs.upload) AS ltc LIMIT 1) AS upload_latency_ms,
+      FROM `measurement-lab.cloudflare.speedtest_speed1`
+      WHERE
+        date >= '{date_from}'
+        AND date <= '{date_to}'
+        AND clientCity IS NOT NULL
+        AND clientCity <> ''
+        AND clientCountry IS NOT NULL
+        AND clientCountry <> ''
+        AND serverPoP IS NOT NULL
+        AND serverPoP <> ''
+        AND (clientASN IN ({top_asns}) OR clientASN = 14593)
+    ),
+
+    city_percentiles AS (
+      SELECT DISTINCT
+        year,
+        month,
+        network_type,
+        clientCity,
+        clientCountry,
+        PERCENTILE_CONT(download_latency_ms, 0.01) OVER (PARTITION BY year, month, network_type, clientCity, clientCountry) AS download_latency_p1,
+        PERCENTILE_CONT(upload_latency_ms, 0.01) OVER (PARTITION BY year, month, network_type, clientCity, clientCountry) AS upload_latency_p1
+      FROM city_servers
+    )
+
+    SELECT DISTINCT
+      cs.clientCity,
+      cs.clientCountry,
+      cs.serverPoP,
+      cs.month,
+      cs.year,
+      cs.network_type
+    FROM city_servers cs
+    JOIN city_percentiles cp
+      ON cs.year = cp.year
+      AND cs.month = cp.month
+      AND cs.network_type = cp.network_type
+      AND cs.clientCity = cp.clientCity
+      AND cs.clientCountry = cp.clientCountry
+    WHERE
+      (cs.download_latency_ms IS NOT NULL
+        AND cs.download_latency_ms > 0
+        AND cs.download_latency_ms <= cp.download_latency_p1)
+      OR
+      (cs.upload_latency_ms IS NOT NULL
+        AND cs.upload_latency_ms > 0
+        AND cs.upload_latency_ms <= cp.upload_latency_p1)
+    """
+
+
+def get_ndt_best_servers_fused_query(date_from: str, date_to: str, top_asns: str) -> str:
+    return f"""
+    WITH server_for_client AS (
+      SELECT
+        EXTRACT(YEAR FROM date) AS year,
+        EXTRACT(MONTH FROM date) AS month,
+        IF(client.Network.ASNumber = 14593, 'starlink', 'terrestrial') AS network_type,
+        client.Geo.City AS client_city,
+        client.Geo.CountryCode AS client_country,
+        server.Geo.City AS server_city,
+        server.Geo.CountryCode AS server_country,
+        raw.Download.ServerMeasurements[OFFSET(ARRAY_LENGTH(raw.Download.ServerMeasurements) - 1)].TCPInfo.RTT AS download_latency_ms,
+        raw.Upload.ServerMeasurements[OFFSET(ARRAY_LENGTH(raw.Upload.ServerMeasurements) - 1)].TCPInfo.RTT AS upload_latency_ms
+      FROM `measurement-lab.ndt.ndt7`
+      WHERE date >= '{date_from}'
+        AND date <= '{date_to}'
+        AND client.Geo.CountryCode IS NOT NULL
+        AND client.Geo.CountryCode <> ''
+        AND client.Geo.City IS NOT NULL
+        AND client.Geo.City <> ''
+        AND a.MeanThroughputMbps <> 0.0
+        AND (client.Network.ASNumber IN ({top_asns}) OR client.Network.ASNumber = 14593)
+    ),
+
+    latency_thresholds AS (
+      SELECT DISTINCT
+        year,
+        month,
+        network_type,
+        client_city,
+        client_country,
+        PERCENTILE_CONT(download_latency_ms, 0.01) OVER (PARTITION BY year, month, network_type, client_city, client_country) AS download_latency_threshold_ms,
+        PERCENTILE_CONT(upload_latency_ms, 0.01) OVER (PARTITION BY year, month, network_type, client_city, client_country) AS upload_latency_threshold_ms
+      FROM server_for_client
+      WHERE download_latency_ms IS NOT NULL OR upload_latency_ms IS NOT NULL
+    )
+
+    SELECT DISTINCT
+      s.client_city,
+      s.client_country,
+      s.server_city,
+      s.server_country,
+      s.month,
+      s.year,
+      s.network_type
+    FROM server_for_client s
+    JOIN latency_thresholds lt
+      ON s.year = lt.year
+      AND s.month = lt.month
+      AND s.network_type = lt.network_type
+      AND s.client_city = lt.client_city
+      AND s.client_country = lt.client_country
+    WHERE
+      (s.download_latency_ms IS NOT NULL AND s.download_latency_ms > 0 AND s.download_latency_ms <= lt.download_latency_threshold_ms)
+      OR
+      (s.upload_latency_ms IS NOT NULL AND s.upload_latency_ms > 0 AND s.upload_latency_ms <= lt.upload_latency_threshold_ms)
+    """
+
+
 def get_countries_with_starlink_query(date_from: str, date_to: str) -> str:
     return f"""
     (SELECT client.Geo.CountryCode AS country_code
@@ -0,0 +1,26 @@
+from psycopg2 import sql
+
+bulk_load_savepoint_query = sql.SQL("SAVEPOINT bulk_load_chunk;")
+
+bulk_load_rollback_to_savepoint_query = sql.SQL("ROLLBACK TO SAVEPOINT bulk_load_chunk;")
+
+bulk_load_release_savepoint_query = sql.SQL("RELEASE SAVEPOINT bulk_load_chunk;")
+
+
+def get_copy_from_stdin_query(table_name: str, columns: tuple[str, ...]) -> str:
+    return f"""
+    COPY {table_name} ({", ".join(columns)})
+    FROM STDIN WITH (FORMAT csv, NULL '')
+"""
+
+
+def get_telemetry_copy_to_stdout_query(columns: tuple[str, ...], filter_columns: list[str]) -> str:
+    conditions = "".join(f"\n        AND {column} = ANY(%({column})s)" for column in filter_columns)
+    return f"""
+    COPY (
+        SELECT {", ".join(columns)}
+        FROM unified_telemetry
+        WHERE test_time >= %(start_time)s::timestamptz
+        AND test_time < %(end_time)s::timestamptz{conditions}
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
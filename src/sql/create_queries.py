@@ -1,5 +1,10 @@
+from datetime import date, timedelta
+import re
+
 from psycopg2 import sql
 
+STAGING_YEAR_MONTH_EXPRESSION = "(EXTRACT(YEAR FROM test_time AT TIME ZONE 'UTC') * 100 + EXTRACT(MONTH FROM test_time AT TIME ZONE 'UTC'))::integer"
+
 processed_dates_create_query = sql.SQL(
     """
     CREATE TABLE IF NOT EXISTS processed_dates (
@@ -13,6 +18,56 @@ processed_dates_create_query = sql.SQL(
 )
 
 
+date_stages_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS date_stages (
+        processed_date DATE NOT NULL,
+        stage TEXT NOT NULL,
+        staging_schema TEXT NOT NULL,
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        CONSTRAINT date_stages_pkey PRIMARY KEY (processed_date)
+    );
+"""
+)
+
+
+deferred_indexes_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS deferred_indexes (
+        index_name TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        definition TEXT NOT NULL,
+        clustered BOOLEAN NOT NULL,
+        deferred_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        CONSTRAINT deferred_indexes_pkey PRIMARY KEY (index_name)
+    );
+"""
+)
+
+
+replay_keys_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS replay_keys (
+        processed_date DATE NOT NULL,
+        uuid character varying(255) NOT NULL,
+        test_time TIMESTAMP WITH TIME ZONE NOT NULL,
+        CONSTRAINT replay_keys_pkey PRIMARY KEY (processed_date, uuid)
+    );
+"""
+)
+
+
+staging_schemas_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS staging_schemas (
+        schema_name TEXT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        CONSTRAINT staging_schemas_pkey PRIMARY KEY (schema_name)
+    );
+"""
+)
+
+
 caida_asn_create_table_query = sql.SQL(
     """
     CREATE TABLE IF NOT EXISTS public.as_statistics
@@ -39,6 +94,18 @@ countries_with_starlink_measurements_create_query = sql.SQL(
 )
 
 
+reference_data_version_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS reference_data_version (
+        id BOOLEAN NOT NULL DEFAULT TRUE,
+        version BIGINT NOT NULL,
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        CONSTRAINT reference_data_version_pkey PRIMARY KEY (id),
+        CONSTRAINT reference_data_version_single_row CHECK (id)
+    );
+"""
+)
+
 cities_create_query = sql.SQL(
     """
     CREATE TABLE IF NOT EXISTS public.cities
@@ -56,6 +123,20 @@ cities_create_query = sql.SQL(
 )
 
 
+city_aliases_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS public.city_aliases
+    (
+        country_code character(2) COLLATE pg_catalog."default" NOT NULL,
+        alias character varying(200) COLLATE pg_catalog."default" NOT NULL,
+        asciiname character varying(200) COLLATE pg_catalog."default" NOT NULL,
+        region character varying(200) COLLATE pg_catalog."default",
+        CONSTRAINT city_aliases_pkey PRIMARY KEY (country_code, alias)
+    )
+"""
+)
+
+
 airports_create_query = sql.SQL(
     """
     CREATE TABLE IF NOT EXISTS airport_country (
@@ -76,8 +157,13 @@ ndt_best_terrestrial_servers_create_query = sql.SQL(
         server_country_code CHAR(2) NOT NULL,
         month INTEGER NOT NULL,
         year INTEGER NOT NULL,
+        year_month INTEGER GENERATED ALWAYS AS (year * 100 + month) STORED,
         CONSTRAINT ndt7_terrestrial_servers_pkey PRIMARY KEY (client_city, client_country_code, server_city, server_country_code, month, year)
     );
+
+    CREATE INDEX IF NOT EXISTS ndt7_terrestrial_servers_year_month_city_idx
+        ON ndt7_terrestrial_servers USING btree
+        (year_month, client_country_code, client_city);
 """
 )
 
@@ -90,8 +176,13 @@ ndt_best_starlink_servers_create_query = sql.SQL(
         server_country_code CHAR(2) NOT NULL,
         month INTEGER NOT NULL,
         year INTEGER NOT NULL,
+        year_month INTEGER GENERATED ALWAYS AS (year * 100 + month) STORED,
         CONSTRAINT ndt7_starlink_servers_pkey PRIMARY KEY (client_city, client_country_code, server_city, server_country_code, month, year)
     );
+
+    CREATE INDEX IF NOT EXISTS ndt7_starlink_servers_year_month_city_idx
+        ON ndt7_starlink_servers USING btree
+        (year_month, client_country_code, client_city);
 """
 )
 
@@ -103,8 +194,13 @@ cf_best_terrestrial_servers_create_query = sql.SQL(
         server_airport_code CHAR(3) NOT NULL,
         month INTEGER NOT NULL,
         year INTEGER NOT NULL,
+        year_month INTEGER GENERATED ALWAYS AS (year * 100 + month) STORED,
         CONSTRAINT cf_terrestrial_servers_pkey PRIMARY KEY (client_city, client_country_code, server_airport_code, month, year)
     );
+
+    CREATE INDEX IF NOT EXISTS cf_terrestrial_servers_year_month_city_idx
+        ON cf_terrestrial_servers USING btree
+        (year_month, client_country_code, client_city);
 """
 )
 
@@ -116,13 +212,18 @@ cf_best_starlink_servers_create_query = sql.SQL(
         server_airport_code CHAR(3) NOT NULL,
         month INTEGER NOT NULL,
         year INTEGER NOT NULL,
+        year_month INTEGER GENERATED ALWAYS AS (year * 100 + month) STORED,
         CONSTRAINT cf_starlink_servers_pkey PRIMARY KEY (client_city, client_country_code, server_airport_code, month, year)
     );
+
+    CREATE INDEX IF NOT EXISTS cf_starlink_servers_year_month_city_idx
+        ON cf_starlink_servers USING btree
+        (year_month, client_country_code, client_city);
 """
 )
 
 cf_temp_create_query = sql.SQL(
-    """
+    f"""
     CREATE TABLE IF NOT EXISTS public.cf_temp (
         uuid VARCHAR(255) COLLATE pg_catalog."default" NOT NULL,
         test_time TIMESTAMP WITH TIME ZONE NOT NULL,
@@ -138,6 +239,7 @@ cf_temp_create_query = sql.SQL(
         upload_throughput_mbps NUMERIC(10, 5),
         upload_latency_ms INTEGER,
         upload_jitter_ms NUMERIC(10, 5),
+        year_month INTEGER GENERATED ALWAYS AS ({STAGING_YEAR_MONTH_EXPRESSION}) STORED,
         CONSTRAINT cf_temp_pkey PRIMARY KEY (uuid)
     );
 
@@ -172,7 +274,7 @@ cf_temp_create_query = sql.SQL(
 )
 
 ndt_temp_create_query = sql.SQL(
-    """
+    f"""
     CREATE TABLE IF NOT EXISTS public.ndt7_temp
     (
         uuid character varying(255) COLLATE pg_catalog."default" NOT NULL,
@@ -190,6 +292,7 @@ ndt_temp_create_query = sql.SQL(
         upload_throughput_mbps numeric(10,5),
         upload_latency_ms integer,
         upload_jitter_ms numeric(10,5),
+        year_month INTEGER GENERATED ALWAYS AS ({STAGING_YEAR_MONTH_EXPRESSION}) STORED,
         CONSTRAINT ndt7_temp_pkey PRIMARY KEY (uuid)
     );
 
@@ -224,6 +327,55 @@ ndt_temp_create_query = sql.SQL(
 )
 
 
+cf_temp_unlogged_create_query = sql.SQL(
+    f"""
+    CREATE UNLOGGED TABLE IF NOT EXISTS public.cf_temp (
+        uuid VARCHAR(255) COLLATE pg_catalog."default" NOT NULL,
+        test_time TIMESTAMP WITH TIME ZONE NOT NULL,
+        client_city VARCHAR(255) COLLATE pg_catalog."default",
+        client_region VARCHAR(255) COLLATE pg_catalog."default",
+        client_country_code CHAR(2) COLLATE pg_catalog."default" NOT NULL,
+        server_airport_code CHAR(3) COLLATE pg_catalog."default" NOT NULL,
+        asn INTEGER NOT NULL,
+        packet_loss_rate NUMERIC(10, 5),
+        download_throughput_mbps NUMERIC(10, 5),
+        download_latency_ms INTEGER,
+        download_jitter_ms NUMERIC(10, 5),
+        upload_throughput_mbps NUMERIC(10, 5),
+        upload_latency_ms INTEGER,
+        upload_jitter_ms NUMERIC(10, 5),
+        year_month INTEGER GENERATED ALWAYS AS ({STAGING_YEAR_MONTH_EXPRESSION}) STORED,
+        CONSTRAINT cf_temp_pkey PRIMARY KEY (uuid)
+    );
+"""
+)
+
+ndt_temp_unlogged_create_query = sql.SQL(
+    f"""
+    CREATE UNLOGGED TABLE IF NOT EXISTS public.ndt7_temp
+    (
+        uuid character varying(255) COLLATE pg_catalog."default" NOT NULL,
+        test_time TIMESTAMP WITH TIME ZONE NOT NULL,
+        client_region character varying(255) COLLATE pg_catalog."default",
+        client_city character varying(255) COLLATE pg_catalog."default",
+        client_country_code character(2) COLLATE pg_catalog."default" NOT NULL,
+        server_city character varying(255) COLLATE pg_catalog."default",
+        server_country_code character(2) COLLATE pg_catalog."default" NOT NULL,
+        asn integer NOT NULL,
+        packet_loss_rate numeric(10,5) NOT NULL,
+        download_throughput_mbps numeric(10,5),
+        download_latency_ms integer,
+        download_jitter_ms numeric(10,5),
+        upload_throughput_mbps numeric(10,5),
+        upload_latency_ms integer,
+        upload_jitter_ms numeric(10,5),
+        year_month INTEGER GENERATED ALWAYS AS ({STAGING_YEAR_MONTH_EXPRESSION}) STORED,
+        CONSTRAINT ndt7_temp_pkey PRIMARY KEY (uuid)
+    );
+"""
+)
+
+
 unified_telemetry_create_query = sql.SQL(
     """
     CREATE TABLE IF NOT EXISTS public.unified_telemetry
@@ -276,3 +428,193 @@ unified_telemetry_create_query = sql.SQL(
         TABLESPACE pg_default;
 """
 )
+
+
+unified_telemetry_partitioned_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS public.unified_telemetry
+    (
+        uuid character varying(255) COLLATE pg_catalog."default" NOT NULL,
+        test_time TIMESTAMP WITH TIME ZONE NOT NULL,
+        client_city character varying(255) COLLATE pg_catalog."default",
+        client_region character varying(255) COLLATE pg_catalog."default",
+        client_country_code character(2) COLLATE pg_catalog."default" NOT NULL,
+        server_city character varying(255) COLLATE pg_catalog."default",
+        server_country_code character(2) COLLATE pg_catalog."default" NOT NULL,
+        asn integer NOT NULL,
+        data_source character varying(255) COLLATE pg_catalog."default" NOT NULL,
+        packet_loss_rate numeric(10,5) NOT NULL,
+        download_throughput_mbps numeric(10,5),
+        download_latency_ms integer,
+        download_jitter_ms numeric(10,5),
+        upload_throughput_mbps numeric(10,5),
+        upload_latency_ms integer,
+        upload_jitter_ms numeric(10,5),
+        CONSTRAINT unified_telemetry_pkey PRIMARY KEY (uuid, test_time)
+    ) PARTITION BY RANGE (test_time);
+"""
+)
+
+
+def get_unified_telemetry_partition_name(month_start: date) -> str:
+    return f"unified_telemetry_y{month_start.year}m{month_start.month:02d}"
+
+
+def get_unified_telemetry_partition_create_query(month_start: date) -> str:
+    next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+    partition = get_unified_telemetry_partition_name(month_start)
+    return f"""
+    CREATE TABLE IF NOT EXISTS public.{partition}
+        PARTITION OF public.unified_telemetry
+        FOR VALUES FROM ('{month_start.strftime("%Y-%m-%d")} 00:00:00+00') TO ('{next_month_start.strftime("%Y-%m-%d")} 00:00:00+00');
+"""
+
+
+# Definitions of the secondary indexes of a month partition by index name, in the form of pg_get_indexdef, so
+# they can be recorded in deferred_indexes like the indexes a bulk load drops.
+def get_unified_telemetry_partition_index_definitions(month_start: date) -> dict[str, str]:
+    partition = get_unified_telemetry_partition_name(month_start)
+    return {
+        f"time_btree_{partition}": f"CREATE INDEX time_btree_{partition} ON public.{partition} USING btree (test_time)",
+        f"asn_btree_{partition}": f"CREATE INDEX asn_btree_{partition} ON public.{partition} USING btree (asn)",
+        f"country_btree_{partition}": (
+            f"CREATE INDEX country_btree_{partition} ON public.{partition} USING btree (client_country_code)"
+        ),
+        f"country_hash_{partition}": (
+            f"CREATE INDEX country_hash_{partition} ON public.{partition} USING hash (client_country_code)"
+        ),
+    }
+
+
+ndt_temp_add_year_month_query = sql.SQL(
+    f"""
+    ALTER TABLE ndt7_temp
+        ADD COLUMN IF NOT EXISTS year_month INTEGER GENERATED ALWAYS AS ({STAGING_YEAR_MONTH_EXPRESSION}) STORED;
+"""
+)
+
+cf_temp_add_year_month_query = sql.SQL(
+    f"""
+    ALTER TABLE cf_temp
+        ADD COLUMN IF NOT EXISTS year_month INTEGER GENERATED ALWAYS AS ({STAGING_YEAR_MONTH_EXPRESSION}) STORED;
+"""
+)
+
+
+def get_best_servers_add_year_month_query(table_name: str) -> sql.SQL:
+    return sql.SQL(
+        f"""
+    ALTER TABLE {table_name}
+        ADD COLUMN IF NOT EXISTS year_month INTEGER GENERATED ALWAYS AS (year * 100 + month) STORED;
+
+    CREATE INDEX IF NOT EXISTS {table_name}_year_month_city_idx
+        ON {table_name} USING btree
+        (year_month, client_country_code, client_city);
+"""
+    )
+
+
+def get_staging_schema_create_query(schema_name: str, unlogged: bool) -> str:
+    table_kind = "UNLOGGED TABLE" if unlogged else "TABLE"
+    return f"""
+    CREATE SCHEMA IF NOT EXISTS {schema_name};
+
+    CREATE {table_kind} IF NOT EXISTS {schema_name}.ndt7_temp
+        (LIKE public.ndt7_temp INCLUDING ALL);
+
+    CREATE {table_kind} IF NOT EXISTS {schema_name}.cf_temp
+        (LIKE public.cf_temp INCLUDING ALL);
+"""
+
+
+ndt7_latency_sketches_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS ndt7_latency_sketches (
+        sketch_date DATE NOT NULL,
+        year_month INTEGER GENERATED ALWAYS AS ((EXTRACT(YEAR FROM sketch_date) * 100 + EXTRACT(MONTH FROM sketch_date))::integer) STORED,
+        network_type VARCHAR(16) NOT NULL,
+        client_city VARCHAR(255) NOT NULL,
+        client_country_code CHAR(2) NOT NULL,
+        server_city VARCHAR(255) NOT NULL,
+        server_country_code CHAR(2) NOT NULL,
+        direction VARCHAR(8) NOT NULL,
+        bucket SMALLINT NOT NULL,
+        count BIGINT NOT NULL,
+        CONSTRAINT ndt7_latency_sketches_pkey PRIMARY KEY (sketch_date, network_type, client_city, client_country_code, server_city, server_country_code, direction, bucket)
+    );
+
+    CREATE INDEX IF NOT EXISTS ndt7_latency_sketches_year_month_idx
+        ON ndt7_latency_sketches USING btree
+        (year_month);
+"""
+)
+
+cf_latency_sketches_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS cf_latency_sketches (
+        sketch_date DATE NOT NULL,
+        year_month INTEGER GENERATED ALWAYS AS ((EXTRACT(YEAR FROM sketch_date) * 100 + EXTRACT(MONTH FROM sketch_date))::integer) STORED,
+        network_type VARCHAR(16) NOT NULL,
+        client_city VARCHAR(255) NOT NULL,
+        client_country_code CHAR(2) NOT NULL,
+        server_airport_code CHAR(3) NOT NULL,
+        direction VARCHAR(8) NOT NULL,
+        bucket SMALLINT NOT NULL,
+        count BIGINT NOT NULL,
+        CONSTRAINT cf_latency_sketches_pkey PRIMARY KEY (sketch_date, network_type, client_city, client_country_code, server_airport_code, direction, bucket)
+    );
+
+    CREATE INDEX IF NOT EXISTS cf_latency_sketches_year_month_idx
+        ON cf_latency_sketches USING btree
+        (year_month);
+"""
+)
+
+telemetry_rollups_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS telemetry_rollups (
+        granularity VARCHAR(8) NOT NULL,
+        period_start DATE NOT NULL,
+        client_country_code CHAR(2) NOT NULL,
+        client_city VARCHAR(255) NOT NULL,
+        asn INTEGER NOT NULL,
+        data_source VARCHAR(255) NOT NULL,
+        server_country_code CHAR(2) NOT NULL,
+        server_city VARCHAR(255) NOT NULL,
+        tests BIGINT NOT NULL,
+        packet_loss_sum DOUBLE PRECISION NOT NULL,
+        download_throughput_count BIGINT NOT NULL,
+        download_throughput_sum DOUBLE PRECISION NOT NULL,
+        download_latency_count BIGINT NOT NULL,
+        download_latency_sum BIGINT NOT NULL,
+        upload_throughput_count BIGINT NOT NULL,
+        upload_throughput_sum DOUBLE PRECISION NOT NULL,
+        upload_latency_count BIGINT NOT NULL,
+        upload_latency_sum BIGINT NOT NULL,
+        CONSTRAINT telemetry_rollups_pkey PRIMARY KEY (granularity, period_start, client_country_code, client_city, asn, data_source, server_country_code, server_city)
+    );
+"""
+)
+
+telemetry_rollup_histograms_create_query = sql.SQL(
+    """
+    CREATE TABLE IF NOT EXISTS telemetry_rollup_histograms (
+        granularity VARCHAR(8) NOT NULL,
+        period_start DATE NOT NULL,
+        client_country_code CHAR(2) NOT NULL,
+        client_city VARCHAR(255) NOT NULL,
+        asn INTEGER NOT NULL,
+        data_source VARCHAR(255) NOT NULL,
+        server_country_code CHAR(2) NOT NULL,
+        server_city VARCHAR(255) NOT NULL,
+        metric VARCHAR(32) NOT NULL,
+        bucket SMALLINT NOT NULL,
+        count BIGINT NOT NULL,
+        CONSTRAINT telemetry_rollup_histograms_pkey PRIMARY KEY (granularity, period_start, client_country_code, client_city, asn, data_source, server_country_code, server_city, metric, bucket)
+    );
+"""
+)
+
+
+def get_create_index_if_not_exists_query(definition: str) -> str:
+    return re.sub(r"^CREATE (UNIQUE )?INDEX ", r"CREATE \1INDEX IF NOT EXISTS ", definition.strip()) + ";"
@@ -1,116 +1,109 @@
 from psycopg2 import sql
 
+from .rollup_queries import get_telemetry_delete_query
+
 
 def get_ndt7_temp_delete_invalid_servers_query(table: str) -> str:
     return f"""
-    DELETE FROM ndt7_temp n
-    WHERE
-        n.asn {"=" if 'starlink' in table else "!="} 14593
-        AND (
-                (
-                    EXISTS (
-                        SELECT 1
-                        FROM {table} sv
-                        WHERE sv.client_city = n.client_city
-                        AND sv.client_country_code = n.client_country_code
-                        AND sv.month = EXTRACT(MONTH FROM n.test_time AT TIME ZONE 'UTC')
-                        AND sv.year = EXTRACT(YEAR FROM n.test_time AT TIME ZONE 'UTC')
-                    )
-                    AND NOT EXISTS (
-                        SELECT 1
-                        FROM {table} sv
-                        WHERE sv.client_city = n.client_city
-                        AND sv.client_country_code = n.client_country_code
-                        AND sv.server_city = n.server_city
-                        AND sv.server_country_code = n.server_country_code
-                        AND sv.month = EXTRACT(MONTH FROM n.test_time AT TIME ZONE 'UTC')
-                        AND sv.year = EXTRACT(YEAR FROM n.test_time AT TIME ZONE 'UTC')
-                    )
-                )
-                OR
-                (
-                    NOT EXISTS (
-                        SELECT 1
-                        FROM {table} sv
-                        WHERE sv.client_city = n.client_city
-                        AND sv.client_country_code = n.client_country_code
-                        AND sv.month = EXTRACT(MONTH FROM n.test_time AT TIME ZONE 'UTC')
-                        AND sv.year = EXTRACT(YEAR FROM n.test_time AT TIME ZONE 'UTC')
-                    )
-                    AND EXISTS (
-                        SELECT 1
-                        FROM {table} sv
-                        WHERE sv.client_country_code = n.client_country_code
-                        AND sv.month = EXTRACT(MONTH FROM n.test_time AT TIME ZONE 'UTC')
-                        AND sv.year = EXTRACT(YEAR FROM n.test_time AT TIME ZONE 'UTC')
-                    )
-                    AND NOT EXISTS (
-                        SELECT 1
-                        FROM {table} sv
-                        WHERE sv.client_country_code = n.client_country_code
-                        AND sv.server_city = n.server_city
-                        AND sv.server_country_code = n.server_country_code
-                        AND sv.month = EXTRACT(MONTH FROM n.test_time AT TIME ZONE 'UTC')
-                        AND sv.year = EXTRACT(YEAR FROM n.test_time AT TIME ZONE 'UTC')
-                    )
-                )
+    WITH servers AS (
+        SELECT year_month, client_country_code, client_city, server_city, server_country_code
+        FROM {table}
+        WHERE year_month IN (SELECT DISTINCT year_month FROM ndt7_temp)
+    ),
+    known_cities AS (
+        SELECT DISTINCT year_month, client_country_code, client_city
+        FROM servers
+    ),
+    known_countries AS (
+        SELECT DISTINCT year_month, client_country_code
+        FROM servers
+    ),
+    country_servers AS (
+        SELECT DISTINCT year_month, client_country_code, server_city, server_country_code
+        FROM servers
+    ),
+    invalid AS (
+        SELECT n.uuid
+        FROM ndt7_temp n
+        LEFT JOIN known_cities kc
+            ON kc.year_month = n.year_month
+            AND kc.client_country_code = n.client_country_code
+            AND kc.client_city = n.client_city
+        LEFT JOIN servers sv
+            ON sv.year_month = n.year_month
+            AND sv.client_country_code = n.client_country_code
+            AND sv.client_city = n.client_city
+            AND sv.server_city = n.server_city
+            AND sv.server_country_code = n.server_country_code
+        LEFT JOIN known_countries kn
+            ON kn.year_month = n.year_month
+            AND kn.client_country_code = n.client_country_code
+        LEFT JOIN country_servers cs
+            ON cs.year_month = n.year_month
+            AND cs.client_country_code = n.client_country_code
+            AND cs.server_city = n.server_city
+            AND cs.server_country_code = n.server_country_code
+        WHERE
+            n.asn {"=" if 'starlink' in table else "!="} 14593
+            AND (
+                (kc.year_month IS NOT NULL AND sv.year_month IS NULL)
+                OR (kc.year_month IS NULL AND kn.year_month IS NOT NULL AND cs.year_month IS NULL)
             )
+    )
+    DELETE FROM ndt7_temp n
+    USING invalid i
+    WHERE n.uuid = i.uuid
 """
 
 
 def get_cf_temp_delete_invalid_servers_query(table: str) -> str:
     return f"""
-        DELETE FROM cf_temp c
+    WITH servers AS (
+        SELECT year_month, client_country_code, client_city, server_airport_code
+        FROM {table}
+        WHERE year_month IN (SELECT DISTINCT year_month FROM cf_temp)
+    ),
+    known_cities AS (
+        SELECT DISTINCT year_month, client_country_code, client_city
+        FROM servers
+    ),
+    known_countries AS (
+        SELECT DISTINCT year_month, client_country_code
+        FROM servers
+    ),
+    country_servers AS (
+        SELECT DISTINCT year_month, client_country_code, server_airport_code
+        FROM servers
+    ),
+    invalid AS (
+        SELECT c.uuid
+        FROM cf_temp c
+        LEFT JOIN known_cities kc
+            ON kc.year_month = c.year_month
+            AND kc.client_country_code = c.client_country_code
+            AND kc.client_city = c.client_city
+        LEFT JOIN servers sv
+            ON sv.year_month = c.year_month
+            AND sv.client_country_code = c.client_country_code
+            AND sv.client_city = c.client_city
+            AND sv.server_airport_code = c.server_airport_code
+        LEFT JOIN known_countries kn
+            ON kn.year_month = c.year_month
+            AND kn.client_country_code = c.client_country_code
+        LEFT JOIN country_servers cs
+            ON cs.year_month = c.year_month
+            AND cs.client_country_code = c.client_country_code
+            AND cs.server_airport_code = c.server_airport_code
         WHERE
             c.asn {"=" if 'starlink' in table else "!="} 14593
-            AND
-            (
-                (
-                    EXISTS (
-                        SELECT 1
-                        FROM {table} sv
-                        WHERE sv.client_city = c.client_city
-                        AND sv.client_country_code = c.client_country_code
-                        AND sv.month = EXTRACT(MONTH FROM c.test_time AT TIME ZONE 'UTC')
-                        AND sv.year = EXTRACT(YEAR FROM c.test_time AT TIME ZONE 'UTC')
-                    )
-                    AND NOT EXISTS (
-                        SELECT 1
-                        FROM {table} sv
-                        WHERE sv.client_city = c.client_city
-                        AND sv.client_country_code = c.client_country_code
-                        AND sv.server_airport_code = c.server_airport_code
-                        AND sv.month = EXTRACT(MONTH FROM c.test_time AT TIME ZONE 'UTC')
-                        AND sv.year = EXTRACT(YEAR FROM c.test_time AT TIME ZONE 'UTC')
-                    )
-                )
-                OR
-                (
-                    NOT EXISTS (
-                        SELECT 1
-                        FROM {table} sv
-                        WHERE sv.client_city = c.client_city
-                        AND sv.client_country_code = c.client_country_code
-                        AND sv.month = EXTRACT(MONTH FROM c.test_time AT TIME ZONE 'UTC')
-                        AND sv.year = EXTRACT(YEAR FROM c.test_time AT TIME ZONE 'UTC')
-                    )
-                    AND EXISTS (
-                        SELECT 1
-                        FROM {table} sv
-                        WHERE sv.client_country_code = c.client_country_code
-                        AND sv.month = EXTRACT(MONTH FROM c.test_time AT TIME ZONE 'UTC')
-                        AND sv.year = EXTRACT(YEAR FROM c.test_time AT TIME ZONE 'UTC')
-                    )
-                    AND NOT EXISTS (
-                        SELECT 1
-                        FROM {table} sv
-                        WHERE sv.client_country_code = c.client_country_code
-                        AND sv.server_airport_code = c.server_airport_code
-                        AND sv.month = EXTRACT(MONTH FROM c.test_time AT TIME ZONE 'UTC')
-                        AND sv.year = EXTRACT(YEAR FROM c.test_time AT TIME ZONE 'UTC')
-                    )
-                )
+            AND (
+                (kc.year_month IS NOT NULL AND sv.year_month IS NULL)
+                OR (kc.year_month IS NULL AND kn.year_month IS NOT NULL AND cs.year_month IS NULL)
             )
+    )
+    DELETE FROM cf_temp c
+    USING invalid i
+    WHERE c.uuid = i.uuid
 """
 
 
@@ -119,16 +112,82 @@ def delete_all_from_table_query(table_name: str) -> sql.SQL:
     return sql.SQL(query)
 
 
+def get_truncate_table_query(table_name: str) -> sql.SQL:
+    query = f"TRUNCATE TABLE {table_name};"
+    return sql.SQL(query)
+
+
 airport_codes_standardize_cities_query = sql.SQL(
     """
     UPDATE airport_country ac
     SET
-        airport_city = c.asciiname
-    FROM cities c
+        airport_city = a.asciiname
+    FROM city_aliases a
     WHERE
-        ac.airport_city IS NOT NULL
-        AND ac.airport_city <> ''
-        AND ac.airport_city IN (c.name, c.asciiname, c.name1, c.name2, c.name3, c.name4)
-        AND ac.country_code = c.country_code;
+        ac.country_code = a.country_code
+        AND ac.airport_city = a.alias
+        AND ac.airport_city <> a.asciiname;
+"""
+)
+
+
+processed_date_delete_query = sql.SQL(
+    """
+    DELETE FROM processed_dates
+    WHERE processed_date = %s
+"""
+)
+
+
+date_stages_delete_unfinished_query = sql.SQL(
+    """
+    DELETE FROM date_stages
+    WHERE staging_schema = current_schema()
+    AND stage <> %s
+"""
+)
+
+
+# Returns the number of deleted rows, which are also subtracted from the rollups.
+unified_telemetry_delete_replayed_query = sql.SQL(
+    get_telemetry_delete_query(
+        """
+        DELETE FROM unified_telemetry u
+        USING replay_keys r
+        WHERE r.processed_date = %s
+        AND u.uuid = r.uuid
+        AND u.test_time = r.test_time
+"""
+    )
+)
+
+
+replay_keys_delete_query = sql.SQL(
+    """
+    DELETE FROM replay_keys
+    WHERE processed_date = %s
+"""
+)
+
+
+def get_latency_sketches_delete_day_query(table_name: str) -> str:
+    return f"""
+    DELETE FROM {table_name}
+    WHERE sketch_date = %(sketch_date)s
+    AND network_type = ANY(%(network_types)s);
+"""
+
+
+def get_best_servers_delete_months_query(table_name: str) -> str:
+    return f"""
+    DELETE FROM {table_name}
+    WHERE year_month BETWEEN %(year_month_from)s AND %(year_month_to)s;
+"""
+
+
+deferred_index_delete_query = sql.SQL(
+    """
+    DELETE FROM deferred_indexes
+    WHERE index_name = %s;
 """
 )
@@ -3,8 +3,17 @@ from psycopg2 import sql
 drop_tables_query = sql.SQL(
     """
     DROP TABLE IF EXISTS as_statistics, countries_with_starlink_measurements,
-    cities, airport_country, ndt7_terrestrial_servers, ndt7_starlink_servers,
+    cities, city_aliases, airport_country, ndt7_terrestrial_servers, ndt7_starlink_servers,
     cf_terrestrial_servers, cf_starlink_servers, cf_temp, ndt7_temp,
-    unified_telemetry, processed_dates CASCADE;
+    unified_telemetry, processed_dates, date_stages, reference_data_version, ndt7_latency_sketches, cf_latency_sketches,
+    deferred_indexes, staging_schemas, replay_keys, telemetry_rollups, telemetry_rollup_histograms CASCADE;
     """
 )
+
+
+def get_drop_schema_query(schema_name: str) -> str:
+    return f"DROP SCHEMA IF EXISTS {schema_name} CASCADE;"
+
+
+def get_drop_index_query(index_name: str) -> str:
+    return f"DROP INDEX IF EXISTS public.{index_name};"
@@ -1,6 +1,7 @@
 from psycopg2 import sql
 
 from ..enums import DataSource
+from .rollup_queries import get_telemetry_merge_query
 
 processed_dates_insert_query = sql.SQL(
     """
@@ -8,6 +9,55 @@ processed_dates_insert_query = sql.SQL(
 """
 )
 
+date_stages_insert_query = sql.SQL(
+    """
+    INSERT INTO date_stages (processed_date, stage, staging_schema) VALUES %s
+    ON CONFLICT (processed_date) DO UPDATE
+    SET stage = EXCLUDED.stage, staging_schema = EXCLUDED.staging_schema, updated_at = now()
+"""
+)
+
+deferred_indexes_insert_query = sql.SQL(
+    """
+    INSERT INTO deferred_indexes (index_name, table_name, definition, clustered) VALUES %s
+    ON CONFLICT DO NOTHING
+"""
+)
+
+replay_keys_insert_query = sql.SQL(
+    """
+    INSERT INTO replay_keys (processed_date, uuid, test_time) VALUES %s
+    ON CONFLICT DO NOTHING
+"""
+)
+
+replay_keys_from_staging_insert_query = sql.SQL(
+    """
+    INSERT INTO replay_keys (processed_date, uuid, test_time)
+    SELECT %s::date, r.uuid, r.test_time
+    FROM (
+        SELECT uuid, test_time FROM ndt7_temp
+        UNION ALL
+        SELECT uuid, test_time FROM cf_temp
+    ) r
+    ON CONFLICT DO NOTHING
+"""
+)
+
+staging_schemas_insert_query = sql.SQL(
+    """
+    INSERT INTO staging_schemas (schema_name) VALUES %s
+    ON CONFLICT DO NOTHING
+"""
+)
+
+reference_data_version_seed_query = sql.SQL(
+    """
+    INSERT INTO reference_data_version (version) VALUES (1)
+    ON CONFLICT DO NOTHING;
+"""
+)
+
 
 cities_insert_query = sql.SQL(
     """
@@ -16,6 +66,33 @@ cities_insert_query = sql.SQL(
 """
 )
 
+city_aliases_insert_query = sql.SQL(
+    """
+    INSERT INTO city_aliases (country_code, alias, asciiname, region)
+    VALUES %s
+"""
+)
+
+city_aliases_refresh_query = sql.SQL(
+    """
+    DELETE FROM city_aliases;
+
+    INSERT INTO city_aliases (country_code, alias, asciiname, region)
+    SELECT DISTINCT ON (c.country_code, a.alias)
+        c.country_code,
+        a.alias,
+        c.asciiname,
+        c.region
+    FROM cities c
+    CROSS JOIN LATERAL (
+        VALUES (c.name, 0), (c.asciiname, 1), (c.name1, 2), (c.name2, 2), (c.name3, 2), (c.name4, 2)
+    ) AS a(alias, priority)
+    WHERE a.alias IS NOT NULL AND a.alias <> ''
+    ORDER BY c.country_code, a.alias, a.priority, c.asciiname;
+"""
+)
+
+
 ndt_temp_insert_query = sql.SQL(
     """
             INSERT INTO ndt7_temp (
@@ -131,20 +208,165 @@ countries_with_starlink_measurements_insert_query = sql.SQL(
 """
 )
 
+# The merges return the number of rows inserted into unified_telemetry, which are also added to the rollups.
 global_telemetry_from_cf_insert_query = sql.SQL(
-    f"""
-    INSERT INTO unified_telemetry (uuid, test_time, client_city, client_region, client_country_code, server_city, server_country_code, asn, data_source, packet_loss_rate, download_throughput_mbps, download_latency_ms, download_jitter_ms, upload_throughput_mbps, upload_latency_ms, upload_jitter_ms)
-    SELECT uuid, test_time, client_city, client_region, client_country_code, ac.airport_city AS server_city, ac.country_code AS server_country_code, asn, '{DataSource.CF.value}' AS data_source, packet_loss_rate, download_throughput_mbps, download_latency_ms, download_jitter_ms, upload_throughput_mbps, upload_latency_ms, upload_jitter_ms
-    FROM cf_temp JOIN airport_country ac ON cf_temp.server_airport_code = ac.airport_code
-    ON CONFLICT DO NOTHING;
+    get_telemetry_merge_query(
+        f"""
+        SELECT uuid, test_time, client_city, client_region, client_country_code, ac.airport_city AS server_city, ac.country_code AS server_country_code, asn, '{DataSource.CF.value}' AS data_source, packet_loss_rate, download_throughput_mbps, download_latency_ms, download_jitter_ms, upload_throughput_mbps, upload_latency_ms, upload_jitter_ms
+        FROM cf_temp JOIN airport_country ac ON cf_temp.server_airport_code = ac.airport_code
 """
+    )
 )
 
 global_telemetry_from_ndt_insert_query = sql.SQL(
-    f"""
-    INSERT INTO unified_telemetry (uuid, test_time, client_city, client_region, client_country_code, server_city, server_country_code, asn, data_source, packet_loss_rate, download_throughput_mbps, download_latency_ms, download_jitter_ms, upload_throughput_mbps, upload_latency_ms, upload_jitter_ms)
-    SELECT uuid, test_time, client_city, client_region, client_country_code, server_city, server_country_code, asn, '{DataSource.NDT7.value}' AS data_source, packet_loss_rate, download_throughput_mbps, download_latency_ms, download_jitter_ms, upload_throughput_mbps, upload_latency_ms, upload_jitter_ms
-    FROM ndt7_temp
-    ON CONFLICT DO NOTHING;
+    get_telemetry_merge_query(
+        f"""
+        SELECT uuid, test_time, client_city, client_region, client_country_code, server_city, server_country_code, asn, '{DataSource.NDT7.value}' AS data_source, packet_loss_rate, download_throughput_mbps, download_latency_ms, download_jitter_ms, upload_throughput_mbps, upload_latency_ms, upload_jitter_ms
+        FROM ndt7_temp
+"""
+    )
+)
+
+
+ndt7_latency_sketches_insert_query = sql.SQL(
+    """
+    INSERT INTO ndt7_latency_sketches AS s (sketch_date, network_type, client_city, client_country_code, server_city, server_country_code, direction, bucket, count)
+    VALUES %s
+    ON CONFLICT (sketch_date, network_type, client_city, client_country_code, server_city, server_country_code, direction, bucket)
+    DO UPDATE SET count = s.count + EXCLUDED.count
+"""
+)
+
+cf_latency_sketches_insert_query = sql.SQL(
+    """
+    INSERT INTO cf_latency_sketches AS s (sketch_date, network_type, client_city, client_country_code, server_airport_code, direction, bucket, count)
+    VALUES %s
+    ON CONFLICT (sketch_date, network_type, client_city, client_country_code, server_airport_code, direction, bucket)
+    DO UPDATE SET count = s.count + EXCLUDED.count
+"""
+)
+
+ndt7_latency_sketches_fill_query = sql.SQL(
+    """
+    INSERT INTO ndt7_latency_sketches AS s (sketch_date, network_type, client_city, client_country_code, server_city, server_country_code, direction, bucket, count)
+    SELECT
+        %(sketch_date)s::date,
+        CASE WHEN n.asn = 14593 THEN 'starlink' ELSE 'terrestrial' END,
+        n.client_city,
+        n.client_country_code,
+        n.server_city,
+        n.server_country_code,
+        l.direction,
+        CEIL(LN(l.latency_ms) / %(log_gamma)s)::smallint,
+        COUNT(*)
+    FROM ndt7_temp n
+    CROSS JOIN LATERAL (
+        VALUES ('download', n.download_latency_ms), ('upload', n.upload_latency_ms)
+    ) AS l (direction, latency_ms)
+    WHERE
+        n.client_city IS NOT NULL
+        AND n.client_country_code IS NOT NULL
+        AND n.server_city IS NOT NULL
+        AND n.server_country_code IS NOT NULL
+        AND l.latency_ms > 0
+    GROUP BY 2, 3, 4, 5, 6, 7, 8
+    ON CONFLICT (sketch_date, network_type, client_city, client_country_code, server_city, server_country_code, direction, bucket)
+    DO UPDATE SET count = s.count + EXCLUDED.count;
+"""
+)
+
+cf_latency_sketches_fill_query = sql.SQL(
+    """
+    INSERT INTO cf_latency_sketches AS s (sketch_date, network_type, client_city, client_country_code, server_airport_code, direction, bucket, count)
+    SELECT
+        %(sketch_date)s::date,
+        CASE WHEN c.asn = 14593 THEN 'starlink' ELSE 'terrestrial' END,
+        c.client_city,
+        c.client_country_code,
+        c.server_airport_code,
+        l.direction,
+        CEIL(LN(l.latency_ms) / %(log_gamma)s)::smallint,
+        COUNT(*)
+    FROM cf_temp c
+    CROSS JOIN LATERAL (
+        VALUES ('download', c.download_latency_ms), ('upload', c.upload_latency_ms)
+    ) AS l (direction, latency_ms)
+    WHERE
+        c.client_city IS NOT NULL
+        AND c.client_country_code IS NOT NULL
+        AND c.server_airport_code IS NOT NULL
+        AND l.latency_ms > 0
+    GROUP BY 2, 3, 4, 5, 6, 7
+    ON CONFLICT (sketch_date, network_type, client_city, client_country_code, server_airport_code, direction, bucket)
+    DO UPDATE SET count = s.count + EXCLUDED.count;
+"""
+)
+
+
+def get_best_servers_from_sketches_insert_query(
+    target_table: str, sketch_table: str, server_columns: tuple[str, ...]
+) -> str:
+    servers = ", ".join(server_columns)
+    ranked_servers = ", ".join(f"sm.{column}" for column in server_columns)
+    return f"""
+    WITH sketches AS (
+        SELECT network_type, year_month, client_country_code, client_city, {servers}, direction, bucket, count
+        FROM {sketch_table}
+        WHERE year_month BETWEEN %(year_month_from)s AND %(year_month_to)s
+        AND network_type = %(network_type)s
+    ),
+    city_buckets AS (
+        SELECT year_month, client_country_code, client_city, direction, bucket, SUM(count) AS count
+        FROM sketches
+        GROUP BY year_month, client_country_code, client_city, direction, bucket
+    ),
+    city_ranks AS (
+        SELECT
+            year_month,
+            client_country_code,
+            client_city,
+            direction,
+            bucket,
+            SUM(count) OVER (
+                PARTITION BY year_month, client_country_code, client_city, direction ORDER BY bucket
+            ) AS cumulative_count,
+            SUM(count) OVER (PARTITION BY year_month, client_country_code, client_city, direction) AS total_count
+        FROM city_buckets
+    ),
+    thresholds AS (
+        SELECT year_month, client_country_code, client_city, direction, MIN(bucket) AS threshold_bucket
+        FROM city_ranks
+        WHERE cumulative_count >= CEIL(1 + %(quantile)s * (total_count - 1))
+        GROUP BY year_month, client_country_code, client_city, direction
+    ),
+    server_minimums AS (
+        SELECT year_month, client_country_code, client_city, {servers}, direction, MIN(bucket) AS min_bucket
+        FROM sketches
+        GROUP BY year_month, client_country_code, client_city, {servers}, direction
+    )
+    INSERT INTO {target_table} (client_city, client_country_code, {servers}, month, year)
+    SELECT DISTINCT
+        sm.client_city, sm.client_country_code, {ranked_servers}, MOD(sm.year_month, 100), sm.year_month / 100
+    FROM server_minimums sm
+    JOIN thresholds t
+        ON t.year_month = sm.year_month
+        AND t.client_country_code = sm.client_country_code
+        AND t.client_city = sm.client_city
+        AND t.direction = sm.direction
+    WHERE sm.min_bucket <= t.threshold_bucket;
+"""
+
+
+telemetry_rollups_insert_query = sql.SQL(
+    """
+    INSERT INTO telemetry_rollups (granularity, period_start, client_country_code, client_city, asn, data_source, server_country_code, server_city, tests, packet_loss_sum, download_throughput_count, download_throughput_sum, download_latency_count, download_latency_sum, upload_throughput_count, upload_throughput_sum, upload_latency_count, upload_latency_sum)
+    VALUES %s
+"""
+)
+
+telemetry_rollup_histograms_insert_query = sql.SQL(
+    """
+    INSERT INTO telemetry_rollup_histograms (granularity, period_start, client_country_code, client_city, asn, data_source, server_country_code, server_city, metric, bucket, count)
+    VALUES %s
 """
 )
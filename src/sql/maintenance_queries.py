@@ -0,0 +1,11 @@
+from psycopg2 import sql
+
+
+def get_analyze_table_query(table_name: str) -> sql.SQL:
+    query = f"ANALYZE {table_name};"
+    return sql.SQL(query)
+
+
+def get_cluster_on_query(table_name: str, index_name: str) -> sql.SQL:
+    query = f"ALTER TABLE public.{table_name} CLUSTER ON {index_name};"
+    return sql.SQL(query)
@@ -0,0 +1,158 @@
+import math
+
+from psycopg2 import sql
+
+from ..enums import RollupGranularity
+
+# Rollup histograms map every value to a logarithmic bucket of width ROLLUP_GAMMA, so the value a bucket stands for
+# is within ROLLUP_RELATIVE_ACCURACY of every value counted in it.
+ROLLUP_RELATIVE_ACCURACY = 0.05
+ROLLUP_GAMMA = (1 + ROLLUP_RELATIVE_ACCURACY) / (1 - ROLLUP_RELATIVE_ACCURACY)
+ROLLUP_LOG_GAMMA = math.log(ROLLUP_GAMMA)
+
+TELEMETRY_COLUMNS = "uuid, test_time, client_city, client_region, client_country_code, server_city, server_country_code, asn, data_source, packet_loss_rate, download_throughput_mbps, download_latency_ms, download_jitter_ms, upload_throughput_mbps, upload_latency_ms, upload_jitter_ms"
+ROLLUP_KEY_COLUMNS = (
+    "granularity",
+    "period_start",
+    "client_country_code",
+    "client_city",
+    "asn",
+    "data_source",
+    "server_country_code",
+    "server_city",
+)
+ROLLUP_SUM_COLUMNS = (
+    "tests",
+    "packet_loss_sum",
+    "download_throughput_count",
+    "download_throughput_sum",
+    "download_latency_count",
+    "download_latency_sum",
+    "upload_throughput_count",
+    "upload_throughput_sum",
+    "upload_latency_count",
+    "upload_latency_sum",
+)
+ROLLUP_HISTOGRAM_KEY_COLUMNS = (*ROLLUP_KEY_COLUMNS, "metric", "bucket")
+
+_rollup_key = ", ".join(ROLLUP_KEY_COLUMNS)
+_rollup_sums = ", ".join(ROLLUP_SUM_COLUMNS)
+_rollup_histogram_key = ", ".join(ROLLUP_HISTOGRAM_KEY_COLUMNS)
+
+
+def get_rollup_periods_query(source: str) -> str:
+    return f"""
+    SELECT
+        p.granularity, p.period_start, s.client_country_code, COALESCE(s.client_city, '') AS client_city, s.asn,
+        s.data_source, s.server_country_code, COALESCE(s.server_city, '') AS server_city, s.packet_loss_rate,
+        s.download_throughput_mbps, s.download_latency_ms, s.upload_throughput_mbps, s.upload_latency_ms
+    FROM {source} s
+    CROSS JOIN LATERAL (
+        VALUES
+            ('{RollupGranularity.DAY.value}', (s.test_time AT TIME ZONE 'UTC')::date),
+            ('{RollupGranularity.MONTH.value}', date_trunc('month', s.test_time AT TIME ZONE 'UTC')::date)
+    ) AS p (granularity, period_start)
+"""
+
+
+# Rows are upserted in key order, so workers merging dates of the same month lock its rollups in the same order
+# and cannot deadlock.
+rollup_sums_select_query = f"""
+    SELECT
+        {_rollup_key},
+        COUNT(*) AS tests,
+        SUM(packet_loss_rate) AS packet_loss_sum,
+        COUNT(download_throughput_mbps) AS download_throughput_count,
+        COALESCE(SUM(download_throughput_mbps), 0) AS download_throughput_sum,
+        COUNT(download_latency_ms) AS download_latency_count,
+        COALESCE(SUM(download_latency_ms), 0) AS download_latency_sum,
+        COUNT(upload_throughput_mbps) AS upload_throughput_count,
+        COALESCE(SUM(upload_throughput_mbps), 0) AS upload_throughput_sum,
+        COUNT(upload_latency_ms) AS upload_latency_count,
+        COALESCE(SUM(upload_latency_ms), 0) AS upload_latency_sum
+    FROM periods
+    GROUP BY {_rollup_key}
+    ORDER BY {_rollup_key}
+"""
+
+rollup_buckets_select_query = f"""
+    SELECT {_rollup_key}, v.metric, CEIL(LN(v.value) / {ROLLUP_LOG_GAMMA!r})::smallint AS bucket, COUNT(*) AS count
+    FROM periods
+    CROSS JOIN LATERAL (
+        VALUES
+            ('download_throughput', download_throughput_mbps::double precision),
+            ('download_latency', download_latency_ms::double precision),
+            ('upload_throughput', upload_throughput_mbps::double precision),
+            ('upload_latency', upload_latency_ms::double precision)
+    ) AS v (metric, value)
+    WHERE v.value > 0
+    GROUP BY {_rollup_key}, v.metric, bucket
+    ORDER BY {_rollup_key}, v.metric, bucket
+"""
+
+rollup_sums_upsert_query = f"""
+    INSERT INTO telemetry_rollups AS r ({_rollup_key}, {_rollup_sums})
+    {rollup_sums_select_query}
+    ON CONFLICT ({_rollup_key})
+    DO UPDATE SET {", ".join(f"{column} = r.{column} + EXCLUDED.{column}" for column in ROLLUP_SUM_COLUMNS)}
+"""
+
+rollup_buckets_upsert_query = f"""
+    INSERT INTO telemetry_rollup_histograms AS h ({_rollup_histogram_key}, count)
+    {rollup_buckets_select_query}
+    ON CONFLICT ({_rollup_histogram_key})
+    DO UPDATE SET count = h.count + EXCLUDED.count
+"""
+
+
+def get_telemetry_merge_query(source_select: str) -> str:
+    return f"""
+    WITH merged AS (
+        INSERT INTO unified_telemetry ({TELEMETRY_COLUMNS})
+        {source_select}
+        ON CONFLICT DO NOTHING
+        RETURNING {TELEMETRY_COLUMNS}
+    ),
+    periods AS ({get_rollup_periods_query("merged")}),
+    rollups AS ({rollup_sums_upsert_query}),
+    histograms AS ({rollup_buckets_upsert_query})
+    SELECT COUNT(*) FROM merged;
+"""
+
+
+def get_telemetry_delete_query(delete_query: str) -> str:
+    return f"""
+    WITH deleted AS (
+        {delete_query}
+        RETURNING {", ".join(f"u.{column}" for column in TELEMETRY_COLUMNS.split(", "))}
+    ),
+    periods AS ({get_rollup_periods_query("deleted")}),
+    rollups AS (
+        UPDATE telemetry_rollups r
+        SET {", ".join(f"{column} = r.{column} - d.{column}" for column in ROLLUP_SUM_COLUMNS)}
+        FROM ({rollup_sums_select_query}) d
+        WHERE {" AND ".join(f"r.{column} = d.{column}" for column in ROLLUP_KEY_COLUMNS)}
+    ),
+    histograms AS (
+        UPDATE telemetry_rollup_histograms h
+        SET count = h.count - d.count
+        FROM ({rollup_buckets_select_query}) d
+        WHERE {" AND ".join(f"h.{column} = d.{column}" for column in ROLLUP_HISTOGRAM_KEY_COLUMNS)}
+    )
+    SELECT COUNT(*) FROM deleted;
+"""
+
+
+telemetry_rollups_fill_query = sql.SQL(
+    f"""
+    WITH periods AS ({get_rollup_periods_query("unified_telemetry")})
+    {rollup_sums_upsert_query};
+"""
+)
+
+telemetry_rollup_histograms_fill_query = sql.SQL(
+    f"""
+    WITH periods AS ({get_rollup_periods_query("unified_telemetry")})
+    {rollup_buckets_upsert_query};
+"""
+)
@@ -19,6 +19,28 @@ def get_top_asns_query(includes_starlink: bool) -> str:
     """
 
 
+reference_data_version_select_query = sql.SQL(
+    """
+    SELECT version
+    FROM reference_data_version
+"""
+)
+
+
+reference_data_version_exists_query = sql.SQL(
+    """
+    SELECT to_regclass('reference_data_version') IS NOT NULL
+"""
+)
+
+
+reference_data_version_table_lock_query = sql.SQL(
+    """
+    SELECT pg_advisory_xact_lock(hashtext('reference_data_version'))
+"""
+)
+
+
 processed_date_select_query = sql.SQL(
     """
     SELECT processed_date
@@ -28,6 +50,112 @@ processed_date_select_query = sql.SQL(
 )
 
 
+date_stage_select_query = sql.SQL(
+    """
+    SELECT stage
+    FROM date_stages
+    WHERE processed_date = %s
+    AND staging_schema = current_schema()
+"""
+)
+
+
+staging_rows_select_query = sql.SQL(
+    """
+    SELECT EXISTS (SELECT FROM ndt7_temp) OR EXISTS (SELECT FROM cf_temp)
+"""
+)
+
+
+missing_processed_dates_select_query = sql.SQL(
+    """
+    SELECT d::date
+    FROM generate_series(%s::date, %s::date, INTERVAL '1 day') AS d
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM processed_dates p
+        WHERE p.processed_date = d::date
+    )
+    ORDER BY d DESC
+"""
+)
+
+
+missing_best_servers_months_select_query = sql.SQL(
+    """
+    SELECT m.month_start
+    FROM (
+        SELECT
+            d::date AS month_start,
+            (EXTRACT(YEAR FROM d) * 100 + EXTRACT(MONTH FROM d))::integer AS year_month
+        FROM generate_series(%s::date, %s::date, INTERVAL '1 month') AS d
+    ) m
+    WHERE NOT EXISTS (SELECT 1 FROM ndt7_terrestrial_servers s WHERE s.year_month = m.year_month)
+        OR NOT EXISTS (SELECT 1 FROM ndt7_starlink_servers s WHERE s.year_month = m.year_month)
+        OR NOT EXISTS (SELECT 1 FROM cf_terrestrial_servers s WHERE s.year_month = m.year_month)
+        OR NOT EXISTS (SELECT 1 FROM cf_starlink_servers s WHERE s.year_month = m.year_month)
+    ORDER BY m.month_start
+"""
+)
+
+
+processed_date_lock_query = sql.SQL(
+    """
+    SELECT pg_try_advisory_xact_lock(hashtext('processed_dates'), %s::date - DATE '2000-01-01')
+"""
+)
+
+
+telemetry_partition_lock_query = sql.SQL(
+    """
+    SELECT pg_advisory_xact_lock(hashtext('unified_telemetry_partitions'))
+"""
+)
+
+
+unified_telemetry_partitioned_select_query = sql.SQL(
+    """
+    SELECT EXISTS (
+        SELECT FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'unified_telemetry'
+    );
+"""
+)
+
+
+staging_tables_unlogged_select_query = sql.SQL(
+    """
+    SELECT bool_and(relpersistence = 'u')
+    FROM pg_class
+    WHERE oid IN ('public.ndt7_temp'::regclass, 'public.cf_temp'::regclass);
+"""
+)
+
+
+staging_schemas_select_query = sql.SQL(
+    """
+    SELECT s.schema_name
+    FROM staging_schemas s
+    JOIN pg_namespace n ON n.nspname = s.schema_name
+"""
+)
+
+
+staging_schemas_table_lock_query = sql.SQL(
+    """
+    SELECT pg_advisory_xact_lock(hashtext('staging_schemas'))
+"""
+)
+
+
+staging_schema_claim_query = sql.SQL(
+    """
+    SELECT pg_try_advisory_lock(hashtext('staging_schemas'), hashtext(%s))
+"""
+)
+
+
 def get_check_table_exists_query(table_name: str) -> str:
     return f"""
     SELECT EXISTS (
@@ -35,3 +163,75 @@ def get_check_table_exists_query(table_name: str) -> str:
         WHERE table_name = '{table_name}'
     );
 """
+
+
+def get_best_servers_export_query(table_name: str, columns: tuple[str, ...]) -> str:
+    return f"""
+    SELECT {", ".join(columns)}
+    FROM {table_name}
+    ORDER BY year, month, client_country_code, client_city;
+"""
+
+
+telemetry_index_usage_select_query = sql.SQL(
+    """
+    SELECT t.relname, i.relname, am.amname, COALESCE(s.idx_scan, 0), pg_relation_size(i.oid),
+        (
+            SELECT string_agg(other.relname, ', ' ORDER BY other.relname)
+            FROM pg_index o
+            JOIN pg_class other ON other.oid = o.indexrelid
+            WHERE o.indrelid = x.indrelid AND o.indexrelid <> x.indexrelid AND o.indkey = x.indkey
+            AND o.indexprs IS NULL AND x.indexprs IS NULL
+        )
+    FROM pg_index x
+    JOIN pg_class i ON i.oid = x.indexrelid
+    JOIN pg_class t ON t.oid = x.indrelid
+    JOIN pg_am am ON am.oid = i.relam
+    LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = x.indexrelid
+    WHERE x.indrelid = to_regclass('public.unified_telemetry')
+    OR x.indrelid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass('public.unified_telemetry'))
+    ORDER BY t.relname, i.relname;
+"""
+)
+
+
+telemetry_secondary_indexes_select_query = sql.SQL(
+    """
+    SELECT i.relname, t.relname, pg_get_indexdef(x.indexrelid), x.indisclustered
+    FROM pg_index x
+    JOIN pg_class i ON i.oid = x.indexrelid
+    JOIN pg_class t ON t.oid = x.indrelid
+    WHERE (
+        x.indrelid = to_regclass('public.unified_telemetry')
+        OR x.indrelid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass('public.unified_telemetry'))
+    )
+    AND NOT EXISTS (SELECT FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+    AND NOT EXISTS (SELECT FROM pg_inherits WHERE inhrelid = x.indexrelid)
+    ORDER BY i.relname;
+"""
+)
+
+
+deferred_indexes_select_query = sql.SQL(
+    """
+    SELECT index_name
+    FROM deferred_indexes
+    ORDER BY index_name;
+"""
+)
+
+
+telemetry_indexes_deferred_select_query = sql.SQL(
+    """
+    SELECT EXISTS (SELECT FROM deferred_indexes);
+"""
+)
+
+
+deferred_index_select_query = sql.SQL(
+    """
+    SELECT table_name, definition, clustered
+    FROM deferred_indexes
+    WHERE index_name = %s;
+"""
+)
@@ -0,0 +1,9 @@
+from psycopg2 import sql
+
+health_check_query = sql.SQL("SELECT 1;")
+
+reset_session_query = sql.SQL("RESET ALL; SELECT pg_advisory_unlock_all();")
+
+
+def get_set_search_path_query(schema_name: str) -> str:
+    return f"SET search_path TO {schema_name}, public;"
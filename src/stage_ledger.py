@@ -0,0 +1,67 @@
+from datetime import date
+from typing import Optional
+
+from psycopg2.extensions import cursor
+from psycopg2.extras import execute_values
+
+from .config import logger
+from .enums import DateStage, Tables
+from .sql.delete_queries import date_stages_delete_unfinished_query, get_truncate_table_query
+from .sql.select_queries import date_stage_select_query, processed_date_lock_query, staging_rows_select_query
+from .table_data import table_data
+
+# Stages a date goes through, in order. Every stage is committed together with its date_stages entry.
+date_stage_order = list(DateStage)
+
+
+def lock_date(cur: cursor, date_to_process: date) -> bool:
+    """
+    Take a transaction-level advisory lock on the date. Every stage of a date takes it again, so concurrent
+    workers never run a stage of the same date twice.
+    """
+    cur.execute(processed_date_lock_query, (date_to_process.strftime("%Y-%m-%d"),))
+    row = cur.fetchone()
+    return row is not None and bool(row[0])
+
+
+def get_completed_stage(cur: cursor, date_to_process: date) -> Optional[DateStage]:
+    """
+    @return: the last completed stage of the date if its rows are staged in this connection's staging schema.
+    """
+    cur.execute(date_stage_select_query, (date_to_process.strftime("%Y-%m-%d"),))
+    row = cur.fetchone()
+    return DateStage(row[0]) if row else None
+
+
+def is_stage_completed(stage: DateStage, completed_stage: Optional[DateStage]) -> bool:
+    return completed_stage is not None and date_stage_order.index(completed_stage) >= date_stage_order.index(stage)
+
+
+def record_stage(cur: cursor, date_to_process: date, stage: DateStage) -> None:
+    execute_values(
+        cur,
+        table_data[Tables.DATE_STAGES]["insert_query"],
+        [(date_to_process.strftime("%Y-%m-%d"), stage.value)],
+        template="(%s, %s, current_schema())",
+    )
+    logger.info(f"Completed the {stage.value} stage of {date_to_process.strftime('%Y-%m-%d')}.")
+
+
+def staging_has_rows(cur: cursor) -> bool:
+    """
+    Unlogged staging tables are emptied by a crash of the server, so a staged date is only resumed while its
+    rows are still there.
+    """
+    cur.execute(staging_rows_select_query)
+    row = cur.fetchone()
+    return row is not None and bool(row[0])
+
+
+def reset_staging(cur: cursor) -> None:
+    """
+    Empty this connection's staging tables and forget the unfinished dates that were staged in them, so they are
+    extracted again by the next run.
+    """
+    cur.execute(get_truncate_table_query(Tables.NDT7_TEMP.value))
+    cur.execute(get_truncate_table_query(Tables.CF_TEMP.value))
+    cur.execute(date_stages_delete_unfinished_query, (DateStage.MERGED.value,))
@@ -0,0 +1,68 @@
+from pandas import DataFrame, Int64Dtype
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .enums import Tables
+from .table_data import table_data
+
+# Low-cardinality strings are dictionary encoded, which pandas keeps as categoricals.
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+# Arrow type of every staging column, matching the Postgres column types of ndt7_temp and cf_temp.
+staging_column_types = {
+    "uuid": pa.string(),
+    "test_time": TIMESTAMP,
+    "client_city": CATEGORY,
+    "client_region": CATEGORY,
+    "client_country_code": CATEGORY,
+    "server_city": CATEGORY,
+    "server_country_code": CATEGORY,
+    "server_airport_code": CATEGORY,
+    "asn": pa.int64(),
+    "packet_loss_rate": pa.float64(),
+    "download_throughput_mbps": pa.float64(),
+    "download_latency_ms": pa.int64(),
+    "download_jitter_ms": pa.float64(),
+    "upload_throughput_mbps": pa.float64(),
+    "upload_latency_ms": pa.int64(),
+    "upload_jitter_ms": pa.float64(),
+}
+
+staging_schemas = {
+    table: pa.schema([(column, staging_column_types[column]) for column in table_data[table]["columns"]])
+    for table in (Tables.NDT7_TEMP, Tables.CF_TEMP)
+}
+
+# Nullable integers stay integers in pandas instead of becoming floats, which COPY would reject.
+_pandas_types = {pa.int64(): Int64Dtype()}
+
+
+def conform_batch(batch: pa.RecordBatch, table: Tables) -> pa.RecordBatch:
+    """
+    Cast a batch read from a measurement source to the typed schema of the staging table: native timestamps,
+    integers and floats, and dictionary-encoded low-cardinality strings. Empty strings become nulls, as the
+    sources use both for missing values. Timestamps formatted as strings, as in archives from earlier versions,
+    are parsed.
+    """
+    schema = staging_schemas[table]
+    columns = []
+    for field in schema:
+        column = batch.column(field.name)
+        if pa.types.is_dictionary(field.type):
+            column = _empty_to_null(column.cast(pa.string())).dictionary_encode()
+        elif pa.types.is_string(field.type):
+            column = _empty_to_null(column.cast(pa.string()))
+        else:
+            column = column.cast(field.type)
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def to_dataframe(batch: pa.RecordBatch) -> DataFrame:
+    df: DataFrame = batch.to_pandas(types_mapper=_pandas_types.get)
+    return df
+
+
+def _empty_to_null(column: pa.Array) -> pa.Array:
+    return pc.if_else(pc.equal(column, ""), pa.scalar(None, pa.string()), column)
@@ -0,0 +1,302 @@
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from .enums import Tables
+from .table_data import table_data
+
+STARLINK_ASN = 14593
+
+COUNTRIES = [
+    ("US", "United States"),
+    ("DE", "Germany"),
+    ("GB", "United Kingdom"),
+    ("FR", "France"),
+    ("CA", "Canada"),
+    ("BR", "Brazil"),
+    ("AU", "Australia"),
+    ("NL", "Netherlands"),
+    ("IT", "Italy"),
+    ("ES", "Spain"),
+    ("PL", "Poland"),
+    ("MX", "Mexico"),
+    ("JP", "Japan"),
+    ("IN", "India"),
+    ("SE", "Sweden"),
+    ("CL", "Chile"),
+    ("NZ", "New Zealand"),
+    ("PH", "Philippines"),
+    ("NG", "Nigeria"),
+    ("KE", "Kenya"),
+    ("PT", "Portugal"),
+    ("IE", "Ireland"),
+    ("AT", "Austria"),
+    ("CH", "Switzerland"),
+    ("NO", "Norway"),
+    ("FI", "Finland"),
+    ("DK", "Denmark"),
+    ("BE", "Belgium"),
+    ("CZ", "Czechia"),
+    ("RO", "Romania"),
+]
+# Countries in which Starlink measurements are generated.
+STARLINK_COUNTRIES = {"US", "DE", "GB", "FR", "CA", "BR", "AU", "NL", "IT", "ES", "PL", "MX", "JP", "CL", "NZ", "PH"}
+
+SYLLABLES = ["ka", "lo", "mer", "san", "ta", "vil", "bor", "den", "ri", "sao", "gor", "lin", "ham", "ster", "na", "do"]
+ASCII_ACCENTS = str.maketrans("aeo", "áéö")
+
+
+def _zipf_weights(size: int, exponent: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    normalized: np.ndarray = weights / weights.sum()
+    return normalized
+
+
+class SyntheticWorkload:
+    """
+    Deterministic generator of NDT7 and Cloudflare measurements and the reference data they are validated and
+    standardized against.
+
+    Countries, client cities and ASNs are drawn from Zipf distributions, like the real data where a few countries,
+    cities and ISPs account for most tests. Client cities are spelled with their ASCII name, their native name or
+    an alternate name, so standardization has aliases to resolve, and a share of the measurements uses a server
+    that is not among the best servers of its city, so validation has rows to delete.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        num_cities: int = 2000,
+        starlink_share: float = 0.05,
+        valid_server_share: float = 0.9,
+        skew: float = 1.1,
+    ) -> None:
+        self._seed = seed
+        self._starlink_share = starlink_share
+        self._valid_server_share = valid_server_share
+        self._skew = skew
+        rng = np.random.default_rng(seed)
+
+        country_codes = np.array([code for code, _ in COUNTRIES])
+        city_countries = rng.choice(country_codes, size=num_cities, p=_zipf_weights(len(COUNTRIES), skew))
+        # Every country has at least one city, so every country has servers and best servers.
+        city_countries[: len(COUNTRIES)] = country_codes
+        asciinames = self._unique_names(rng, num_cities)
+        self.cities = DataFrame(
+            {
+                "name": [name.translate(ASCII_ACCENTS) for name in asciinames],
+                "asciiname": asciinames,
+                "name1": [f"{name} City" for name in asciinames],
+                "name2": [name.upper() for name in asciinames],
+                "name3": None,
+                "name4": None,
+                "region": [f"Region {index % 12 + 1}" for index in range(num_cities)],
+                "country_code": city_countries,
+            }
+        )
+
+        airport_codes = self._unique_airport_codes(rng, num_cities)
+        self.airports = DataFrame(
+            {
+                "country_code": city_countries,
+                "airport_city": asciinames,
+                "airport_code": airport_codes,
+            }
+        )
+
+        asns = []
+        for country_index, (country_code, country_name) in enumerate(COUNTRIES):
+            for rank in range(1, 9):
+                asns.append(
+                    (1000 + country_index * 100 + rank, f"ISP {rank} {country_name}", rank, country_code, country_name)
+                )
+        asns.append((STARLINK_ASN, "SpaceX Starlink", 1, "US", "United States"))
+        self.as_statistics = DataFrame(asns, columns=list(table_data[Tables.AS_STATISTICS]["columns"]))
+        self._country_asns = {
+            country_code: np.array([asn for asn, _, _, code, _ in asns[:-1] if code == country_code])
+            for country_code, _ in COUNTRIES
+        }
+
+        # Every city hosts an NDT7 server and an airport with a Cloudflare server. A client city's best servers are
+        # up to three servers of its own country, per network type (index 0 terrestrial, 1 Starlink).
+        self._best_servers = np.full((num_cities, 2, 3), -1, dtype=np.int64)
+        self._num_best_servers = np.zeros((num_cities, 2), dtype=np.int64)
+        cities_by_country = {code: np.flatnonzero(city_countries == code) for code in country_codes}
+        for city_index, country_code in enumerate(city_countries):
+            candidates = cities_by_country[country_code]
+            for network_index in (0, 1) if country_code in STARLINK_COUNTRIES else (0,):
+                servers = rng.choice(candidates, size=min(3, len(candidates)), replace=False)
+                self._best_servers[city_index, network_index, : len(servers)] = servers
+                self._num_best_servers[city_index, network_index] = len(servers)
+        self._city_countries = city_countries
+        self._asciinames = np.array(asciinames)
+        self._aliases = self.cities[["name", "name1", "name2"]].to_numpy()
+        self._airport_codes = np.array(airport_codes)
+        self._city_weights = _zipf_weights(num_cities, skew)
+
+    def countries_with_starlink(self) -> DataFrame:
+        return DataFrame({"country_code": sorted(STARLINK_COUNTRIES)})
+
+    def best_servers(self, table: Tables, year: int, month: int) -> DataFrame:
+        """
+        @return: the rows of the given best server table for the month.
+        """
+        starlink = table in (Tables.NDT_BEST_STARLINK_SERVERS, Tables.CF_BEST_STARLINK_SERVERS)
+        cloudflare = table in (Tables.CF_BEST_TERRESTRIAL_SERVERS, Tables.CF_BEST_STARLINK_SERVERS)
+        network_index = int(starlink)
+        rows = []
+        for city_index in range(len(self._asciinames)):
+            num_servers = self._num_best_servers[city_index, network_index]
+            for server_index in self._best_servers[city_index, network_index, :num_servers]:
+                server = (
+                    (self._airport_codes[server_index],)
+                    if cloudflare
+                    else (self._asciinames[server_index], self._city_countries[server_index])
+                )
+                rows.append((self._asciinames[city_index], self._city_countries[city_index], *server, month, year))
+        return DataFrame(rows, columns=list(table_data[table]["columns"]))
+
+    def ndt7_frames(self, day: date, num_rows: int, chunk_rows: int = 100_000) -> Iterator[DataFrame]:
+        return self._measurement_frames(Tables.NDT7_TEMP, day, num_rows, chunk_rows)
+
+    def cf_frames(self, day: date, num_rows: int, chunk_rows: int = 100_000) -> Iterator[DataFrame]:
+        return self._measurement_frames(Tables.CF_TEMP, day, num_rows, chunk_rows)
+
+    def write_geonames_files(self, directory: Path, cities_txt: str, regions_txt: str, num_rows: int) -> None:
+        """
+        Write num_rows cities in the GeoNames dump format read by generate_cities_csv, cycling through the
+        synthetic cities with numbered names once they are exhausted.
+        """
+        num_cities = len(self.cities)
+        index = np.arange(num_rows)
+        suffix = np.where(index < num_cities, "", " " + (index // num_cities).astype(str))
+        cities = self.cities.iloc[index % num_cities].reset_index(drop=True)
+        admin1_codes = cities["region"].str.removeprefix("Region ")
+        dump = DataFrame(
+            {
+                "geonameid": index + 1,
+                "name": cities["name"] + suffix,
+                "asciiname": cities["asciiname"] + suffix,
+                "alternatenames": cities["name1"] + suffix + "," + cities["name2"] + suffix,
+                "latitude": 0.0,
+                "longitude": 0.0,
+                "feature_class": "P",
+                "feature_code": "PPL",
+                "country_code": cities["country_code"],
+                "cc2": "",
+                "admin1_code": admin1_codes,
+                "admin2_code": "",
+                "admin3_code": "",
+                "admin4_code": "",
+                "population": 15000,
+                "elevation": "",
+                "dem": 0,
+                "timezone": "UTC",
+                "modification_date": "2024-01-01",
+            }
+        )
+        dump.to_csv(directory / cities_txt, sep="\t", header=False, index=False)
+        regions = [
+            (f"{country_code}.{region}", f"Region {region}", f"Region {region}", region)
+            for country_code, _ in COUNTRIES
+            for region in range(1, 13)
+        ]
+        DataFrame(regions).to_csv(directory / regions_txt, sep="\t", header=False, index=False)
+
+    def _measurement_frames(self, table: Tables, day: date, num_rows: int, chunk_rows: int) -> Iterator[DataFrame]:
+        rng = np.random.default_rng([self._seed, day.toordinal(), 0 if table == Tables.NDT7_TEMP else 1])
+        day_start = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+        prefix = "ndt7" if table == Tables.NDT7_TEMP else "cf"
+        for offset in range(0, num_rows, chunk_rows):
+            size = min(chunk_rows, num_rows - offset)
+            yield self._measurements(rng, table, prefix, day, day_start, offset, size)
+
+    def _measurements(
+        self,
+        rng: np.random.Generator,
+        table: Tables,
+        prefix: str,
+        day: date,
+        day_start: int,
+        offset: int,
+        size: int,
+    ) -> DataFrame:
+        city_indexes = rng.choice(len(self._asciinames), size=size, p=self._city_weights)
+        countries = self._city_countries[city_indexes]
+        starlink = (rng.random(size) < self._starlink_share) & np.isin(countries, list(STARLINK_COUNTRIES))
+
+        asns = np.empty(size, dtype=np.int64)
+        asn_weights = _zipf_weights(8, self._skew)
+        for country_code in np.unique(countries):
+            mask = countries == country_code
+            asns[mask] = rng.choice(self._country_asns[country_code], size=int(mask.sum()), p=asn_weights)
+        asns[starlink] = STARLINK_ASN
+
+        # Mostly the ASCII name the best server tables use, otherwise one of the aliases standardization resolves.
+        spelling = rng.choice(4, size=size, p=[0.7, 0.2, 0.05, 0.05])
+        client_cities = np.where(
+            spelling == 0, self._asciinames[city_indexes], self._aliases[city_indexes, np.maximum(spelling - 1, 0)]
+        )
+
+        network_indexes = starlink.astype(np.int64)
+        num_best_servers = self._num_best_servers[city_indexes, network_indexes]
+        picks = (rng.random(size) * num_best_servers).astype(np.int64)
+        best_servers = self._best_servers[city_indexes, network_indexes, np.minimum(picks, 2)]
+        valid = (rng.random(size) < self._valid_server_share) & (num_best_servers > 0)
+        server_indexes = np.where(valid, best_servers, rng.choice(len(self._asciinames), size=size))
+
+        base_latency = np.where(starlink, 45.0, 20.0)
+        download_latency = np.maximum(1, rng.lognormal(np.log(base_latency), 0.6)).astype(np.int64)
+        upload_latency = np.maximum(1, rng.lognormal(np.log(base_latency * 1.2), 0.6)).astype(np.int64)
+        frame = {
+            "uuid": [f"{prefix}-{day.isoformat()}-{offset + row:012d}" for row in range(size)],
+            "test_time": pd.to_datetime(day_start + rng.integers(0, 86_400, size=size), unit="s", utc=True),
+            "client_city": client_cities,
+            "client_region": self.cities["region"].to_numpy()[city_indexes],
+            "client_country_code": countries,
+            "asn": asns,
+            "packet_loss_rate": np.round(rng.beta(0.5, 50, size=size), 5),
+            "download_throughput_mbps": np.round(np.minimum(rng.lognormal(np.log(80), 1.0, size=size), 9_999), 5),
+            "download_latency_ms": download_latency,
+            "download_jitter_ms": np.round(rng.exponential(3.0, size=size), 5),
+            "upload_throughput_mbps": np.round(np.minimum(rng.lognormal(np.log(15), 1.0, size=size), 9_999), 5),
+            "upload_latency_ms": upload_latency,
+            "upload_jitter_ms": np.round(rng.exponential(4.0, size=size), 5),
+        }
+        if table == Tables.NDT7_TEMP:
+            frame["server_city"] = self._asciinames[server_indexes]
+            frame["server_country_code"] = self._city_countries[server_indexes]
+        else:
+            frame["server_airport_code"] = self._airport_codes[server_indexes]
+            # Cloudflare does not geolocate every client to a city.
+            cf_client_cities = client_cities.astype(object)
+            cf_client_cities[rng.random(size) < 0.05] = None
+            frame["client_city"] = cf_client_cities
+        return DataFrame(frame)[list(table_data[table]["columns"])]
+
+    @staticmethod
+    def _unique_names(rng: np.random.Generator, size: int) -> list[str]:
+        names: set[str] = set()
+        ordered: list[str] = []
+        while len(ordered) < size:
+            name = "".join(rng.choice(SYLLABLES, size=rng.integers(2, 5))).capitalize()
+            if name not in names:
+                names.add(name)
+                ordered.append(name)
+        return ordered
+
+    @staticmethod
+    def _unique_airport_codes(rng: np.random.Generator, size: int) -> list[str]:
+        codes: set[str] = set()
+        ordered: list[str] = []
+        letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+        while len(ordered) < size:
+            code = "".join(rng.choice(letters, size=3))
+            if code not in codes:
+                codes.add(code)
+                ordered.append(code)
+        return ordered
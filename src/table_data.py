@@ -1,6 +1,5 @@
-from typing import Callable, Dict, Optional, TypedDict
+from typing import TYPE_CHECKING, Callable, Dict, Optional, TypedDict
 
-from pandas import DataFrame
 from psycopg2.sql import SQL
 
 from .enums import CsvFiles, Tables
@@ -9,13 +8,22 @@ from .sql.create_queries import (
     caida_asn_create_table_query,
     cf_best_starlink_servers_create_query,
     cf_best_terrestrial_servers_create_query,
+    cf_latency_sketches_create_query,
     cf_temp_create_query,
     cities_create_query,
+    city_aliases_create_query,
     countries_with_starlink_measurements_create_query,
+    date_stages_create_query,
+    deferred_indexes_create_query,
+    ndt7_latency_sketches_create_query,
     ndt_best_starlink_servers_create_query,
     ndt_best_terrestrial_servers_create_query,
     ndt_temp_create_query,
     processed_dates_create_query,
+    replay_keys_create_query,
+    staging_schemas_create_query,
+    telemetry_rollup_histograms_create_query,
+    telemetry_rollups_create_query,
     unified_telemetry_create_query,
 )
 from .sql.delete_queries import airport_codes_standardize_cities_query
@@ -24,23 +32,44 @@ from .sql.insert_queries import (
     caida_asn_insert_query,
     cf_best_starlink_servers_insert_query,
     cf_best_terrestrial_servers_insert_query,
+    cf_latency_sketches_insert_query,
     cf_temp_insert_query,
     cities_insert_query,
+    city_aliases_insert_query,
+    city_aliases_refresh_query,
     countries_with_starlink_measurements_insert_query,
+    date_stages_insert_query,
+    deferred_indexes_insert_query,
+    ndt7_latency_sketches_insert_query,
     ndt_best_starlink_servers_insert_query,
     ndt_best_terrestrial_servers_insert_query,
     ndt_temp_insert_query,
     processed_dates_insert_query,
+    replay_keys_insert_query,
+    staging_schemas_insert_query,
+    telemetry_rollup_histograms_insert_query,
+    telemetry_rollups_insert_query,
     unified_telemetry_insert_query,
 )
+from .sql.rollup_queries import (
+    ROLLUP_HISTOGRAM_KEY_COLUMNS,
+    ROLLUP_KEY_COLUMNS,
+    ROLLUP_SUM_COLUMNS,
+    telemetry_rollup_histograms_fill_query,
+    telemetry_rollups_fill_query,
+)
 from .utils import clean_airport_codes, clean_cf_servers
 
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
 type CleanDataframeFn = Callable[[DataFrame], None]
 
 
 class TableInfo(TypedDict):
     create_query: SQL
     insert_query: SQL
+    columns: tuple[str, ...]
     post_insert_query: Optional[SQL]
     csv_name: Optional[str]
     cleaning_fn: Optional[CleanDataframeFn]
@@ -50,6 +79,39 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.PROCESSED_DATES: {
         "create_query": processed_dates_create_query,
         "insert_query": processed_dates_insert_query,
+        "columns": ("processed_date",),
+        "post_insert_query": None,
+        "csv_name": None,
+        "cleaning_fn": None,
+    },
+    Tables.DATE_STAGES: {
+        "create_query": date_stages_create_query,
+        "insert_query": date_stages_insert_query,
+        "columns": ("processed_date", "stage", "staging_schema"),
+        "post_insert_query": None,
+        "csv_name": None,
+        "cleaning_fn": None,
+    },
+    Tables.DEFERRED_INDEXES: {
+        "create_query": deferred_indexes_create_query,
+        "insert_query": deferred_indexes_insert_query,
+        "columns": ("index_name", "table_name", "definition", "clustered"),
+        "post_insert_query": None,
+        "csv_name": None,
+        "cleaning_fn": None,
+    },
+    Tables.REPLAY_KEYS: {
+        "create_query": replay_keys_create_query,
+        "insert_query": replay_keys_insert_query,
+        "columns": ("processed_date", "uuid", "test_time"),
+        "post_insert_query": None,
+        "csv_name": None,
+        "cleaning_fn": None,
+    },
+    Tables.STAGING_SCHEMAS: {
+        "create_query": staging_schemas_create_query,
+        "insert_query": staging_schemas_insert_query,
+        "columns": ("schema_name",),
         "post_insert_query": None,
         "csv_name": None,
         "cleaning_fn": None,
@@ -57,13 +119,23 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.CITIES: {
         "create_query": cities_create_query,
         "insert_query": cities_insert_query,
+        "columns": ("name", "asciiname", "name1", "name2", "name3", "name4", "region", "country_code"),
         "post_insert_query": None,
         "csv_name": CsvFiles.CITIES.value,
         "cleaning_fn": None,
     },
+    Tables.CITY_ALIASES: {
+        "create_query": city_aliases_create_query,
+        "insert_query": city_aliases_insert_query,
+        "columns": ("country_code", "alias", "asciiname", "region"),
+        "post_insert_query": city_aliases_refresh_query,
+        "csv_name": None,
+        "cleaning_fn": None,
+    },
     Tables.AIRPORT_CODES: {
         "create_query": airports_create_query,
         "insert_query": airport_insert_query,
+        "columns": ("country_code", "airport_city", "airport_code"),
         "post_insert_query": airport_codes_standardize_cities_query,
         "csv_name": CsvFiles.AIRPORT_CODES.value,
         "cleaning_fn": clean_airport_codes,
@@ -71,6 +143,7 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.NDT_BEST_TERRESTRIAL_SERVERS: {
         "create_query": ndt_best_terrestrial_servers_create_query,
         "insert_query": ndt_best_terrestrial_servers_insert_query,
+        "columns": ("client_city", "client_country_code", "server_city", "server_country_code", "month", "year"),
         "post_insert_query": None,
         "csv_name": CsvFiles.NDT_BEST_TERRESTRIAL_SERVERS.value,
         "cleaning_fn": None,
@@ -78,6 +151,7 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.NDT_BEST_STARLINK_SERVERS: {
         "create_query": ndt_best_starlink_servers_create_query,
         "insert_query": ndt_best_starlink_servers_insert_query,
+        "columns": ("client_city", "client_country_code", "server_city", "server_country_code", "month", "year"),
         "post_insert_query": None,
         "csv_name": CsvFiles.NDT_BEST_STARLINK_SERVERS.value,
         "cleaning_fn": None,
@@ -85,6 +159,7 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.CF_BEST_TERRESTRIAL_SERVERS: {
         "create_query": cf_best_terrestrial_servers_create_query,
         "insert_query": cf_best_terrestrial_servers_insert_query,
+        "columns": ("client_city", "client_country_code", "server_airport_code", "month", "year"),
         "post_insert_query": None,
         "csv_name": CsvFiles.CF_BEST_TERRESTRIAL_SERVERS.value,
         "cleaning_fn": clean_cf_servers,
@@ -92,6 +167,7 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.CF_BEST_STARLINK_SERVERS: {
         "create_query": cf_best_starlink_servers_create_query,
         "insert_query": cf_best_starlink_servers_insert_query,
+        "columns": ("client_city", "client_country_code", "server_airport_code", "month", "year"),
         "post_insert_query": None,
         "csv_name": CsvFiles.CF_BEST_STARLINK_SERVERS.value,
         "cleaning_fn": clean_cf_servers,
@@ -99,6 +175,7 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.AS_STATISTICS: {
         "create_query": caida_asn_create_table_query,
         "insert_query": caida_asn_insert_query,
+        "columns": ("asn", "asn_name", "rank", "country_code", "country_name"),
         "post_insert_query": None,
         "csv_name": CsvFiles.ASNS.value,
         "cleaning_fn": None,
@@ -106,6 +183,7 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.COUNTRIES_WITH_STARLINK_MEASUREMENTS: {
         "create_query": countries_with_starlink_measurements_create_query,
         "insert_query": countries_with_starlink_measurements_insert_query,
+        "columns": ("country_code",),
         "post_insert_query": None,
         "csv_name": CsvFiles.COUNTRIES_WITH_STARLINK_MEASUREMENTS.value,
         "cleaning_fn": None,
@@ -113,6 +191,22 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.CF_TEMP: {
         "create_query": cf_temp_create_query,
         "insert_query": cf_temp_insert_query,
+        "columns": (
+            "uuid",
+            "test_time",
+            "client_city",
+            "client_region",
+            "client_country_code",
+            "server_airport_code",
+            "asn",
+            "packet_loss_rate",
+            "download_throughput_mbps",
+            "download_latency_ms",
+            "download_jitter_ms",
+            "upload_throughput_mbps",
+            "upload_latency_ms",
+            "upload_jitter_ms",
+        ),
         "post_insert_query": None,
         "csv_name": None,
         "cleaning_fn": None,
@@ -120,6 +214,23 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.NDT7_TEMP: {
         "create_query": ndt_temp_create_query,
         "insert_query": ndt_temp_insert_query,
+        "columns": (
+            "uuid",
+            "test_time",
+            "client_city",
+            "client_region",
+            "client_country_code",
+            "server_city",
+            "server_country_code",
+            "asn",
+            "packet_loss_rate",
+            "download_throughput_mbps",
+            "download_latency_ms",
+            "download_jitter_ms",
+            "upload_throughput_mbps",
+            "upload_latency_ms",
+            "upload_jitter_ms",
+        ),
         "post_insert_query": None,
         "csv_name": None,
         "cleaning_fn": None,
@@ -127,6 +238,76 @@ table_data: Dict[Tables, TableInfo] = {
     Tables.UNIFIED_TELEMETRY: {
         "create_query": unified_telemetry_create_query,
         "insert_query": unified_telemetry_insert_query,
+        "columns": (
+            "uuid",
+            "test_time",
+            "client_city",
+            "client_region",
+            "client_country_code",
+            "server_city",
+            "server_country_code",
+            "asn",
+            "data_source",
+            "packet_loss_rate",
+            "download_throughput_mbps",
+            "download_latency_ms",
+            "download_jitter_ms",
+            "upload_throughput_mbps",
+            "upload_latency_ms",
+            "upload_jitter_ms",
+        ),
+        "post_insert_query": None,
+        "csv_name": None,
+        "cleaning_fn": None,
+    },
+    # Created after unified_telemetry, from whose existing rows they are filled.
+    Tables.TELEMETRY_ROLLUPS: {
+        "create_query": telemetry_rollups_create_query,
+        "insert_query": telemetry_rollups_insert_query,
+        "columns": (*ROLLUP_KEY_COLUMNS, *ROLLUP_SUM_COLUMNS),
+        "post_insert_query": telemetry_rollups_fill_query,
+        "csv_name": None,
+        "cleaning_fn": None,
+    },
+    Tables.TELEMETRY_ROLLUP_HISTOGRAMS: {
+        "create_query": telemetry_rollup_histograms_create_query,
+        "insert_query": telemetry_rollup_histograms_insert_query,
+        "columns": (*ROLLUP_HISTOGRAM_KEY_COLUMNS, "count"),
+        "post_insert_query": telemetry_rollup_histograms_fill_query,
+        "csv_name": None,
+        "cleaning_fn": None,
+    },
+    Tables.NDT7_LATENCY_SKETCHES: {
+        "create_query": ndt7_latency_sketches_create_query,
+        "insert_query": ndt7_latency_sketches_insert_query,
+        "columns": (
+            "sketch_date",
+            "network_type",
+            "client_city",
+            "client_country_code",
+            "server_city",
+            "server_country_code",
+            "direction",
+            "bucket",
+            "count",
+        ),
+        "post_insert_query": None,
+        "csv_name": None,
+        "cleaning_fn": None,
+    },
+    Tables.CF_LATENCY_SKETCHES: {
+        "create_query": cf_latency_sketches_create_query,
+        "insert_query": cf_latency_sketches_insert_query,
+        "columns": (
+            "sketch_date",
+            "network_type",
+            "client_city",
+            "client_country_code",
+            "server_airport_code",
+            "direction",
+            "bucket",
+            "count",
+        ),
         "post_insert_query": None,
         "csv_name": None,
         "cleaning_fn": None,
@@ -1,46 +1,149 @@
 import gc
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Optional
 
-import pandas as pd
 from psycopg2 import sql
 from psycopg2.extensions import connection, cursor
-from psycopg2.extras import execute_values
 
-from .caida_api_queries import fetch_asn_data
+from .bulk_loader import BulkLoader
 from .config import data_dir, logger
 from .enums import CsvFiles, ExecutionDecision, Tables
 from .logger import LogUtils
-from .sql.delete_queries import delete_all_from_table_query
-from .sql.drop_queries import drop_tables_query
-from .sql.select_queries import get_check_table_exists_query
+from .reference_data import bump_reference_data_version
+from .sql.create_queries import (
+    cf_temp_add_year_month_query,
+    cf_temp_unlogged_create_query,
+    deferred_indexes_create_query,
+    get_best_servers_add_year_month_query,
+    get_create_index_if_not_exists_query,
+    get_staging_schema_create_query,
+    ndt_temp_add_year_month_query,
+    ndt_temp_unlogged_create_query,
+    staging_schemas_create_query,
+    unified_telemetry_partitioned_create_query,
+)
+from .sql.delete_queries import deferred_index_delete_query, delete_all_from_table_query
+from .sql.drop_queries import drop_tables_query, get_drop_index_query, get_drop_schema_query
+from .sql.insert_queries import city_aliases_refresh_query, deferred_indexes_insert_query, staging_schemas_insert_query
+from .sql.maintenance_queries import get_cluster_on_query
+from .sql.select_queries import (
+    deferred_index_select_query,
+    deferred_indexes_select_query,
+    get_check_table_exists_query,
+    staging_schema_claim_query,
+    staging_schemas_select_query,
+    staging_schemas_table_lock_query,
+    staging_tables_unlogged_select_query,
+    telemetry_index_usage_select_query,
+    telemetry_secondary_indexes_select_query,
+)
+from .sql.session_queries import get_set_search_path_query
 from .table_data import CleanDataframeFn, table_data
-from .utils import delete_files, download_file, generate_cities_csv
+from .utils import delete_files, download_file, format_bytes, generate_cities_csv
+
+unlogged_staging_create_queries = {
+    Tables.NDT7_TEMP: ndt_temp_unlogged_create_query,
+    Tables.CF_TEMP: cf_temp_unlogged_create_query,
+}
+
+# Adds the year_month key used by the invalid server filters to tables created before it existed.
+year_month_upgrade_queries = {
+    Tables.NDT7_TEMP: ndt_temp_add_year_month_query,
+    Tables.CF_TEMP: cf_temp_add_year_month_query,
+    **{
+        table: get_best_servers_add_year_month_query(table.value)
+        for table in (
+            Tables.NDT_BEST_TERRESTRIAL_SERVERS,
+            Tables.NDT_BEST_STARLINK_SERVERS,
+            Tables.CF_BEST_TERRESTRIAL_SERVERS,
+            Tables.CF_BEST_STARLINK_SERVERS,
+        )
+    },
+}
 
 
 class TableInitializer:
-    def __init__(self, conn: connection) -> None:
+    def __init__(self, conn: connection, bulk_loader: BulkLoader) -> None:
         self._conn = conn
+        self._bulk_loader = bulk_loader
 
     @LogUtils.log_function
-    def initialize_tables(self) -> None:
+    def initialize_tables(self, partition_telemetry: bool = False, unlogged_staging: bool = False) -> None:
+        """
+        Create and populate every missing table.
+
+        @param partition_telemetry: create unified_telemetry partitioned by month on test_time. Partitions are
+        created by the data loader when it first loads a date of a month.
+        @param unlogged_staging: create the staging tables as UNLOGGED tables with only their primary key.
+        """
         with self._conn.cursor() as cur:
             for table, data in table_data.items():
                 if self._table_exists(cur, table):
                     logger.info(f"Table {table.value} already exists. Skipping creation.")
+                    if upgrade_query := year_month_upgrade_queries.get(table):
+                        cur.execute(upgrade_query)
                     continue
-                cur.execute(data['create_query'])
+                if table == Tables.UNIFIED_TELEMETRY and partition_telemetry:
+                    cur.execute(unified_telemetry_partitioned_create_query)
+                elif table in unlogged_staging_create_queries and unlogged_staging:
+                    cur.execute(unlogged_staging_create_queries[table])
+                else:
+                    cur.execute(data['create_query'])
                 logger.info(f"Created table {table.value}.")
                 if csv_name := data['csv_name']:
                     self._process_and_insert_data(
                         cur,
-                        data['insert_query'],
+                        table,
                         data['post_insert_query'],
                         csv_name,
                         data['cleaning_fn'],
                     )
+                elif post_insert_query := data['post_insert_query']:
+                    cur.execute(post_insert_query)
+                    logger.info(f"Populated table {table.value} from existing tables.")
             self._conn.commit()
 
+    @LogUtils.log_function
+    def initialize_staging_schema(self, schema_prefix: str) -> str:
+        """
+        Claim the first staging schema <schema_prefix><N> that no other connection holds, create private copies of
+        the staging tables in it and put it first on this connection's search path, so the unqualified staging
+        queries only see this connection's rows. The claim lasts until the pool resets the connection's session.
+        The schema is recorded in staging_schemas, so --drop only drops the schemas this tool created.
+
+        @return: the name of the claimed schema.
+        """
+        with self._conn.cursor() as cur:
+            schema_name = self._claim_staging_schema(cur, schema_prefix)
+            cur.execute(staging_schemas_table_lock_query)
+            cur.execute(staging_schemas_create_query)
+            cur.execute(staging_schemas_insert_query, ((schema_name,),))
+            cur.execute(staging_tables_unlogged_select_query)
+            row = cur.fetchone()
+            unlogged = row is not None and bool(row[0])
+            cur.execute(get_staging_schema_create_query(schema_name, unlogged=unlogged))
+            cur.execute(get_set_search_path_query(schema_name))
+            cur.execute(ndt_temp_add_year_month_query)
+            cur.execute(cf_temp_add_year_month_query)
+            self._conn.commit()
+        logger.info(f"Staging tables for this connection are in schema {schema_name}.")
+        return schema_name
+
+    @staticmethod
+    def _claim_staging_schema(cur: cursor, schema_prefix: str) -> str:
+        """
+        Slots are claimed with session-level advisory locks, so concurrent runs on the same database never share a
+        schema, while a rerun gets the same schemas back and can resume the dates staged in them.
+        """
+        slot_id = 1
+        while True:
+            schema_name = f"{schema_prefix}{slot_id}"
+            cur.execute(staging_schema_claim_query, (schema_name,))
+            row = cur.fetchone()
+            if row is not None and bool(row[0]):
+                return schema_name
+            slot_id += 1
+
     def _table_exists(self, cur: cursor, table_name: Tables) -> bool:
         cur.execute(get_check_table_exists_query(table_name.value))
         result = cur.fetchone()
@@ -48,15 +151,19 @@ class TableInitializer:
 
     @LogUtils.log_function
     def update_asns(self) -> None:
+        from .caida_api_queries import fetch_asn_data
+
         fetch_asn_data(CsvFiles.ASNS.value)
         with self._conn.cursor() as cur:
             self._clean_and_insert_data(cur, Tables.AS_STATISTICS)
+            self._bump_reference_data_version(cur)
 
     @LogUtils.log_function
     def update_airport_codes(self) -> None:
         download_file('https://datahub.io/core/airport-codes/_r/-/data/airport-codes.csv', CsvFiles.AIRPORT_CODES.value)
         with self._conn.cursor() as cur:
             self._clean_and_insert_data(cur, Tables.AIRPORT_CODES)
+            self._bump_reference_data_version(cur)
 
     @LogUtils.log_function
     def update_cities(self) -> None:
@@ -66,6 +173,13 @@ class TableInitializer:
         delete_files(['cities.txt', 'regions.txt'])
         with self._conn.cursor() as cur:
             self._clean_and_insert_data(cur, Tables.CITIES)
+            cur.execute(city_aliases_refresh_query)
+            logger.info(f"Rebuilt {Tables.CITY_ALIASES.value} table from {Tables.CITIES.value}.")
+            self._bump_reference_data_version(cur)
+
+    def _bump_reference_data_version(self, cur: cursor) -> None:
+        bump_reference_data_version(cur)
+        logger.info("Bumped the reference data version.")
 
     def _clean_and_insert_data(self, cur: cursor, table: Tables) -> None:
         delete_query = delete_all_from_table_query(table.value)
@@ -76,7 +190,7 @@ class TableInitializer:
         ) is not None, f"CSV name for table {table.value} is not defined."
         self._process_and_insert_data(
             cur,
-            table_data[table]["insert_query"],
+            table,
             table_data[table]["post_insert_query"],
             csv_name,
             table_data[table]["cleaning_fn"],
@@ -85,13 +199,13 @@ class TableInitializer:
     def _process_and_insert_data(
         self,
         cur: cursor,
-        insert_query: sql.SQL,
+        table: Tables,
         post_insert_query: Optional[sql.SQL],
         csv_file_name: str,
         clean_dataframe: Optional[CleanDataframeFn],
     ) -> None:
         csv_file_path = data_dir / csv_file_name
-        insert_result = self._insert_data_from_csv(cur, csv_file_path, insert_query, clean_dataframe)
+        insert_result = self._insert_data_from_csv(cur, csv_file_path, table, clean_dataframe)
         if insert_result == ExecutionDecision.OK and post_insert_query:
             cur.execute(post_insert_query)
             logger.info(f"Executed post-insert query for {csv_file_name}")
@@ -99,16 +213,92 @@ class TableInitializer:
     @LogUtils.log_function
     def drop_tables(self) -> None:
         with self._conn.cursor() as cur:
+            if self._table_exists(cur, Tables.STAGING_SCHEMAS):
+                cur.execute(staging_schemas_select_query)
+                for (schema_name,) in cur.fetchall():
+                    cur.execute(get_drop_schema_query(schema_name))
+                    logger.info(f"Dropped staging schema {schema_name}.")
             cur.execute(drop_tables_query)
             self._conn.commit()
 
+    @LogUtils.log_function
+    def report_telemetry_index_usage(self) -> None:
+        """
+        Log the scans and size of every index of unified_telemetry and its partitions, and the indexes on the same
+        columns, so unused or redundant indexes can be retired. Scans count from the last statistics reset, and
+        deferring an index resets them, so the report is logged before the indexes are deferred.
+        """
+        with self._conn.cursor() as cur:
+            cur.execute(telemetry_index_usage_select_query)
+            rows = cur.fetchall()
+        for table_name, index_name, access_method, scans, num_bytes, same_columns_as in rows:
+            message = f"Index {index_name} on {table_name} ({access_method}, {format_bytes(num_bytes)}): {scans} scans"
+            if same_columns_as:
+                message += f", same columns as {same_columns_as}"
+            logger.info(message + ("." if scans else ", unused since the last statistics reset."))
+
+    @LogUtils.log_function
+    def defer_telemetry_indexes(self) -> list[str]:
+        """
+        Drop the indexes of unified_telemetry and its partitions that back no constraint, after recording their
+        definitions in deferred_indexes, so bulk inserts only maintain the primary keys. Indexes deferred by an
+        earlier run that never rebuilt them stay deferred, and so do the indexes of partitions created until they
+        are rebuilt.
+
+        @return: the names of every deferred index, to be rebuilt with rebuild_deferred_index.
+        """
+        with self._conn.cursor() as cur:
+            cur.execute(deferred_indexes_create_query)
+            cur.execute(telemetry_secondary_indexes_select_query)
+            for index_name, table_name, definition, clustered in cur.fetchall():
+                cur.execute(deferred_indexes_insert_query, ((index_name, table_name, definition, clustered),))
+                cur.execute(get_drop_index_query(index_name))
+            self._conn.commit()
+        index_names = self.get_deferred_indexes()
+        logger.info(
+            f"Deferred {len(index_names)} indexes of {Tables.UNIFIED_TELEMETRY.value}: {', '.join(index_names)}."
+        )
+        return index_names
+
+    def get_deferred_indexes(self) -> list[str]:
+        with self._conn.cursor() as cur:
+            cur.execute(deferred_indexes_create_query)
+            cur.execute(deferred_indexes_select_query)
+            index_names = [index_name for (index_name,) in cur.fetchall()]
+            self._conn.commit()
+        return index_names
+
+    @LogUtils.log_function
+    def rebuild_deferred_index(self, index_name: str) -> None:
+        """
+        Recreate a deferred index from its recorded definition and restore it as the clustering index if it was
+        one. The index is built in its own transaction, so builds of other indexes of the table on other
+        connections run side by side.
+        """
+        with self._conn.cursor() as cur:
+            cur.execute(deferred_index_select_query, (index_name,))
+            row = cur.fetchone()
+            if row is None:
+                logger.warning(f"Index {index_name} is not deferred. Skipping its rebuild.")
+                return
+            table_name, definition, clustered = row
+            cur.execute(get_create_index_if_not_exists_query(definition))
+            self._conn.commit()
+            if clustered:
+                cur.execute(get_cluster_on_query(table_name, index_name))
+            cur.execute(deferred_index_delete_query, (index_name,))
+            self._conn.commit()
+        logger.info(f"Rebuilt index {index_name} on {table_name}.")
+
     def _insert_data_from_csv(
         self,
         cur: cursor,
         csv_file_path: Path,
-        insert_query: sql.SQL,
-        clean_dataframe: Callable[[pd.DataFrame], None] | None = None,
+        table: Tables,
+        clean_dataframe: CleanDataframeFn | None = None,
     ) -> ExecutionDecision:
+        import pandas as pd
+
         df = None
         try:
             if not csv_file_path.exists():
@@ -118,9 +308,7 @@ class TableInitializer:
             df = df.where(pd.notnull(df), None)
             if clean_dataframe:
                 clean_dataframe(df)
-            data_tuples = [tuple(x) for x in df.to_records(index=False)]
-            execute_values(cur, insert_query, data_tuples)
-            logger.info(f"Inserted {len(data_tuples)} rows into the database from {csv_file_path}.")
+            self._bulk_loader.load(cur, table, df, str(csv_file_path))
             return ExecutionDecision.OK
 
         except Exception as e:
@@ -0,0 +1,249 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import json
+import os
+from pathlib import Path
+import re
+import resource
+import threading
+import time
+from typing import Any, Iterator, Optional, TextIO
+from uuid import uuid4
+
+from psycopg2 import sql
+from psycopg2.extensions import cursor
+
+from .enums import SpanKind
+
+STATEMENT_LABEL_PATTERN = re.compile(
+    r"\b(INSERT INTO|UPDATE|DELETE FROM|TRUNCATE TABLE|ANALYZE|COPY|FROM)\s+([\w.]+)", re.IGNORECASE
+)
+DATA_MODIFYING_KEYWORDS = ("INSERT INTO", "UPDATE", "DELETE FROM", "TRUNCATE TABLE", "ANALYZE", "COPY")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+PROMETHEUS_METRIC_PREFIX = "global_telemetry_span"
+
+
+def get_statement_label(query: Any) -> str:
+    """
+    @return: the first data-modifying keyword of the statement and its target table (e.g. 'DELETE FROM ndt7_temp'),
+    so CTEs are labeled by what they change rather than by what they read.
+    """
+    if isinstance(query, bytes):
+        text = query.decode(errors="replace")
+    elif isinstance(query, sql.SQL):
+        text = query.string
+    else:
+        text = str(query)
+    matches = [(keyword.upper(), table) for keyword, table in STATEMENT_LABEL_PATTERN.findall(text)]
+    for keyword, table in matches:
+        if keyword in DATA_MODIFYING_KEYWORDS:
+            return f"{keyword} {table}"
+    return f"SELECT {matches[0][1]}" if matches else text.strip().split("\n")[0][:60]
+
+
+def get_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # Without procfs only the high-water mark is available (in KiB on Linux, bytes on macOS).
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Span:
+    """
+    One timed unit of work. Rows, bytes and database time include those of every span nested in it; the RSS
+    delta is the change of the process's resident memory while the span was open.
+    """
+
+    def __init__(self, name: str, kind: SpanKind, parent: Optional["Span"], attributes: dict[str, Any]) -> None:
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.attributes = attributes
+        self.span_id = uuid4().hex[:16]
+        self.status = "ok"
+        self.rows = 0
+        self.bytes = 0
+        self.db_seconds = 0.0
+        self.start_time = datetime.now(timezone.utc)
+        self._start_counter = time.perf_counter()
+        self._start_rss = get_rss_bytes()
+        self.duration_seconds = 0.0
+        self.rss_delta_bytes = 0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add(self, rows: int = 0, num_bytes: int = 0, db_seconds: float = 0.0) -> None:
+        self.rows += rows
+        self.bytes += num_bytes
+        self.db_seconds += db_seconds
+
+    def end(self) -> None:
+        self.duration_seconds = time.perf_counter() - self._start_counter
+        self.rss_delta_bytes = get_rss_bytes() - self._start_rss
+
+    def to_dict(self, trace_id: str) -> dict[str, Any]:
+        return {
+            "trace_id": trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "kind": self.kind.value,
+            "name": self.name,
+            "start": self.start_time.isoformat(),
+            "duration_seconds": round(self.duration_seconds, 6),
+            "db_seconds": round(self.db_seconds, 6),
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Records nested spans (run, function, stage, statement) as JSON lines, one line per span when it ends, and
+    optionally their totals per kind and name as a Prometheus textfile when the run ends.
+
+    Spans opened in a thread that did not inherit a span (e.g. a ThreadPoolExecutor worker) are nested in the run
+    span. Tracing is off until configure is called with a trace file or a Prometheus textfile.
+    """
+
+    _trace_file: Optional[TextIO] = None
+    _prometheus_path: Optional[Path] = None
+    _trace_id: str = ""
+    _run_span: Optional[Span] = None
+    _current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+    _lock = threading.Lock()
+    # Count, seconds, database seconds, rows and bytes of all spans with the same kind and name.
+    _totals: dict[tuple[str, str], list[float]] = {}
+
+    @staticmethod
+    def configure(trace_path: Optional[Path], prometheus_path: Optional[Path] = None) -> None:
+        Tracer.close()
+        if trace_path is None and prometheus_path is None:
+            return
+        if trace_path is not None:
+            trace_path.parent.mkdir(parents=True, exist_ok=True)
+            Tracer._trace_file = open(trace_path, "a", encoding="utf-8")
+        Tracer._prometheus_path = prometheus_path
+        Tracer._trace_id = uuid4().hex
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return Tracer._trace_file is not None or Tracer._prometheus_path is not None
+
+    @staticmethod
+    @contextmanager
+    def span(name: str, kind: SpanKind = SpanKind.FUNCTION, **attributes: Any) -> Iterator[Optional[Span]]:
+        if not Tracer.is_enabled():
+            yield None
+            return
+        parent = Tracer._current_span.get() or Tracer._run_span
+        span = Span(name, kind, parent, attributes)
+        if kind == SpanKind.RUN and Tracer._run_span is None:
+            Tracer._run_span = span
+        token = Tracer._current_span.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            Tracer._current_span.reset(token)
+            span.end()
+            Tracer._finish(span)
+
+    @staticmethod
+    def add(rows: int = 0, num_bytes: int = 0) -> None:
+        """
+        Count rows or bytes towards the innermost open span, if any.
+        """
+        if (span := Tracer._current_span.get() or Tracer._run_span) is not None:
+            with Tracer._lock:
+                span.add(rows=rows, num_bytes=num_bytes)
+
+    @staticmethod
+    def close() -> None:
+        """
+        Write the Prometheus textfile and close the trace file.
+        """
+        with Tracer._lock:
+            if Tracer._prometheus_path is not None:
+                Tracer._write_prometheus_textfile(Tracer._prometheus_path)
+            if Tracer._trace_file is not None:
+                Tracer._trace_file.close()
+            Tracer._trace_file = None
+            Tracer._prometheus_path = None
+            Tracer._run_span = None
+            Tracer._totals = {}
+
+    @staticmethod
+    def _finish(span: Span) -> None:
+        with Tracer._lock:
+            if span.parent is not None:
+                span.parent.add(rows=span.rows, num_bytes=span.bytes, db_seconds=span.db_seconds)
+            if span is Tracer._run_span:
+                Tracer._run_span = None
+            totals = Tracer._totals.setdefault((span.kind.value, span.name), [0, 0.0, 0.0, 0, 0])
+            for index, value in enumerate((1, span.duration_seconds, span.db_seconds, span.rows, span.bytes)):
+                totals[index] += value
+            if Tracer._trace_file is not None:
+                Tracer._trace_file.write(json.dumps(span.to_dict(Tracer._trace_id), default=str) + "\n")
+                Tracer._trace_file.flush()
+
+    @staticmethod
+    def _write_prometheus_textfile(path: Path) -> None:
+        """
+        Write the totals in the Prometheus text format, through a temporary file so the node exporter's textfile
+        collector never reads a partial file.
+        """
+        metrics = [
+            ("count", "Number of spans."),
+            ("seconds_total", "Wall time spent in spans."),
+            ("db_seconds_total", "Database time spent in spans."),
+            ("rows_total", "Rows processed by the statements of spans."),
+            ("bytes_total", "Bytes read from measurement sources in spans."),
+        ]
+        lines = []
+        for index, (metric, description) in enumerate(metrics):
+            name = f"{PROMETHEUS_METRIC_PREFIX}_{metric}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for (kind, span_name), totals in sorted(Tracer._totals.items()):
+                escaped_name = span_name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{name}{{kind="{kind}",name="{escaped_name}"}} {totals[index]}')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        tmp_path.replace(path)
+
+
+class TracingCursor(cursor):
+    """
+    Cursor that records every statement it runs as a statement span, with its row count and database time. Set
+    it as the cursor_factory of traced connections.
+    """
+
+    def execute(self, query: Any, vars: Any = None) -> None:
+        with Tracer.span(get_statement_label(query), kind=SpanKind.STATEMENT) as span:
+            start_time = time.perf_counter()
+            try:
+                super().execute(query, vars)
+            finally:
+                self._record(span, start_time)
+
+    def copy_expert(self, sql: Any, file: Any, size: int = 8192) -> None:
+        with Tracer.span(get_statement_label(sql), kind=SpanKind.STATEMENT) as span:
+            start_time = time.perf_counter()
+            try:
+                super().copy_expert(sql, file, size)
+            finally:
+                self._record(span, start_time)
+
+    def _record(self, span: Optional[Span], start_time: float) -> None:
+        if span is not None:
+            span.add(rows=max(self.rowcount, 0), db_seconds=time.perf_counter() - start_time)
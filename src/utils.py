@@ -1,15 +1,21 @@
+from __future__ import annotations
+
 from datetime import date, datetime, timedelta, timezone
 import io
+import re
+from typing import TYPE_CHECKING
 import zipfile
 
-import pandas as pd
-import requests
-
 from .config import data_dir, logger
 from .custom_exceptions import InvalidDateError, InvalidDateRangeError
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 def download_file(url: str, file_name: str, unzip: bool = False) -> None:
+    import requests
+
     file_path = data_dir / file_name
     response = requests.get(url)
     response.raise_for_status()
@@ -40,6 +46,15 @@ def save_dataframe_to_csv(df: pd.DataFrame, file_name: str, append: bool = False
         logger.info(f"DataFrame saved to: {file_path}")
 
 
+def format_bytes(num_bytes: int) -> str:
+    size = float(num_bytes)
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            break
+        size /= 1024
+    return f"{size:.2f} {unit}"
+
+
 def delete_files(file_names: list[str]) -> None:
     for file_name in file_names:
         file_path = data_dir / file_name
@@ -58,6 +73,8 @@ def _extract_alt_names(alt_str: str) -> list[str]:
 
 
 def generate_cities_csv(cities_txt: str, regions_txt: str, final_file_name: str) -> None:
+    import pandas as pd
+
     column_names = [
         "geonameid",
         "name",
@@ -192,6 +209,13 @@ def parse_date_range_from_months(date_range: str) -> tuple[date, date]:
     return (start_date, end_date)
 
 
+def parse_session_setting(setting: str) -> tuple[str, str]:
+    name, separator, value = setting.partition("=")
+    if not separator or not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_.]*", name.strip()):
+        raise ValueError(f"Invalid session setting: {setting}. Use the format name=value.")
+    return name.strip(), value.strip()
+
+
 def clean_airport_codes(df: pd.DataFrame) -> None:
     df.dropna(subset=["iata_code"], inplace=True)
     for col in df.columns:
@@ -0,0 +1,54 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.async_engine import AsyncEngine
+from src.enums import Resource
+
+
+@patch("src.async_engine.logger")
+def test_run_blocking_respects_resource_limit(mock_logger: MagicMock) -> None:
+    engine = AsyncEngine({Resource.BIGQUERY: 2, Resource.DATABASE: 1})
+    lock = threading.Lock()
+    running = {Resource.BIGQUERY: 0, Resource.DATABASE: 0}
+    peaks = dict(running)
+
+    def work(resource: Resource) -> None:
+        with lock:
+            running[resource] += 1
+            peaks[resource] = max(peaks[resource], running[resource])
+        time.sleep(0.02)
+        with lock:
+            running[resource] -= 1
+
+    async def main() -> None:
+        await engine.gather(
+            engine.run_blocking(resource, work, resource) for resource in [Resource.BIGQUERY, Resource.DATABASE] * 4
+        )
+
+    engine.run(main)
+
+    assert peaks == {Resource.BIGQUERY: 2, Resource.DATABASE: 1}
+
+
+@patch("src.async_engine.logger")
+def test_gather_raises_first_failure(mock_logger: MagicMock) -> None:
+    engine = AsyncEngine({Resource.HTTP: 2})
+
+    def fail() -> None:
+        raise RuntimeError("download failed")
+
+    async def main() -> None:
+        await engine.gather(
+            [engine.run_blocking(Resource.HTTP, fail), engine.run_blocking(Resource.HTTP, time.sleep, 0)]
+        )
+
+    with pytest.raises(RuntimeError, match="download failed"):
+        engine.run(main)
+
+
+def test_limits_must_be_positive() -> None:
+    with pytest.raises(ValueError):
+        AsyncEngine({Resource.DATABASE: 0})
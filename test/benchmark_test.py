@@ -0,0 +1,83 @@
+from benchmark.metrics import (
+    StatementTiming,
+    aggregate_timings,
+    find_regressions,
+    split_processing_stages,
+)
+from benchmark.startup import get_total_us, parse_importtime
+from src.enums import DateStage
+
+
+def test_aggregate_timings_sums_statements_with_the_same_label() -> None:
+    timings = [
+        StatementTiming("COPY ndt7_temp", 1.0, 100),
+        StatementTiming("SAVEPOINT bulk_load", 0.1, -1),
+        StatementTiming("COPY ndt7_temp", 2.0, 50),
+    ]
+
+    aggregated = aggregate_timings(timings)
+
+    assert aggregated == [
+        StatementTiming("COPY ndt7_temp", 3.0, 150, 2),
+        StatementTiming("SAVEPOINT bulk_load", 0.1, 0, 1),
+    ]
+
+
+def test_split_processing_stages_at_ledger_entries() -> None:
+    boundary = StatementTiming("INSERT INTO date_stages", 0.1, 1)
+    timings = [
+        StatementTiming("SELECT date_stages", 0.1, 1),
+        StatementTiming("DELETE FROM ndt7_temp", 1.0, 5),
+        boundary,
+        StatementTiming("UPDATE ndt7_temp", 2.0, 5),
+        boundary,
+        StatementTiming("INSERT INTO unified_telemetry", 3.0, 5),
+        boundary,
+    ]
+
+    split = split_processing_stages(timings)
+
+    assert [stage for stage, _ in split] == [DateStage.VALIDATED, DateStage.STANDARDIZED, DateStage.MERGED]
+    assert [len(stage_timings) for _, stage_timings in split] == [3, 2, 2]
+
+
+def test_find_regressions_reports_drops_beyond_the_tolerance() -> None:
+    baseline = [
+        {"rows": 100, "stage": "merged", "rows_per_second": 1000.0},
+        {"rows": 100, "stage": "validated", "rows_per_second": 1000.0},
+    ]
+    results = [
+        {"rows": 100, "stage": "merged", "rows_per_second": 700.0},
+        {"rows": 100, "stage": "validated", "rows_per_second": 900.0},
+        {"rows": 1000, "stage": "merged", "rows_per_second": 1.0},
+    ]
+
+    regressions = find_regressions(results, baseline, tolerance=0.2)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("merged at 100 rows")
+
+
+def test_parse_importtime_nesting_and_total() -> None:
+    stderr = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       150 |        150 |   encodings.aliases",
+            "import time:       200 |        350 | encodings",
+            "import time:        40 |         40 |     psycopg2._json",
+            "import time:       100 |        140 |   psycopg2.extras",
+            "import time:       500 |        640 | psycopg2",
+            "unrelated warning",
+        ]
+    )
+
+    timings = parse_importtime(stderr)
+
+    assert [(timing.module, timing.depth) for timing in timings] == [
+        ("encodings.aliases", 1),
+        ("encodings", 0),
+        ("psycopg2._json", 2),
+        ("psycopg2.extras", 1),
+        ("psycopg2", 0),
+    ]
+    assert get_total_us(timings) == 990
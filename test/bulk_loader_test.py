@@ -0,0 +1,80 @@
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import psycopg2
+import pytest
+
+from src.bulk_loader import BulkLoader
+from src.enums import InsertMethod, Tables
+
+
+def _countries_df(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({"country_code": [f"C{i % 10}" for i in range(rows)]})
+
+
+@patch("src.bulk_loader.logger")
+def test_copy_sends_one_copy_per_chunk(mock_logger: MagicMock) -> None:
+    cur = MagicMock()
+    copied: list[str] = []
+    cur.copy_expert.side_effect = lambda query, buffer: copied.append(buffer.read())
+    loader = BulkLoader(chunk_size=4, method=InsertMethod.COPY)
+
+    inserted = loader.load(cur, Tables.COUNTRIES_WITH_STARLINK_MEASUREMENTS, _countries_df(10), "test")
+
+    assert inserted == 10
+    assert cur.copy_expert.call_count == 3
+    assert [len(chunk.splitlines()) for chunk in copied] == [4, 4, 2]
+    assert "COPY countries_with_starlink_measurements (country_code)" in cur.copy_expert.call_args[0][0]
+    mock_logger.info.assert_called_once()
+
+
+@patch("src.bulk_loader.logger")
+def test_copy_writes_nulls_as_empty_fields(mock_logger: MagicMock) -> None:
+    cur = MagicMock()
+    copied: list[str] = []
+    cur.copy_expert.side_effect = lambda query, buffer: copied.append(buffer.read())
+    loader = BulkLoader(method=InsertMethod.COPY)
+    df = pd.DataFrame({"name": ["Delft", None], "region": ["South Holland, NL", None]})
+
+    loader.load(cur, Tables.COUNTRIES_WITH_STARLINK_MEASUREMENTS, df, "test")
+
+    assert copied == ['Delft,"South Holland, NL"\n,\n']
+
+
+@patch("psycopg2.extras.execute_values")
+@patch("src.bulk_loader.logger")
+def test_copy_falls_back_to_execute_values_on_duplicates(
+    mock_logger: MagicMock, mock_execute_values: MagicMock
+) -> None:
+    cur = MagicMock()
+    cur.copy_expert.side_effect = psycopg2.errors.UniqueViolation()
+    loader = BulkLoader(method=InsertMethod.COPY)
+
+    loader.load(cur, Tables.COUNTRIES_WITH_STARLINK_MEASUREMENTS, _countries_df(3), "test")
+
+    executed = [str(call[0][0]) for call in cur.execute.call_args_list]
+    assert any("ROLLBACK TO SAVEPOINT" in query for query in executed)
+    mock_execute_values.assert_called_once()
+    assert mock_execute_values.call_args[0][2] == [("C0",), ("C1",), ("C2",)]
+    mock_logger.warning.assert_called_once()
+
+
+@patch("psycopg2.extras.execute_values")
+@patch("src.bulk_loader.logger")
+def test_values_method_converts_missing_values_to_none(mock_logger: MagicMock, mock_execute_values: MagicMock) -> None:
+    cur = MagicMock()
+    loader = BulkLoader(chunk_size=2, method=InsertMethod.VALUES)
+    df = pd.DataFrame({"country_code": ["NL", None, "DE"]})
+
+    inserted = loader.load(cur, Tables.COUNTRIES_WITH_STARLINK_MEASUREMENTS, df, "test")
+
+    assert inserted == 3
+    cur.copy_expert.assert_not_called()
+    calls: list[Any] = [call[0][2] for call in mock_execute_values.call_args_list]
+    assert calls == [[("NL",), (None,)], [("DE",)]]
+
+
+def test_chunk_size_must_be_positive() -> None:
+    with pytest.raises(ValueError):
+        BulkLoader(chunk_size=0)
@@ -0,0 +1,41 @@
+from datetime import date
+
+from src.sql.create_queries import (
+    get_create_index_if_not_exists_query,
+    get_unified_telemetry_partition_create_query,
+    get_unified_telemetry_partition_index_definitions,
+)
+
+
+def test_partition_covers_one_month() -> None:
+    query = get_unified_telemetry_partition_create_query(date(2024, 2, 1))
+
+    assert "public.unified_telemetry_y2024m02" in query
+    assert "FROM ('2024-02-01 00:00:00+00') TO ('2024-03-01 00:00:00+00')" in query
+
+
+def test_partition_index_definitions_name_the_partition() -> None:
+    definitions = get_unified_telemetry_partition_index_definitions(date(2024, 2, 1))
+
+    assert definitions["time_btree_unified_telemetry_y2024m02"] == (
+        "CREATE INDEX time_btree_unified_telemetry_y2024m02 ON public.unified_telemetry_y2024m02 USING btree (test_time)"
+    )
+    assert all(f" {name} ON public.unified_telemetry_y2024m02 " in sql for name, sql in definitions.items())
+
+
+def test_partition_rolls_over_to_next_year() -> None:
+    query = get_unified_telemetry_partition_create_query(date(2024, 12, 1))
+
+    assert "FROM ('2024-12-01 00:00:00+00') TO ('2025-01-01 00:00:00+00')" in query
+
+
+def test_create_index_if_not_exists_keeps_uniqueness() -> None:
+    unique = "CREATE UNIQUE INDEX pk_unified_telemetry ON public.unified_telemetry USING btree (uuid)"
+    plain = "CREATE INDEX asn_btree_unified_telemetry ON public.unified_telemetry USING btree (asn)"
+
+    assert get_create_index_if_not_exists_query(unique) == (
+        "CREATE UNIQUE INDEX IF NOT EXISTS pk_unified_telemetry ON public.unified_telemetry USING btree (uuid);"
+    )
+    assert get_create_index_if_not_exists_query(plain).startswith(
+        "CREATE INDEX IF NOT EXISTS asn_btree_unified_telemetry ON"
+    )
@@ -0,0 +1,133 @@
+from datetime import date
+from typing import Iterator
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.data_loader import DataLoader
+from src.enums import NetworkType, Tables
+from src.synthetic import SyntheticWorkload
+
+
+@patch("src.data_loader.logger")
+def test_load_measurements_loads_every_batch(mock_logger: MagicMock) -> None:
+    source = MagicMock()
+    frame = next(SyntheticWorkload(num_cities=50).ndt7_frames(date(2024, 1, 2), 4))
+    frame["client_city"] = ["Delft", "", "", "Leiden"]
+    batches = [pa.RecordBatch.from_pandas(frame.iloc[:2]), pa.RecordBatch.from_pandas(frame.iloc[2:])]
+    source.read_day.return_value = iter(batches)
+    bulk_loader = MagicMock()
+    loaded: list[list[bool]] = []
+
+    def load_frames(cur: MagicMock, table: Tables, frames: Iterator[pd.DataFrame], dataset_name: str) -> int:
+        for frame in frames:
+            assert str(frame["client_city"].dtype) == "category"
+            loaded.append(frame["client_city"].isna().tolist())
+        return sum(len(page) for page in loaded)
+
+    bulk_loader.load_frames.side_effect = load_frames
+    data_loader = DataLoader(MagicMock(), bulk_loader, source=source)
+
+    data_loader._load_measurements(MagicMock(), Tables.NDT7_TEMP, date(2024, 1, 2), "3320", "NDT7")
+
+    source.read_day.assert_called_once_with(Tables.NDT7_TEMP, date(2024, 1, 2), "3320")
+    assert loaded == [[False, True], [True, False]]
+
+
+@patch("src.measurement_source.logger")
+@patch("src.data_loader.save_dataframe_to_csv")
+@patch("src.data_loader.logger")
+@patch("google.cloud.bigquery.Client")
+def test_run_best_servers_jobs_stores_every_job(
+    mock_client_cls: MagicMock, mock_logger: MagicMock, mock_save_csv: MagicMock, mock_source_logger: MagicMock
+) -> None:
+    client = mock_client_cls.return_value
+    client.query.return_value.to_dataframe.side_effect = lambda: pd.DataFrame({"client_city": ["Delft"]})
+    conn = MagicMock()
+    bulk_loader = MagicMock()
+    data_loader = DataLoader(conn, bulk_loader)
+    months = [(date(2024, 1, 1), date(2024, 1, 31)), (date(2024, 2, 1), date(2024, 2, 29))]
+    jobs = [job for date_from, date_to in months for job in DataLoader._best_servers_jobs(date_from, date_to, "3320")]
+
+    data_loader._run_best_servers_jobs(MagicMock(), jobs, max_concurrent_jobs=3)
+
+    assert client.query.call_count == 8
+    loaded = sorted((call[0][1].value, call[0][3]) for call in bulk_loader.load.call_args_list)
+    assert loaded == sorted((targets[0][1].value, dataset_name) for _, dataset_name, targets, _ in jobs)
+    assert mock_save_csv.call_count == 8
+    assert conn.commit.call_count == 8
+
+
+@patch("src.measurement_source.logger")
+@patch("src.data_loader.save_dataframe_to_csv")
+@patch("src.data_loader.logger")
+@patch("google.cloud.bigquery.Client")
+def test_run_best_servers_jobs_splits_fused_result_by_network_type(
+    mock_client_cls: MagicMock, mock_logger: MagicMock, mock_save_csv: MagicMock, mock_source_logger: MagicMock
+) -> None:
+    client = mock_client_cls.return_value
+    client.query.return_value.to_dataframe.side_effect = lambda: pd.DataFrame(
+        {
+            "client_city": ["Delft", "Leiden", "Delft"],
+            "month": [1, 1, 2],
+            "year": [2024, 2024, 2024],
+            "network_type": ["terrestrial", "starlink", "terrestrial"],
+        }
+    )
+    bulk_loader = MagicMock()
+    data_loader = DataLoader(MagicMock(), bulk_loader)
+    jobs = DataLoader._fused_best_servers_jobs(date(2024, 1, 1), date(2024, 2, 29), "3320")
+
+    data_loader._run_best_servers_jobs(MagicMock(), jobs, max_concurrent_jobs=2)
+
+    assert client.query.call_count == 2
+    loaded = {call[0][1]: call[0][2] for call in bulk_loader.load.call_args_list}
+    assert loaded[Tables.NDT_BEST_TERRESTRIAL_SERVERS]["client_city"].tolist() == ["Delft", "Delft"]
+    assert loaded[Tables.CF_BEST_STARLINK_SERVERS]["client_city"].tolist() == ["Leiden"]
+    assert all("network_type" not in df.columns for df in loaded.values())
+    assert mock_save_csv.call_count == 4
+
+
+@patch("src.data_loader.logger")
+def test_store_latency_sketches_replaces_the_day(mock_logger: MagicMock) -> None:
+    cur = MagicMock()
+    data_loader = DataLoader(MagicMock(), MagicMock(), sketch_latencies=True)
+
+    data_loader._store_latency_sketches(cur, date(2024, 1, 2), [NetworkType.STARLINK])
+
+    queries = [str(call[0][0]) for call in cur.execute.call_args_list]
+    assert "DELETE FROM ndt7_latency_sketches" in queries[0]
+    assert "INSERT INTO ndt7_latency_sketches" in queries[1]
+    assert "DELETE FROM cf_latency_sketches" in queries[2]
+    assert "INSERT INTO cf_latency_sketches" in queries[3]
+    params = cur.execute.call_args_list[0][0][1]
+    assert params["sketch_date"] == "2024-01-02"
+    assert params["network_types"] == ["starlink"]
+    assert params["log_gamma"] == pytest.approx(0.02, rel=1e-3)
+
+
+@pytest.mark.parametrize("deferred", [True, False])
+@patch("src.data_loader.logger")
+def test_ensure_telemetry_partition_defers_indexes_during_bulk_load(mock_logger: MagicMock, deferred: bool) -> None:
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    # The first lookup tells unified_telemetry is partitioned, the second whether a bulk load deferred its indexes.
+    cur.fetchone.side_effect = [(True,), (deferred,)]
+    data_loader = DataLoader(conn, MagicMock())
+
+    data_loader._ensure_telemetry_partition(date(2024, 2, 15))
+    data_loader._ensure_telemetry_partition(date(2024, 2, 16))
+
+    queries = [str(call.args[0]) for call in cur.execute.call_args_list]
+    recorded = [
+        call.args[1][0] for call in cur.execute.call_args_list if "INSERT INTO deferred_indexes" in str(call.args[0])
+    ]
+    assert sum("PARTITION OF public.unified_telemetry" in query for query in queries) == 1
+    assert any("CREATE INDEX IF NOT EXISTS" in query for query in queries) != deferred
+    if deferred:
+        assert len(recorded) == 4
+        assert all(
+            table_name == "unified_telemetry_y2024m02" and not clustered for _, table_name, _, clustered in recorded
+        )
@@ -0,0 +1,56 @@
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+
+from src.custom_exceptions import ConnectionPoolExhaustedError
+from src.database import ConnectionPool
+from src.tracing import TracingCursor
+
+
+@patch("src.database.logger")
+@patch("src.database.ThreadedConnectionPool")
+def test_session_settings_are_passed_as_connection_options(mock_pool_cls: MagicMock, mock_logger: MagicMock) -> None:
+    ConnectionPool(4, session_settings={"work_mem": "256MB", "application_name": "global telemetry"})
+
+    args, kwargs = mock_pool_cls.call_args
+    assert args == (1, 4)
+    assert kwargs["options"] == "-c work_mem=256MB -c application_name=global\\ telemetry"
+    assert "cursor_factory" not in kwargs
+
+
+@patch("src.database.logger")
+@patch("src.database.ThreadedConnectionPool")
+def test_cursor_factory_is_passed_to_every_connection(mock_pool_cls: MagicMock, mock_logger: MagicMock) -> None:
+    ConnectionPool(2, cursor_factory=TracingCursor)
+
+    assert mock_pool_cls.call_args.kwargs["cursor_factory"] is TracingCursor
+
+
+@patch("src.database.logger")
+@patch("src.database.ThreadedConnectionPool")
+def test_broken_connection_is_replaced_on_checkout(mock_pool_cls: MagicMock, mock_logger: MagicMock) -> None:
+    broken, healthy = MagicMock(closed=0), MagicMock(closed=0)
+    broken.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError("gone")
+    mock_pool_cls.return_value.getconn.side_effect = [broken, healthy]
+    pool = ConnectionPool(2)
+
+    with pool.checkout() as conn:
+        assert conn is healthy
+
+    put_calls = mock_pool_cls.return_value.putconn.call_args_list
+    assert put_calls[0].args == (broken,) and put_calls[0].kwargs == {"close": True}
+    assert put_calls[1].args == (healthy,) and put_calls[1].kwargs == {"close": False}
+    healthy.commit.assert_called()
+
+
+@patch("src.database.logger")
+@patch("src.database.ThreadedConnectionPool")
+def test_checkout_times_out_when_pool_is_exhausted(mock_pool_cls: MagicMock, mock_logger: MagicMock) -> None:
+    mock_pool_cls.return_value.getconn.return_value = MagicMock(closed=0)
+    pool = ConnectionPool(1, checkout_timeout=0.01)
+
+    with pool.checkout():
+        with pytest.raises(ConnectionPoolExhaustedError):
+            with pool.checkout():
+                pass
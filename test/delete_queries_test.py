@@ -0,0 +1,16 @@
+from src.sql.delete_queries import get_cf_temp_delete_invalid_servers_query, get_ndt7_temp_delete_invalid_servers_query
+
+
+def test_invalid_servers_queries_filter_on_year_month() -> None:
+    for query in (
+        get_ndt7_temp_delete_invalid_servers_query("ndt7_terrestrial_servers"),
+        get_cf_temp_delete_invalid_servers_query("cf_terrestrial_servers"),
+    ):
+        assert "WHERE year_month IN (SELECT DISTINCT year_month FROM" in query
+        assert "EXTRACT" not in query
+
+
+def test_invalid_servers_query_selects_network_by_table() -> None:
+    assert "n.asn = 14593" in get_ndt7_temp_delete_invalid_servers_query("ndt7_starlink_servers")
+    assert "n.asn != 14593" in get_ndt7_temp_delete_invalid_servers_query("ndt7_terrestrial_servers")
+    assert "c.asn = 14593" in get_cf_temp_delete_invalid_servers_query("cf_starlink_servers")
@@ -0,0 +1,75 @@
+import gzip
+from pathlib import Path
+from typing import IO, Any
+from unittest.mock import MagicMock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.exporter import TelemetryExporter, export_columns
+from src.sql.copy_queries import get_telemetry_copy_to_stdout_query
+
+QUERY = get_telemetry_copy_to_stdout_query(export_columns, [])
+
+EXPORTED_CSV = (
+    ",".join(export_columns)
+    + "\n"
+    + "u1,2024-01-02 03:04:05+00,Delft,South Holland,NL,Amsterdam,NL,1136,NDT7,0.01,95.5,12,1.5,20.25,13,2.5\n"
+    + 'u2,2024-01-03 00:00:00.5+00,,"",NL,,NL,3320,Cloudflare AIM,,,,,,,\n'
+).encode()
+
+
+def _cursor(copy: Any) -> MagicMock:
+    cur = MagicMock()
+    cur.copy_expert.side_effect = copy
+    cur.rowcount = 2
+    return cur
+
+
+def _write_csv(query: str, file: IO[bytes]) -> None:
+    file.write(EXPORTED_CSV)
+
+
+def test_export_csv_compresses_copy_output(tmp_path: Path) -> None:
+    path = tmp_path / "telemetry.csv.gz"
+
+    num_rows = TelemetryExporter._export_csv(_cursor(_write_csv), QUERY, path)
+
+    assert num_rows == 2
+    assert gzip.decompress(path.read_bytes()) == EXPORTED_CSV
+
+
+def test_export_parquet_parses_copy_output_into_typed_columns(tmp_path: Path) -> None:
+    path = tmp_path / "telemetry.parquet"
+
+    num_rows = TelemetryExporter._export_parquet(_cursor(_write_csv), QUERY, path)
+
+    table = pq.read_table(path)
+    assert num_rows == 2
+    assert table.column_names == list(export_columns)
+    assert table.schema.field("test_time").type == pa.timestamp("us", tz="UTC")
+    assert pa.types.is_dictionary(table.schema.field("data_source").type)
+    assert table.column("asn").to_pylist() == [1136, 3320]
+    # COPY quotes empty strings, while NULLs are left unquoted.
+    assert table.column("client_city").to_pylist() == ["Delft", None]
+    assert table.column("client_region").to_pylist() == ["South Holland", ""]
+    assert table.column("download_latency_ms").to_pylist() == [12, None]
+
+
+def test_export_parquet_reports_copy_failure(tmp_path: Path) -> None:
+    def fail(query: str, file: IO[bytes]) -> None:
+        file.write(EXPORTED_CSV[:40])
+        raise RuntimeError("connection lost")
+
+    with pytest.raises(RuntimeError, match="connection lost"):
+        TelemetryExporter._export_parquet(_cursor(fail), QUERY, tmp_path / "telemetry.parquet")
+
+
+def test_telemetry_copy_query_filters_only_requested_columns() -> None:
+    query = get_telemetry_copy_to_stdout_query(export_columns, ["asn"])
+
+    assert "asn = ANY(%(asn)s)" in query
+    assert "client_country_code = ANY" not in query
+    assert "test_time >= %(start_time)s::timestamptz" in query
+    assert query.rstrip().endswith("TO STDOUT WITH (FORMAT csv, HEADER)")
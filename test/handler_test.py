@@ -0,0 +1,180 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+import threading
+from typing import Iterator
+from unittest.mock import MagicMock, patch
+
+from freezegun import freeze_time
+import pytest
+
+from src.async_engine import AsyncEngine
+from src.enums import ExecutionDecision, Resource
+from src.handler import Handler
+
+
+class FakeWorkerFactory:
+    def __init__(self, fail_on: date | None = None) -> None:
+        self.loaded: list[date] = []
+        self.schema_names: list[str] = []
+        self.processed = 0
+        self.max_pending = 0
+        self._lock = threading.Lock()
+        self._fail_on = fail_on
+
+    def _load_data(
+        self, day: date, skip_inserted_dates: bool = False, starlink_only: bool = False
+    ) -> ExecutionDecision:
+        if day == self._fail_on:
+            raise RuntimeError("BigQuery unavailable")
+        with self._lock:
+            self.loaded.append(day)
+            self.max_pending = max(self.max_pending, len(self.loaded) - self.processed)
+        return ExecutionDecision.OK
+
+    def _process_data(self, day: date) -> None:
+        with self._lock:
+            self.processed += 1
+
+    def get_work_planner(self) -> MagicMock:
+        planner = MagicMock()
+        planner.get_missing_dates.side_effect = lambda start, end: [
+            end - timedelta(days=offset) for offset in range((end - start).days + 1)
+        ]
+        return planner
+
+    @contextmanager
+    def worker_components(self, schema_prefix: str) -> Iterator[tuple[MagicMock, MagicMock]]:
+        with self._lock:
+            self.schema_names.append(f"{schema_prefix}{len(self.schema_names) + 1}")
+        data_loader = MagicMock()
+        data_loader.load_data.side_effect = self._load_data
+        data_processer = MagicMock()
+        data_processer.process_data.side_effect = self._process_data
+        yield data_loader, data_processer
+
+
+@patch("src.utils.logger")
+@patch("src.handler.logger")
+@freeze_time("2024-02-01")
+def test_date_range_parallel_processes_every_date_once(mock_logger: MagicMock, mock_utils_logger: MagicMock) -> None:
+    factory = FakeWorkerFactory()
+    handler = Handler(factory)  # type: ignore[arg-type]
+
+    handler.date_range("2024-01-01:2024-01-10", workers=3)
+
+    assert sorted(factory.loaded) == [date(2024, 1, day) for day in range(1, 11)]
+    assert sorted(factory.schema_names) == ["staging_w1", "staging_w2", "staging_w3"]
+
+
+@patch("src.utils.logger")
+@patch("src.handler.logger")
+@freeze_time("2024-02-01")
+def test_date_range_parallel_reraises_worker_failure(mock_logger: MagicMock, mock_utils_logger: MagicMock) -> None:
+    factory = FakeWorkerFactory(fail_on=date(2024, 1, 10))
+    handler = Handler(factory)  # type: ignore[arg-type]
+
+    with pytest.raises(RuntimeError):
+        handler.date_range("2024-01-01:2024-01-10", workers=2)
+    assert date(2024, 1, 10) not in factory.loaded
+    mock_logger.error.assert_called_once()
+
+
+@patch("src.utils.logger")
+@patch("src.handler.logger")
+@freeze_time("2024-02-01")
+def test_date_range_pipelined_bounds_prefetched_dates(mock_logger: MagicMock, mock_utils_logger: MagicMock) -> None:
+    factory = FakeWorkerFactory()
+    handler = Handler(factory)  # type: ignore[arg-type]
+
+    handler.date_range("2024-01-01:2024-01-20", prefetch=2)
+
+    assert factory.loaded == [date(2024, 1, day) for day in range(20, 0, -1)]
+    assert factory.processed == 20
+    assert factory.max_pending <= 3
+    assert sorted(factory.schema_names) == ["staging_p1", "staging_p2", "staging_p3"]
+
+
+@patch("src.utils.logger")
+@patch("src.handler.logger")
+@freeze_time("2024-02-01")
+def test_date_range_pipelined_reraises_prefetch_failure(mock_logger: MagicMock, mock_utils_logger: MagicMock) -> None:
+    factory = FakeWorkerFactory(fail_on=date(2024, 1, 5))
+    handler = Handler(factory)  # type: ignore[arg-type]
+
+    with pytest.raises(RuntimeError):
+        handler.date_range("2024-01-01:2024-01-10", prefetch=1)
+    assert factory.processed == 5
+
+
+@patch("src.async_engine.logger")
+@patch("src.utils.logger")
+@patch("src.handler.logger")
+@freeze_time("2024-02-01")
+def test_date_range_async_processes_every_date_once(
+    mock_logger: MagicMock, mock_utils_logger: MagicMock, mock_engine_logger: MagicMock
+) -> None:
+    factory = FakeWorkerFactory()
+    handler = Handler(factory)  # type: ignore[arg-type]
+    engine = AsyncEngine({Resource.BIGQUERY: 2, Resource.DATABASE: 1})
+
+    handler.date_range("2024-01-01:2024-01-10", engine=engine)
+
+    assert sorted(factory.loaded) == [date(2024, 1, day) for day in range(1, 11)]
+    assert factory.processed == 10
+    assert sorted(factory.schema_names) == ["staging_a1", "staging_a2", "staging_a3"]
+    assert factory.max_pending <= 3
+
+
+@patch("src.handler.logger")
+def test_bulk_load_rebuilds_deferred_indexes_after_a_failure(mock_logger: MagicMock) -> None:
+    table_initializer = MagicMock()
+    table_initializer.defer_telemetry_indexes.return_value = ["asn_btree_unified_telemetry", "pk_unified_telemetry"]
+    # A partition created during the load records its index as deferred as well.
+    table_initializer.get_deferred_indexes.return_value = [
+        "asn_btree_unified_telemetry",
+        "asn_btree_unified_telemetry_y2024m02",
+        "pk_unified_telemetry",
+    ]
+    factory = MagicMock()
+    factory.get_table_initializer.return_value = table_initializer
+    factory.pooled_table_initializer.return_value.__enter__.return_value = table_initializer
+    handler = Handler(factory)
+
+    with pytest.raises(RuntimeError):
+        with handler.bulk_load(index_build_workers=2):
+            table_initializer.report_telemetry_index_usage.assert_called_once()
+            table_initializer.rebuild_deferred_index.assert_not_called()
+            raise RuntimeError("BigQuery unavailable")
+
+    rebuilt = sorted(call.args[0] for call in table_initializer.rebuild_deferred_index.call_args_list)
+    assert rebuilt == ["asn_btree_unified_telemetry", "asn_btree_unified_telemetry_y2024m02", "pk_unified_telemetry"]
+
+
+@patch("src.utils.logger")
+@patch("src.handler.logger")
+def test_replay_plan_deletes_nothing(mock_logger: MagicMock, mock_utils_logger: MagicMock) -> None:
+    factory = MagicMock()
+    factory.get_archive.return_value.contains.side_effect = lambda table, day: day != date(2024, 1, 2)
+    handler = Handler(factory)
+
+    handler.replay("2024-01-01:2024-01-03", plan=True)
+
+    factory.get_data_loader.return_value.replay_data.assert_not_called()
+    factory.get_data_processer.return_value.process_data.assert_not_called()
+    mock_logger.info.assert_any_call("Plan: replay 2024-01-03 from the archive.")
+    mock_logger.info.assert_any_call("Plan: skip 2024-01-02, it has no archived extract.")
+    mock_logger.info.assert_any_call("Plan: 2 date(s) would be replayed.")
+
+
+@patch("src.utils.logger")
+@patch("src.handler.logger")
+def test_date_plan_skips_processed_date(mock_logger: MagicMock, mock_utils_logger: MagicMock) -> None:
+    factory = MagicMock()
+    factory.get_work_planner.return_value.get_missing_dates.return_value = []
+    handler = Handler(factory)
+
+    handler.date("2024-01-01", skip_inserted_dates=True, plan=True)
+
+    factory.get_work_planner.return_value.get_missing_dates.assert_called_once_with(date(2024, 1, 1), date(2024, 1, 1))
+    factory.get_data_loader.return_value.estimate_load_bytes.assert_not_called()
+    factory.get_data_loader.return_value.load_data.assert_not_called()
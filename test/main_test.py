@@ -0,0 +1,32 @@
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from src.main import parse_args
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--replay", "2024-01-01:2024-01-31", "--plan"],
+        ["--date-range", "2024-01-01:2024-01-31", "--plan"],
+        ["--update-best-servers", "2024-01:2024-03", "--plan"],
+    ],
+)
+def test_plan_accepts_planned_commands(argv: list[str]) -> None:
+    with patch.object(sys, "argv", ["main", *argv]):
+        assert parse_args().plan
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--drop", "--plan"],
+        ["--init", "--plan"],
+        ["--replay", "2024-01-01:2024-01-31", "--export", "2024-01-01:2024-01-31", "--export-file", "x.csv", "--plan"],
+    ],
+)
+def test_plan_rejects_other_commands(argv: list[str]) -> None:
+    with patch.object(sys, "argv", ["main", *argv]), pytest.raises(SystemExit):
+        parse_args()
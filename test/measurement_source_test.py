@@ -0,0 +1,87 @@
+from datetime import date
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pyarrow as pa
+
+from src.bulk_loader import DEFAULT_CHUNK_SIZE
+from src.enums import Tables
+from src.measurement_source import BigQuerySource, FileSource, SyntheticSource
+from src.raw_archive import get_day_dir
+from src.synthetic import SyntheticWorkload
+from src.table_data import table_data
+
+DAY = date(2024, 1, 2)
+
+
+def _ndt7_frame(asns: list[int]) -> pd.DataFrame:
+    workload = SyntheticWorkload(num_cities=50)
+    frame = next(workload.ndt7_frames(DAY, len(asns)))
+    frame["asn"] = asns
+    # Exports do not have to follow the column order of the staging table.
+    return frame[list(reversed(frame.columns))]
+
+
+def test_get_page_size_fits_memory_ceiling() -> None:
+    # 1,000,000 rows of 256 bytes with an overhead factor of 4 -> 1 KiB per row in memory.
+    assert BigQuerySource._get_page_size(256_000_000, 1_000_000, 64) == 65536
+
+
+def test_get_page_size_without_table_stats() -> None:
+    assert BigQuerySource._get_page_size(None, None, 64) == DEFAULT_CHUNK_SIZE
+    assert BigQuerySource._get_page_size(0, 0, 64) == DEFAULT_CHUNK_SIZE
+
+
+def test_get_page_size_never_below_one_row() -> None:
+    assert BigQuerySource._get_page_size(10**12, 10, 1) == 1
+
+
+@patch("src.measurement_source.logger")
+@patch("google.cloud.bigquery.Client")
+def test_bigquery_source_streams_pages(mock_client_cls: MagicMock, mock_logger: MagicMock) -> None:
+    client = mock_client_cls.return_value
+    client.get_table.return_value = MagicMock(num_bytes=1024, num_rows=4)
+    pages = [pa.record_batch({"asn": [3320, 3320]}), pa.record_batch({"asn": [1136, 1136]})]
+    client.list_rows.return_value.to_arrow_iterable.return_value = iter(pages)
+    source = BigQuerySource(max_memory_mb=1)
+
+    batches = list(source.read_day(Tables.NDT7_TEMP, DAY, "3320,1136"))
+
+    assert batches == pages
+    client.list_rows.assert_called_once_with(client.get_table.return_value, page_size=1024)
+    assert "3320,1136" in client.query.call_args[0][0]
+
+
+@patch("src.measurement_source.logger")
+def test_file_source_reads_parquet_and_csv_in_table_order(mock_logger: MagicMock, tmp_path: Path) -> None:
+    day_dir = get_day_dir(tmp_path, Tables.NDT7_TEMP, DAY)
+    day_dir.mkdir(parents=True)
+    _ndt7_frame([3320, 1136, 9999]).to_parquet(day_dir / "part-00000.parquet", index=False)
+    _ndt7_frame([3320, 9999]).to_csv(day_dir / "part-00001.csv", index=False)
+    source = FileSource(tmp_path, batch_rows=2)
+
+    batches = list(source.read_day(Tables.NDT7_TEMP, DAY, "3320,1136"))
+
+    columns = list(table_data[Tables.NDT7_TEMP]["columns"])
+    assert all(batch.schema.names == columns for batch in batches)
+    assert [asn for batch in batches for asn in batch.column("asn").to_pylist()] == [3320, 1136, 3320]
+    assert source.estimate_day_bytes(Tables.NDT7_TEMP, DAY, "3320") > 0
+
+
+@patch("src.measurement_source.logger")
+def test_file_source_without_exports_reads_nothing(mock_logger: MagicMock, tmp_path: Path) -> None:
+    source = FileSource(tmp_path)
+
+    assert list(source.read_day(Tables.CF_TEMP, DAY, "3320")) == []
+    assert source.estimate_day_bytes(Tables.CF_TEMP, DAY, "3320") == 0
+    mock_logger.warning.assert_called_once()
+
+
+def test_synthetic_source_yields_batches_of_the_staging_table() -> None:
+    source = SyntheticSource(SyntheticWorkload(num_cities=50), rows_per_day=250, chunk_rows=100)
+
+    batches = list(source.read_day(Tables.CF_TEMP, DAY, "3320"))
+
+    assert [batch.num_rows for batch in batches] == [100, 100, 50]
+    assert batches[0].schema.names == list(table_data[Tables.CF_TEMP]["columns"])
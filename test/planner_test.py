@@ -0,0 +1,18 @@
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from src.planner import WorkPlanner
+
+
+@patch("src.planner.logger")
+def test_missing_dates_are_fetched_with_one_query(mock_logger: MagicMock) -> None:
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchall.return_value = [(date(2024, 1, 3),), (date(2024, 1, 1),)]
+
+    get_missing_dates = WorkPlanner.get_missing_dates.__wrapped__  # type: ignore[attr-defined]
+    dates = get_missing_dates(WorkPlanner(conn), date(2024, 1, 1), date(2024, 1, 3))
+
+    assert dates == [date(2024, 1, 3), date(2024, 1, 1)]
+    cur.execute.assert_called_once()
+    assert cur.execute.call_args.args[1] == (date(2024, 1, 1), date(2024, 1, 3))
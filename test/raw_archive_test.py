@@ -0,0 +1,39 @@
+from datetime import date
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+import pytest
+
+from src.enums import Tables
+from src.raw_archive import RawArchive
+
+
+def test_write_then_read_round_trips_every_part(tmp_path: Path) -> None:
+    archive = RawArchive(tmp_path)
+    frames = [pd.DataFrame({"uuid": ["a", "b"]}), pd.DataFrame({"uuid": ["c"]})]
+
+    written = list(archive.write(Tables.NDT7_TEMP, date(2024, 1, 2), frames))
+
+    assert written == frames
+    assert (tmp_path / "source=ndt7" / "date=2024-01-02" / "part-00001.parquet").is_file()
+    assert archive.contains(Tables.NDT7_TEMP, date(2024, 1, 2))
+    assert not archive.contains(Tables.CF_TEMP, date(2024, 1, 2))
+    read = pd.concat(archive.read(Tables.NDT7_TEMP, date(2024, 1, 2)))
+    assert read["uuid"].tolist() == ["a", "b", "c"]
+
+
+def test_interrupted_write_keeps_previous_extract(tmp_path: Path) -> None:
+    archive = RawArchive(tmp_path)
+    list(archive.write(Tables.CF_TEMP, date(2024, 1, 2), [pd.DataFrame({"uuid": ["old"]})]))
+
+    def failing_frames() -> Iterator[pd.DataFrame]:
+        yield pd.DataFrame({"uuid": ["new"]})
+        raise RuntimeError("BigQuery unavailable")
+
+    with pytest.raises(RuntimeError):
+        list(archive.write(Tables.CF_TEMP, date(2024, 1, 2), failing_frames()))
+
+    read = pd.concat(archive.read(Tables.CF_TEMP, date(2024, 1, 2)))
+    assert read["uuid"].tolist() == ["old"]
+    assert not (tmp_path / "source=cloudflare" / "date=2024-01-02.tmp").exists()
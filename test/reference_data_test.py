@@ -0,0 +1,58 @@
+from unittest.mock import MagicMock, patch
+
+from src.reference_data import ReferenceCache
+
+
+def _cursor(versions: list[int], table_exists: bool = True) -> MagicMock:
+    cur = MagicMock()
+    rows = iter(versions)
+    fetched: list[tuple[object]] = []
+
+    def execute(query: object) -> None:
+        if "to_regclass" in str(query):
+            fetched.append((table_exists,))
+        elif "reference_data_version" in str(query):
+            fetched.append((next(rows),))
+        else:
+            fetched.append(("3320,14593" if "OR a.asn = 14593" in str(query) else "3320",))
+
+    cur.execute.side_effect = execute
+    cur.fetchone.side_effect = lambda: fetched.pop(0)
+    return cur
+
+
+@patch("src.reference_data.logger")
+def test_snapshot_is_reused_while_version_is_unchanged(mock_logger: MagicMock) -> None:
+    cur = _cursor([1, 1, 1])
+    cache = ReferenceCache()
+
+    snapshots = [cache.get_snapshot(cur) for _ in range(3)]
+
+    assert snapshots[0] is snapshots[1] is snapshots[2]
+    assert snapshots[0].get_top_asns(includes_starlink=False) == "3320"
+    assert snapshots[0].get_top_asns(includes_starlink=True) == "3320,14593"
+    assert cur.execute.call_count == 3 * 2 + 2
+
+
+@patch("src.reference_data.logger")
+def test_snapshot_is_reloaded_after_version_bump(mock_logger: MagicMock) -> None:
+    cur = _cursor([1, 2])
+    cache = ReferenceCache()
+
+    first = cache.get_snapshot(cur)
+    second = cache.get_snapshot(cur)
+
+    assert first is not second
+    assert second.version == 2
+    assert mock_logger.info.call_count == 2
+
+
+@patch("src.reference_data.logger")
+def test_missing_version_table_counts_as_version_zero(mock_logger: MagicMock) -> None:
+    cur = _cursor([], table_exists=False)
+    cache = ReferenceCache()
+
+    snapshot = cache.get_snapshot(cur)
+
+    assert snapshot.version == 0
+    assert not any("FROM reference_data_version" in str(call.args[0]) for call in cur.execute.call_args_list)
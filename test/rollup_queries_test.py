@@ -0,0 +1,34 @@
+import math
+
+from src.sql.delete_queries import unified_telemetry_delete_replayed_query
+from src.sql.insert_queries import global_telemetry_from_ndt_insert_query
+from src.sql.rollup_queries import ROLLUP_GAMMA, ROLLUP_LOG_GAMMA, ROLLUP_RELATIVE_ACCURACY
+
+
+def test_merge_adds_only_inserted_rows_to_both_granularities() -> None:
+    query = global_telemetry_from_ndt_insert_query.string
+
+    assert "ON CONFLICT DO NOTHING\n        RETURNING uuid, test_time" in query
+    assert "FROM merged s" in query
+    assert "('day', (s.test_time AT TIME ZONE 'UTC')::date)" in query
+    assert "('month', date_trunc('month', s.test_time AT TIME ZONE 'UTC')::date)" in query
+    assert "DO UPDATE SET tests = r.tests + EXCLUDED.tests" in query
+    assert "DO UPDATE SET count = h.count + EXCLUDED.count" in query
+    assert query.strip().endswith("SELECT COUNT(*) FROM merged;")
+
+
+def test_replay_delete_subtracts_deleted_rows() -> None:
+    query = unified_telemetry_delete_replayed_query.string
+
+    assert "FROM deleted s" in query
+    assert "SET tests = r.tests - d.tests" in query
+    assert "SET count = h.count - d.count" in query
+    assert query.strip().endswith("SELECT COUNT(*) FROM deleted;")
+
+
+def test_histogram_buckets_keep_relative_accuracy() -> None:
+    for value in (0.5, 12.0, 950.0):
+        bucket = math.ceil(math.log(value) / ROLLUP_LOG_GAMMA)
+        estimate = 2 * ROLLUP_GAMMA**bucket / (ROLLUP_GAMMA + 1)
+
+        assert abs(estimate - value) / value <= ROLLUP_RELATIVE_ACCURACY
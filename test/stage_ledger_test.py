@@ -0,0 +1,71 @@
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from src.data_processer import DataProcesser
+from src.enums import DateStage
+from src.stage_ledger import is_stage_completed
+
+
+def test_stage_is_completed_by_itself_and_later_stages() -> None:
+    assert is_stage_completed(DateStage.VALIDATED, DateStage.VALIDATED)
+    assert is_stage_completed(DateStage.VALIDATED, DateStage.MERGED)
+    assert not is_stage_completed(DateStage.STANDARDIZED, DateStage.VALIDATED)
+    assert not is_stage_completed(DateStage.EXTRACTED, None)
+
+
+@patch("src.stage_ledger.execute_values")
+@patch("src.data_processer.execute_values")
+@patch("src.stage_ledger.logger")
+@patch("src.data_processer.logger")
+def test_process_data_resumes_after_last_completed_stage(
+    mock_logger: MagicMock,
+    mock_ledger_logger: MagicMock,
+    mock_execute_values: MagicMock,
+    mock_ledger_execute_values: MagicMock,
+) -> None:
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    stages = iter(["validated", "validated", "standardized"])
+    cur.fetchone.side_effect = lambda: (
+        (next(stages),) if "FROM date_stages" in str(cur.execute.call_args.args[0]) else (True,)
+    )
+
+    process_data = DataProcesser.process_data.__wrapped__  # type: ignore[attr-defined]
+    process_data(DataProcesser(conn), date(2024, 1, 1))
+
+    queries = [str(call.args[0]) for call in cur.execute.call_args_list]
+    assert not any("invalid" in query for query in queries)
+    assert any("UPDATE ndt7_temp" in query for query in queries)
+    recorded = [call.args[2][0][1] for call in mock_ledger_execute_values.call_args_list]
+    assert recorded == ["standardized", "merged"]
+    assert conn.commit.call_count == 2
+    mock_execute_values.assert_called_once()
+
+
+@patch("src.stage_ledger.execute_values")
+@patch("src.data_processer.execute_values")
+@patch("src.stage_ledger.logger")
+@patch("src.data_processer.logger")
+def test_process_data_replaces_replayed_rows_in_the_merge_transaction(
+    mock_logger: MagicMock,
+    mock_ledger_logger: MagicMock,
+    mock_execute_values: MagicMock,
+    mock_ledger_execute_values: MagicMock,
+) -> None:
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    queries: list[str] = []
+    cur.execute.side_effect = lambda query, *args: queries.append(str(query))
+    cur.fetchone.side_effect = lambda: (
+        ("standardized",) if "FROM date_stages" in queries[-1] else (0,) if "COUNT(*)" in queries[-1] else (True,)
+    )
+
+    process_data = DataProcesser.process_data.__wrapped__  # type: ignore[attr-defined]
+    process_data(DataProcesser(conn), date(2024, 1, 1), replace=True)
+
+    delete_index = next(i for i, query in enumerate(queries) if "USING replay_keys r" in query)
+    merge_index = next(i for i, query in enumerate(queries) if "INSERT INTO unified_telemetry" in query)
+    assert delete_index < merge_index
+    assert any("DELETE FROM replay_keys" in query for query in queries)
+    assert any("DELETE FROM processed_dates" in query for query in queries)
+    assert conn.commit.call_count == 1
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+import io
+
+import pyarrow as pa
+
+from src.enums import Tables
+from src.staging_schema import conform_batch, staging_schemas, to_dataframe
+from src.table_data import table_data
+
+
+def _cf_batch(**overrides: pa.Array) -> pa.RecordBatch:
+    columns = {
+        "uuid": pa.array(["a", "b"]),
+        "test_time": pa.array(["2024-01-02 03:04:05.123456+00", "2024-01-02 23:59:59+00"]),
+        "client_city": pa.array(["Delft", ""]),
+        "client_region": pa.array(["South Holland", None]),
+        "client_country_code": pa.array(["NL", "NL"]),
+        "server_airport_code": pa.array(["AMS", "AMS"]),
+        "asn": pa.array([1136, 3320]),
+        "packet_loss_rate": pa.array([Decimal("0.00100"), None], pa.decimal128(10, 5)),
+        "download_throughput_mbps": pa.array([80.5, 12.25]),
+        "download_latency_ms": pa.array([12, None], pa.int64()),
+        "download_jitter_ms": pa.array([1.5, 2.5]),
+        "upload_throughput_mbps": pa.array([10.0, 5.0]),
+        "upload_latency_ms": pa.array([15, 30]),
+        "upload_jitter_ms": pa.array([0.5, 0.25]),
+    }
+    columns.update(overrides)
+    return pa.record_batch(columns)
+
+
+def test_schemas_follow_the_staging_columns() -> None:
+    for table, schema in staging_schemas.items():
+        assert schema.names == list(table_data[table]["columns"])
+
+
+def test_conform_batch_casts_to_native_types() -> None:
+    batch = conform_batch(_cf_batch(), Tables.CF_TEMP)
+
+    assert batch.schema == staging_schemas[Tables.CF_TEMP]
+    assert batch.column("test_time")[0].as_py() == datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc)
+    assert batch.column("packet_loss_rate").to_pylist() == [0.001, None]
+    assert batch.column("client_city").to_pylist() == ["Delft", None]
+
+
+def test_to_dataframe_keeps_categories_and_nullable_integers() -> None:
+    df = to_dataframe(conform_batch(_cf_batch(), Tables.CF_TEMP))
+
+    assert str(df["client_country_code"].dtype) == "category"
+    assert str(df["download_latency_ms"].dtype) == "Int64"
+    assert str(df["test_time"].dtype) == "datetime64[us, UTC]"
+    buffer = io.StringIO()
+    df[["download_latency_ms", "client_city"]].to_csv(buffer, header=False, index=False)
+    assert buffer.getvalue() == "12,Delft\n,\n"
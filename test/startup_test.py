@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+import pytest
+
+# Dependencies that take a noticeable part of a second to import.
+heavy_modules = ["google.cloud.bigquery", "pandas", "pyarrow", "requests", "numpy", "asyncio", "graphqlclient"]
+
+
+def _get_imported_heavy_modules(*modules: str) -> list[str]:
+    statements = "; ".join(f"import {module}" for module in ["sys", *modules])
+    script = f"{statements}; print(' '.join(m for m in {heavy_modules!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+@pytest.mark.parametrize(
+    "modules",
+    [
+        ["src.main"],
+        ["src.main", "src.table_init"],
+    ],
+)
+def test_cli_and_table_commands_do_not_import_heavy_dependencies(modules: list[str]) -> None:
+    assert _get_imported_heavy_modules(*modules) == []
+
+
+def test_file_source_commands_do_not_import_bigquery() -> None:
+    imported = _get_imported_heavy_modules("src.main", "src.data_loader", "src.data_processer")
+
+    assert "google.cloud.bigquery" not in imported
+    assert "pandas" in imported
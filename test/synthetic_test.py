@@ -0,0 +1,63 @@
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from src.enums import Tables
+from src.synthetic import SyntheticWorkload
+from src.table_data import table_data
+
+DAY = date(2024, 1, 15)
+
+
+def test_frames_match_the_staging_table_columns() -> None:
+    workload = SyntheticWorkload(num_cities=50)
+
+    ndt7_frames = list(workload.ndt7_frames(DAY, 250, chunk_rows=100))
+    cf_frames = list(workload.cf_frames(DAY, 250, chunk_rows=100))
+
+    assert [len(frame) for frame in ndt7_frames] == [100, 100, 50]
+    assert list(ndt7_frames[0].columns) == list(table_data[Tables.NDT7_TEMP]["columns"])
+    assert list(cf_frames[0].columns) == list(table_data[Tables.CF_TEMP]["columns"])
+    uuids = pd.concat(ndt7_frames)["uuid"]
+    assert uuids.is_unique
+
+
+def test_frames_are_deterministic_per_seed() -> None:
+    first = next(SyntheticWorkload(seed=3, num_cities=50).ndt7_frames(DAY, 100))
+    second = next(SyntheticWorkload(seed=3, num_cities=50).ndt7_frames(DAY, 100))
+    other_seed = next(SyntheticWorkload(seed=4, num_cities=50).ndt7_frames(DAY, 100))
+
+    pd.testing.assert_frame_equal(first, second)
+    assert not first.equals(other_seed)
+
+
+def test_cities_are_skewed_and_servers_partly_invalid() -> None:
+    workload = SyntheticWorkload(num_cities=200, starlink_share=0, valid_server_share=0.5)
+    frame = next(workload.ndt7_frames(DAY, 20_000, chunk_rows=20_000))
+    best_servers = workload.best_servers(Tables.NDT_BEST_TERRESTRIAL_SERVERS, DAY.year, DAY.month)
+
+    country_counts = frame["client_country_code"].value_counts()
+    assert country_counts.iloc[0] > 2 * country_counts.iloc[-1]
+    asciinames = {
+        spelling: city["asciiname"]
+        for _, city in workload.cities.iterrows()
+        for spelling in (city["name"], city["asciiname"], city["name1"], city["name2"])
+    }
+    valid_servers = set(zip(best_servers["client_city"], best_servers["server_city"]))
+    valid = [
+        (asciinames[client_city], server_city) in valid_servers
+        for client_city, server_city in zip(frame["client_city"], frame["server_city"])
+    ]
+    assert 0.4 < sum(valid) / len(valid) < 0.7
+
+
+def test_write_geonames_files_cycles_through_cities(tmp_path: Path) -> None:
+    workload = SyntheticWorkload(num_cities=50)
+
+    workload.write_geonames_files(tmp_path, "cities.txt", "regions.txt", 120)
+
+    dump = pd.read_csv(tmp_path / "cities.txt", sep="\t", header=None, keep_default_na=False)
+    assert len(dump) == 120
+    assert dump[1].is_unique
+    assert (tmp_path / "regions.txt").exists()
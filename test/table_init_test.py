@@ -0,0 +1,13 @@
+from unittest.mock import MagicMock
+
+from src.table_init import TableInitializer
+
+
+def test_claim_staging_schema_skips_schemas_held_by_other_connections() -> None:
+    cur = MagicMock()
+    cur.fetchone.side_effect = [(False,), (False,), (True,)]
+
+    schema_name = TableInitializer._claim_staging_schema(cur, "staging_w")
+
+    assert schema_name == "staging_w3"
+    assert [call.args[1] for call in cur.execute.call_args_list] == [("staging_w1",), ("staging_w2",), ("staging_w3",)]
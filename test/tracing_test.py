@@ -0,0 +1,110 @@
+from datetime import date
+import json
+from pathlib import Path
+from typing import Any, Iterator
+from unittest.mock import MagicMock, patch
+
+from psycopg2 import sql
+import pytest
+
+from src.enums import SpanKind
+from src.logger import LogUtils
+from src.tracing import Tracer, get_statement_label
+
+
+@pytest.fixture(autouse=True)
+def close_tracer() -> Iterator[None]:
+    yield
+    Tracer.close()
+
+
+def _read_spans(trace_path: Path) -> dict[str, dict[str, Any]]:
+    spans = [json.loads(line) for line in trace_path.read_text().splitlines()]
+    return {span["name"]: span for span in spans}
+
+
+def test_statement_label_prefers_the_modified_table() -> None:
+    query = sql.SQL("WITH valid AS (SELECT * FROM ndt_best_servers) DELETE FROM ndt7_temp USING valid")
+
+    assert get_statement_label(query) == "DELETE FROM ndt7_temp"
+    assert get_statement_label(b"INSERT INTO cities (name) VALUES ('a')") == "INSERT INTO cities"
+    assert get_statement_label("SELECT stage FROM date_stages") == "SELECT date_stages"
+    assert get_statement_label("SAVEPOINT bulk_load") == "SAVEPOINT bulk_load"
+
+
+def test_nested_spans_roll_up_rows_bytes_and_db_time(tmp_path: Path) -> None:
+    trace_path = tmp_path / "trace.jsonl"
+    Tracer.configure(trace_path)
+
+    with Tracer.span("run", kind=SpanKind.RUN):
+        with Tracer.span("validated", kind=SpanKind.STAGE, date="2024-01-02"):
+            Tracer.add(num_bytes=512)
+            for rows in (3, 4):
+                with Tracer.span("DELETE FROM ndt7_temp", kind=SpanKind.STATEMENT) as statement:
+                    assert statement is not None
+                    statement.add(rows=rows, db_seconds=0.5)
+    Tracer.close()
+
+    spans = _read_spans(trace_path)
+    run, stage = spans["run"], spans["validated"]
+    assert run["parent_id"] is None
+    assert stage["parent_id"] == run["span_id"]
+    assert spans["DELETE FROM ndt7_temp"]["parent_id"] == stage["span_id"]
+    assert stage["attributes"] == {"date": "2024-01-02"}
+    assert (stage["rows"], stage["bytes"], stage["db_seconds"]) == (7, 512, 1.0)
+    assert (run["rows"], run["bytes"], run["db_seconds"]) == (7, 512, 1.0)
+    assert {span["trace_id"] for span in spans.values()} == {run["trace_id"]}
+
+
+def test_failed_span_is_marked_as_error(tmp_path: Path) -> None:
+    trace_path = tmp_path / "trace.jsonl"
+    Tracer.configure(trace_path)
+
+    with pytest.raises(ValueError):
+        with Tracer.span("merged", kind=SpanKind.STAGE):
+            raise ValueError("boom")
+    Tracer.close()
+
+    assert _read_spans(trace_path)["merged"]["status"] == "error"
+
+
+@patch("src.logger.LogUtils._logger")
+def test_log_function_opens_a_span_with_date_arguments(mock_logger: MagicMock, tmp_path: Path) -> None:
+    trace_path = tmp_path / "trace.jsonl"
+    Tracer.configure(trace_path)
+
+    @LogUtils.log_function
+    def load(day: date, starlink_only: bool = False) -> None:
+        pass
+
+    load(date(2024, 1, 2), starlink_only=True)
+    Tracer.close()
+
+    span = next(iter(_read_spans(trace_path).values()))
+    assert span["kind"] == "function"
+    assert span["name"].endswith("load")
+    assert span["attributes"] == {"day": "2024-01-02"}
+
+
+def test_prometheus_textfile_holds_totals_per_span_name(tmp_path: Path) -> None:
+    textfile_path = tmp_path / "metrics" / "telemetry.prom"
+    Tracer.configure(None, textfile_path)
+
+    for _ in range(2):
+        with Tracer.span('UPDATE "ndt7_temp"', kind=SpanKind.STATEMENT) as statement:
+            assert statement is not None
+            statement.add(rows=5)
+    Tracer.close()
+
+    lines = textfile_path.read_text().splitlines()
+    assert 'global_telemetry_span_count{kind="statement",name="UPDATE \\"ndt7_temp\\""} 2' in lines
+    assert 'global_telemetry_span_rows_total{kind="statement",name="UPDATE \\"ndt7_temp\\""} 10' in lines
+    assert "# TYPE global_telemetry_span_seconds_total counter" in lines
+
+
+def test_disabled_tracer_records_nothing() -> None:
+    with Tracer.span("run", kind=SpanKind.RUN) as span:
+        Tracer.add(rows=1)
+
+    assert span is None
+    assert not Tracer.is_enabled()
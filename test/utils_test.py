@@ -4,7 +4,7 @@ from unittest.mock import MagicMock, patch
 from freezegun import freeze_time
 import pytest
 
-from src.utils import InvalidDateError, InvalidDateRangeError, parse_date, parse_date_range
+from src.utils import InvalidDateError, InvalidDateRangeError, parse_date, parse_date_range, parse_session_setting
 
 
 @patch("src.utils.logger")
@@ -167,3 +167,12 @@ def test_parse_date_range_start_today(mock_logger: MagicMock) -> None:
     mock_logger.error.assert_called_with(
         f"Invalid date: {start_str}. The script can only run on dates that have already completed (past UTC dates)."
     )
+
+
+def test_parse_session_setting() -> None:
+    assert parse_session_setting("work_mem=256MB") == ("work_mem", "256MB")
+    assert parse_session_setting("search_path=a, public") == ("search_path", "a, public")
+    with pytest.raises(ValueError):
+        parse_session_setting("work_mem")
+    with pytest.raises(ValueError):
+        parse_session_setting("work mem=1")